@@ -25,6 +25,7 @@ import httplib2
 import logging
 import os
 import re
+import time
 import uritemplate
 import urllib
 import urlparse
@@ -33,6 +34,7 @@ try:
 except ImportError:
     from cgi import parse_qsl
 from apiclient.http import HttpRequest
+from apiclient.json import iterarray
 from apiclient.json import simplejson
 
 URITEMPLATE = re.compile('{[^}]*}')
@@ -80,6 +82,14 @@ def key2param(key):
 
 class JsonModel(object):
 
+  def __init__(self, items=None, fields=None):
+    """If items, a sequence of keys such as ('data', 'items'), is given then a response is decoded into just the
+    list found by following those keys, an item at a time, without building the rest of the document. fields then
+    limits each item to the given dotted paths, such as 'links.alternate.href', and the rest of each item is skipped.
+    """
+    self.items = items
+    self.fields = fields
+
   def request(self, headers, path_params, query_params, body_value):
     query = self.build_query(query_params)
     headers['accept'] = 'application/json'
@@ -110,7 +120,11 @@ class JsonModel(object):
     if resp.status < 300:
       if resp.status == 204:
         # A 204: No Content response should be treated differently to all the other success states
+        if self.items is not None:
+          return []
         return simplejson.loads('{}')
+      if self.items is not None:
+        return self.decode_items(content)
       body = simplejson.loads(content)
       if isinstance(body, dict) and 'data' in body:
         body = body['data']
@@ -122,25 +136,117 @@ class JsonModel(object):
       else:
         raise HttpError(resp, '%d %s' % (resp.status, resp.reason))
 
+  def decode_items(self, content):
+    if iterarray is not None:
+      return list(iterarray(content, self.items, self.fields))
+    body = simplejson.loads(content)
+    for key in self.items:
+      if not isinstance(body, dict) or key not in body:
+        return []
+      body = body[key]
+    if not isinstance(body, list):
+      return []
+    return body
+
+
+# Built services are reused for this many seconds before the discovery document is fetched again
+DISCOVERY_CACHE_TTL = 24 * 60 * 60
+
+# Maps (serviceName, version, discoveryServiceUrl, future.json mtime) to (time built, Service class)
+_serviceCache = {}
+
+
+def clearCache():
+  """Forget every built service so that the next build() fetches its discovery document again"""
+  _serviceCache.clear()
+
 
 def build(serviceName, version, http=None,
-    discoveryServiceUrl=DISCOVERY_URI, developerKey=None, model=JsonModel()):
+    discoveryServiceUrl=DISCOVERY_URI, developerKey=None, model=JsonModel(),
+    cacheTtl=DISCOVERY_CACHE_TTL, snapshotDir=None):
+  """Returns an object for talking to the given service.
+
+  The discovery document is fetched, parsed and turned into classes once per process and then reused until it is
+  cacheTtl seconds old or the service's future.json changes. Each call still gets its own instance so http,
+  developerKey and model can differ between calls.
+
+  If snapshotDir is given the discovery document is also kept there so that a cold process can skip the HTTP
+  fetch. Only documents that were fetched successfully and parse are kept. Snapshots are ignored once they are
+  older than cacheTtl or if they can't be parsed, and failures to write them are ignored.
+  """
+  if http is None:
+    http = httplib2.Http()
+
+  futurePath = os.path.join(os.path.dirname(__file__), "contrib",
+      serviceName, "future.json")
+  try:
+    futureMtime = os.path.getmtime(futurePath)
+  except OSError:
+    futureMtime = None
+
+  key = (serviceName, version, discoveryServiceUrl, futureMtime)
+  now = time.time()
+  cached = _serviceCache.get(key)
+  if cached is not None and now - cached[0] < cacheTtl:
+    serviceClass = cached[1]
+  else:
+    service = _fetchDiscoveryDocument(serviceName, version, http,
+        discoveryServiceUrl, cacheTtl, snapshotDir)
+    serviceClass = _createServiceClass(discoveryServiceUrl, service,
+        futurePath)
+    _serviceCache[key] = (now, serviceClass)
+  return serviceClass(http, developerKey, model)
+
+
+def _fetchDiscoveryDocument(serviceName, version, http, discoveryServiceUrl,
+    cacheTtl, snapshotDir):
+  """Returns the parsed discovery document, from a snapshot if there is a
+  fresh one that parses"""
+  snapshotPath = None
+  if snapshotDir:
+    snapshotPath = os.path.join(snapshotDir,
+        '%s.%s.discovery.json' % (serviceName, version))
+    try:
+      if time.time() - os.path.getmtime(snapshotPath) < cacheTtl:
+        f = file(snapshotPath, "r")
+        try:
+          snapshot = f.read()
+        finally:
+          f.close()
+        try:
+          return simplejson.loads(snapshot)
+        except ValueError:
+          logging.info('Ignoring unreadable discovery snapshot %s' %
+              snapshotPath)
+    except (OSError, IOError):
+      pass
+
   params = {
       'api': serviceName,
       'apiVersion': version
       }
-
-  if http is None:
-    http = httplib2.Http()
   requested_url = uritemplate.expand(discoveryServiceUrl, params)
   logging.info('URL being requested: %s' % requested_url)
   resp, content = http.request(requested_url)
   service = simplejson.loads(content)
 
-  fn = os.path.join(os.path.dirname(__file__), "contrib",
-      serviceName, "future.json")
+  # An error page would otherwise be reloaded by every cold process until the
+  # snapshot expired
+  if snapshotPath and resp.status == 200:
+    try:
+      f = file(snapshotPath, "w")
+      try:
+        f.write(content)
+      finally:
+        f.close()
+    except IOError, e:
+      logging.info('Could not write discovery snapshot %s: %s' % (snapshotPath, e))
+  return service
+
+
+def _createServiceClass(discoveryServiceUrl, service, futurePath):
   try:
-    f = file(fn, "r")
+    f = file(futurePath, "r")
     d = simplejson.load(f)
     f.close()
     future = d['resources']
@@ -155,7 +261,7 @@ def build(serviceName, version, http=None,
   class Service(object):
     """Top level interface for a service"""
 
-    def __init__(self, http=http):
+    def __init__(self, http, developerKey, model):
       self._http = http
       self._baseUrl = base
       self._model = model
@@ -164,28 +270,41 @@ def build(serviceName, version, http=None,
     def auth_discovery(self):
       return auth_discovery
 
-  def createMethod(theclass, methodName, methodDesc, futureDesc):
+  for methodName, methodDesc in resources.iteritems():
+    _createResourceMethod(Service, methodName, methodDesc,
+        future.get(methodName, {}))
+  return Service
 
-    def method(self):
-      return createResource(self._http, self._baseUrl, self._model,
-          methodName, self._developerKey, methodDesc, futureDesc)
 
-    setattr(method, '__doc__', 'A description of how to use this function')
-    setattr(method, '__is_resource__', True)
-    setattr(theclass, methodName, method)
+def _createResourceMethod(theclass, methodName, methodDesc, futureDesc):
+  """Adds a method to theclass which returns a Resource. The Resource class is created the first time the method
+  is called and shared by every instance of theclass after that."""
+  resourceClass = []
 
-  for methodName, methodDesc in resources.iteritems():
-    createMethod(Service, methodName, methodDesc, future.get(methodName, {}))
-  return Service()
+  def method(self):
+    if not resourceClass:
+      resourceClass.append(createResourceClass(methodName, methodDesc,
+          futureDesc))
+    return resourceClass[0](self._http, self._baseUrl, self._model,
+        self._developerKey)
+
+  setattr(method, '__doc__', 'A description of how to use this function')
+  setattr(method, '__is_resource__', True)
+  setattr(theclass, methodName, method)
 
 
 def createResource(http, baseUrl, model, resourceName, developerKey,
                    resourceDesc, futureDesc):
+  resourceClass = createResourceClass(resourceName, resourceDesc, futureDesc)
+  return resourceClass(http, baseUrl, model, developerKey)
+
+
+def createResourceClass(resourceName, resourceDesc, futureDesc):
 
   class Resource(object):
     """A class for interacting with a resource."""
 
-    def __init__(self):
+    def __init__(self, http, baseUrl, model, developerKey):
       self._http = http
       self._baseUrl = baseUrl
       self._model = model
@@ -194,6 +313,7 @@ def createResource(http, baseUrl, model, resourceName, developerKey,
   def createMethod(theclass, methodName, methodDesc, futureDesc):
     pathUrl = methodDesc['restPath']
     pathUrl = re.sub(r'\{', r'{+', pathUrl)
+    pathTemplate = uritemplate.compile(pathUrl)
     httpMethod = methodDesc['httpMethod']
 
     argmap = {}
@@ -264,7 +384,7 @@ def createResource(http, baseUrl, model, resourceName, developerKey,
       url_result = urlparse.urlsplit(self._baseUrl)
       new_base_url = url_result.scheme + '://' + url_result.netloc
 
-      expanded_url = uritemplate.expand(pathUrl, params)
+      expanded_url = pathTemplate.expand(params)
       url = urlparse.urljoin(new_base_url, url_result.path + expanded_url + query)
 
       logging.info('URL being requested: %s' % url)
@@ -332,22 +452,13 @@ def createResource(http, baseUrl, model, resourceName, developerKey,
 
   # Add in nested resources
   if 'resources' in resourceDesc:
-    def createMethod(theclass, methodName, methodDesc, futureDesc):
-
-      def method(self):
-        return createResource(self._http, self._baseUrl, self._model,
-            methodName, self._developerKey, methodDesc, futureDesc)
-
-      setattr(method, '__doc__', 'A description of how to use this function')
-      setattr(method, '__is_resource__', True)
-      setattr(theclass, methodName, method)
-
     for methodName, methodDesc in resourceDesc['resources'].iteritems():
       if futureDesc and 'resources' in futureDesc:
         future = futureDesc['resources'].get(methodName, {})
       else:
         future = {}
-      createMethod(Resource, methodName, methodDesc, future.get(methodName, {}))
+      _createResourceMethod(Resource, methodName, methodDesc,
+          future.get(methodName, {}))
 
   # Add <m>_next() methods to Resource
   if futureDesc:
@@ -355,4 +466,4 @@ def createResource(http, baseUrl, model, resourceName, developerKey,
       if 'next' in methodDesc and methodName in resourceDesc['methods']:
         createNextMethod(Resource, methodName + "_next", methodDesc['next'])
 
-  return Resource()
+  return Resource
@@ -21,12 +21,58 @@ we get a simplejson module from.
 __author__ = 'jcgregorio@google.com (Joe Gregorio)'
 
 
-try: # pragma: no cover
-  import simplejson
-except ImportError: # pragma: no cover
+import sys
+
+# Where a simplejson module can come from, in order of preference. django's should work on App Engine and json
+# should work for Python2.6 and higher.
+CANDIDATES = ['simplejson', 'django.utils.simplejson', 'json']
+
+
+def _import(name):
   try:
-    # Try to import from django, should work on App Engine
-    from django.utils import simplejson
+    # Empty globals make this an absolute import, so 'json' can't find this module
+    return __import__(name, {}, {}, ['loads'])
   except ImportError:
-    # Should work for Python2.6 and higher.
-    import json as simplejson
+    return None
+
+
+def speedups_enabled(module):
+  """Returns True if the module decodes JSON with a C scanner rather than in pure Python"""
+  enabled = getattr(module, 'speedups_enabled', None)
+  if enabled is not None:
+    return enabled()
+  scanner = sys.modules.get(module.__name__ + '.scanner')
+  c_make_scanner = getattr(scanner, 'c_make_scanner', None)
+  return c_make_scanner is not None and scanner.make_scanner is c_make_scanner
+
+
+def _choose():
+  """Returns the first candidate that has working C speedups or, if none do, the first one that can be imported"""
+  first = None
+  for name in CANDIDATES:
+    module = _import(name)
+    if module is None:
+      continue
+    if speedups_enabled(module):
+      return module
+    if first is None:
+      first = module
+  if first is None:
+    raise ImportError('No JSON module found, tried: %s' % ', '.join(CANDIDATES))
+  return first
+
+
+simplejson = _choose()
+
+# Decodes one array of a document at a time, which only the vendored simplejson can do
+try: # pragma: no cover
+  from simplejson import iterarray
+except ImportError: # pragma: no cover
+  iterarray = None
+
+
+def backend():
+  """Describes which JSON module is in use and whether it has C speedups, e.g. 'simplejson (C speedups)'"""
+  if speedups_enabled(simplejson):
+    return '%s (C speedups)' % simplejson.__name__
+  return '%s (pure Python)' % simplejson.__name__
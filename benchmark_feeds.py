@@ -0,0 +1,153 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Synthetic Buzz track feeds and API responses for the benchmarks.
+
+The feeds are shaped like the ones the hub pushes to /posts: an Atom feed whose entries are Buzz activities.
+The JSON is shaped like the Buzz API's response to an activities request. Both are generated deterministically so
+that runs can be compared with each other.
+"""
+
+import simplejson
+
+FEED_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:activity="http://activitystrea.ms/spec/1.0/"
+    xmlns:buzz="http://schemas.google.com/buzz/2010" xmlns:crosspost="http://purl.org/syndication/cross-posting"
+    xmlns:georss="http://www.georss.org/georss" xmlns:poco="http://portablecontacts.net/spec/1.0"
+    xmlns:thr="http://purl.org/syndication/thread/1.0">
+  <link rel="self" type="application/atom+xml" href="https://www.googleapis.com/buzz/v1/activities/track?q=%(term)s"/>
+  <link rel="hub" href="http://pubsubhubbub.appspot.com/"/>
+  <title type="text">Google Buzz</title>
+  <updated>2010-10-17T12:00:00.000Z</updated>
+  <id>tag:google.com,2010:buzz-track:%(term)s</id>
+  <generator>Google - Google Buzz</generator>
+%(entries)s
+</feed>
+'''
+
+ENTRY_TEMPLATE = '''  <entry>
+    <title type="html">%(title)s</title>
+    <published>2010-10-17T%(time)s.000Z</published>
+    <updated>2010-10-17T%(time)s.000Z</updated>
+    <id>tag:google.com,2010:buzz:z12%(id)08d</id>
+    <link rel="alternate" type="text/html" href="http://www.google.com/buzz/user%(author)d/%(id)d/Post"/>
+    <link rel="replies" type="application/atom+xml" href="https://www.googleapis.com/buzz/v1/activities/user%(author)d/@self/%(id)d/@comments" thr:count="%(comments)d"/>
+    <author>
+      <name>User %(author)d</name>
+      <uri>http://www.google.com/profiles/user%(author)d</uri>
+      <link rel="photo" type="image/jpeg" href="http://www.google.com/s2/photos/public/user%(author)d"/>
+      <poco:id>%(author)d</poco:id>
+    </author>
+    <content type="html">%(content)s</content>
+    <activity:verb>http://activitystrea.ms/schema/1.0/post</activity:verb>
+    <activity:object>
+      <activity:object-type>http://activitystrea.ms/schema/1.0/note</activity:object-type>
+      <id>tag:google.com,2010:buzz:z12%(id)08d</id>
+      <title>%(title)s</title>
+      <content type="html">%(content)s</content>
+      <link rel="alternate" type="text/html" href="http://www.google.com/buzz/user%(author)d/%(id)d/Post"/>
+    </activity:object>
+    <source>
+      <activity:service><title>Buzz</title></activity:service>
+    </source>
+    <buzz:visibility><buzz:entry><poco:id>G:@public</poco:id></buzz:entry></buzz:visibility>
+  </entry>'''
+
+PLAIN_CONTENT = 'Talking about %(term)s again. Post number %(id)d has a few more words so it looks like a real update.'
+
+HTML_CONTENT = ('&lt;p&gt;Talking about &lt;b&gt;%(term)s&lt;/b&gt; again. Post number %(id)d links to '
+                '&lt;a href="http://example.com/%(id)d" onclick="evil()"&gt;an article&lt;/a&gt; and '
+                '&lt;a href="/relative/%(id)d"&gt;a relative link&lt;/a&gt;.&lt;/p&gt;'
+                '&lt;ul&gt;&lt;li&gt;one&lt;/li&gt;&lt;li&gt;&lt;i&gt;two&lt;/i&gt;&lt;/li&gt;&lt;/ul&gt;'
+                '&lt;img src="http://example.com/%(id)d.png"&gt;&lt;script&gt;alert(1)&lt;/script&gt;')
+
+
+def make_entry(id, term='somestring', html=False):
+  values = {'id': id, 'term': term, 'author': id % 97, 'comments': id % 7,
+            'time': '%02d:%02d:%02d' % ((id // 3600) % 24, (id // 60) % 60, id % 60)}
+  if html:
+    content = HTML_CONTENT % values
+  else:
+    content = PLAIN_CONTENT % values
+  values['content'] = content
+  values['title'] = 'Post %d about %s' % (id, term)
+  return ENTRY_TEMPLATE % values
+
+
+def make_track_feed(count, term='somestring', html=False, first_id=0):
+  """Returns an Atom track feed, as a UTF-8 string, containing count entries numbered from first_id"""
+  entries = '\n'.join([make_entry(id, term, html) for id in range(first_id, first_id + count)])
+  return FEED_TEMPLATE % {'term': term, 'entries': entries}
+
+
+def make_activity(id, term='somestring', html=False):
+  """Returns a Buzz activity as the JSON API represents it"""
+  author = id % 97
+  values = {'id': id, 'term': term}
+  if html:
+    content = (HTML_CONTENT % values).replace('&lt;', '<').replace('&gt;', '>')
+  else:
+    content = PLAIN_CONTENT % values
+  time = '2010-10-17T%02d:%02d:%02d.000Z' % ((id // 3600) % 24, (id // 60) % 60, id % 60)
+  post_url = 'http://www.google.com/buzz/user%d/%d/Post' % (author, id)
+  activity_url = 'https://www.googleapis.com/buzz/v1/activities/user%d/@self/%d' % (author, id)
+  return {
+    'kind': 'buzz#activity',
+    'id': 'tag:google.com,2010:buzz:z12%08d' % id,
+    'title': 'Post %d about %s' % (id, term),
+    'published': time,
+    'updated': time,
+    'links': {
+      'alternate': [{'href': post_url, 'type': 'text/html'}],
+      'liked': [{'href': activity_url + '/@liked', 'count': id % 11}],
+      'replies': [{'href': activity_url + '/@comments', 'type': 'application/json', 'count': id % 7,
+                   'updated': time}],
+      'self': [{'href': activity_url, 'type': 'application/json'}],
+    },
+    'actor': {
+      'id': str(author),
+      'name': u'User %d \u00e9\u00e8' % author,
+      'profileUrl': 'http://www.google.com/profiles/user%d' % author,
+      'thumbnailUrl': 'http://www.google.com/s2/photos/public/user%d' % author,
+    },
+    'verbs': ['post'],
+    'object': {
+      'type': 'note',
+      'id': 'tag:google.com,2010:buzz:z12%08d' % id,
+      'content': content,
+      'originalContent': content,
+      'links': {'alternate': [{'href': post_url, 'type': 'text/html'}]},
+      'attachments': [{
+        'type': 'article',
+        'title': 'An article',
+        'content': 'A few words from the article that was linked to',
+        'links': {'alternate': [{'href': 'http://example.com/%d' % id, 'type': 'text/html'}]},
+      }],
+      'replies': {'totalItems': id % 7},
+      'liked': {'totalItems': id % 11},
+    },
+    'source': {'title': 'Buzz'},
+    'visibility': {'entries': [{'id': 'G:@public', 'title': 'Public'}]},
+  }
+
+
+def make_activities_json(count, term='somestring', html=False):
+  """Returns the body of an activities response, as a JSON string, containing count activities"""
+  return simplejson.dumps({'data': {
+    'kind': 'buzz#activityFeed',
+    'id': 'tag:google.com,2010:buzz-track:%s' % term,
+    'title': 'Google Buzz',
+    'updated': '2010-10-17T12:00:00.000Z',
+    'links': {'self': [{'href': 'https://www.googleapis.com/buzz/v1/activities/track?q=%s' % term}]},
+    'items': [make_activity(id, term, html) for id in range(count)],
+  }})
@@ -0,0 +1,65 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A bloom filter that can be saved as a string"""
+
+import array
+import hashlib
+import math
+import struct
+
+
+class BloomFilter(object):
+  """A set of strings which can say that a string is definitely not in it, or that it probably is.
+
+  It's sized so that once capacity strings have been added the chance of a string that wasn't added being reported
+  as present is about error_rate. Pass the result of tostring() as bits to get the same filter back."""
+
+  def __init__(self, capacity, error_rate=0.001, bits=None):
+    if capacity < 1:
+      raise ValueError('capacity must be at least 1')
+    if not 0 < error_rate < 1:
+      raise ValueError('error_rate must be between 0 and 1')
+    self.capacity = capacity
+    self.error_rate = error_rate
+    self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+    self.num_hashes = max(1, int(round(math.log(2) * self.num_bits / capacity)))
+    num_bytes = (self.num_bits + 7) // 8
+    if bits is None:
+      self.bits = array.array('B', [0]) * num_bytes
+    else:
+      if len(bits) != num_bytes:
+        raise ValueError('Expected %d bytes of bits but got %d' % (num_bytes, len(bits)))
+      self.bits = array.array('B', bits)
+
+  def _positions(self, key):
+    if isinstance(key, unicode):
+      key = key.encode('utf-8')
+    # Double hashing: the i'th position is h1 + i * h2 which is as good as having num_hashes independent hashes
+    h1, h2 = struct.unpack('<QQ', hashlib.md5(key).digest())
+    return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+  def add(self, key):
+    bits = self.bits
+    for position in self._positions(key):
+      bits[position >> 3] |= 1 << (position & 7)
+
+  def __contains__(self, key):
+    bits = self.bits
+    for position in self._positions(key):
+      if not bits[position >> 3] & (1 << (position & 7)):
+        return False
+    return True
+
+  def tostring(self):
+    return self.bits.tostring()
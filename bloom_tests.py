@@ -0,0 +1,53 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from bloom import BloomFilter
+
+import unittest
+
+
+class BloomFilterTest(unittest.TestCase):
+  def test_contains_everything_that_was_added(self):
+    bloom = BloomFilter(1000)
+    keys = ['tag:google.com,2010:buzz:z12%08d' % i for i in range(1000)]
+    for key in keys:
+      bloom.add(key)
+
+    for key in keys:
+      self.assertTrue(key in bloom)
+
+  def test_false_positive_rate_is_close_to_the_error_rate(self):
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+      bloom.add('added %d' % i)
+
+    false_positives = len([i for i in range(10000) if 'not added %d' % i in bloom])
+
+    self.assertTrue(false_positives < 200, false_positives)
+
+  def test_unicode_keys(self):
+    bloom = BloomFilter(10)
+    bloom.add(u'caf\xe9')
+
+    self.assertTrue(u'caf\xe9' in bloom)
+    self.assertTrue(u'caf\xe9'.encode('utf-8') in bloom)
+
+  def test_can_be_saved_and_restored(self):
+    bloom = BloomFilter(100)
+    bloom.add('a')
+
+    restored = BloomFilter(100, bits=bloom.tostring())
+
+    self.assertTrue('a' in restored)
+    self.assertFalse('b' in restored)
+    self.assertRaises(ValueError, BloomFilter, 200, 0.001, bloom.tostring())
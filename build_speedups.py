@@ -0,0 +1,70 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compiles the C speedups for the vendored simplejson in place and checks that they work.
+
+App Engine can't load C extensions, so there simplejson always runs in pure Python. Anywhere else, such as when
+running the tests or the benchmarks, compiling the speedups makes apiclient encode and decode JSON with them. If
+the compiled extension is missing or broken simplejson falls back to pure Python on its own.
+
+Run it like this:
+python build_speedups.py
+"""
+
+from distutils.core import Extension
+from distutils.core import setup
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SPEEDUPS = Extension('simplejson._speedups', [os.path.join('simplejson', '_speedups.c')])
+
+# Run in a fresh interpreter so that it sees the newly built extension
+CHECK = 'import simplejson; print simplejson.speedups_enabled()'
+
+
+def build():
+  """Returns True if the extension was compiled"""
+  build_temp = tempfile.mkdtemp()
+  try:
+    setup(name='simplejson-speedups', ext_modules=[SPEEDUPS],
+          script_args=['build_ext', '--inplace', '--build-temp', build_temp])
+    return True
+  except (SystemExit, Exception), e:
+    print >> sys.stderr, 'Could not compile the simplejson speedups: %s' % e
+    return False
+  finally:
+    shutil.rmtree(build_temp, ignore_errors=True)
+
+
+def verify():
+  """Returns True if a fresh interpreter imports simplejson with working speedups"""
+  output = subprocess.Popen([sys.executable, '-c', CHECK], cwd=ROOT, stdout=subprocess.PIPE).communicate()[0]
+  return output.strip() == 'True'
+
+
+def main():
+  os.chdir(ROOT)
+  if build() and verify():
+    print 'simplejson will use its C speedups'
+    return 0
+  print 'simplejson will run in pure Python'
+  return 1
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -15,6 +15,7 @@
 __author__ = 'ade@google.com'
 
 import apiclient.discovery
+import httplib2
 import logging
 import oauth_wrap
 import oauth2 as oauth
@@ -39,6 +40,10 @@ REQUEST_TOKEN_URL = 'https://www.google.com/accounts/OAuthGetRequestToken?domain
 AUTHORIZE_URL = 'https://www.google.com/buzz/api/auth/OAuthAuthorizeToken?domain=anonymous&scope=https://www.googleapis.com/auth/buzz'
 ACCESS_TOKEN_URL = 'https://www.google.com/accounts/OAuthGetAccessToken'
 
+# Responses to unauthenticated requests are the same for everyone so they can be cached for everyone.
+# Authenticated responses mustn't go in here because the cache is keyed by URI alone.
+PUBLIC_RESPONSE_CACHE = httplib2.MemoryCache(max_bytes=2 * 1024 * 1024)
+
 
 class Error(Exception):
   """Base error for this module."""
@@ -112,10 +117,15 @@ class BuzzGaeClient(object):
     d.update(access_token)
     return d
 
-  def build_api_client(self, oauth_params=None):
+  def build_api_client(self, oauth_params=None, model=None):
+    """model, if given, is the apiclient.discovery.JsonModel that encodes the client's requests and decodes its
+    responses"""
+    if model is None:
+      model = apiclient.discovery.JsonModel()
     if oauth_params is not None:
       http = oauth_wrap.get_authorised_http(oauth_params)
       return apiclient.discovery.build('buzz', 'v1', http=http, 
-        developerKey=self.api_key)
+        developerKey=self.api_key, model=model)
     else:
-      return apiclient.discovery.build('buzz', 'v1', developerKey=self.api_key)
+      http = httplib2.Http(cache=PUBLIC_RESPONSE_CACHE, pool=oauth_wrap.CONNECTION_POOL)
+      return apiclient.discovery.build('buzz', 'v1', http=http, developerKey=self.api_key, model=model)
@@ -0,0 +1,117 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how many chat messages per second can be dispatched by the commands module and by the
+regular expression and getattr based dispatch that XmppHandler used to do.
+
+Run it like this:
+python command_dispatch_benchmark.py [number of messages]
+"""
+
+import commands
+import re
+import sys
+import time
+
+MESSAGES = ['track some phrase', '  /TRACK another phrase  ', 'list', '?', 'post Hello world from the bot',
+            'untrack 12', 'search buzz', 'wibble', '/help', 'about']
+
+
+# The commands XmppHandler used to check for before looking up their methods
+LEGACY_COMMANDS = ['about', 'help', '?', 'list', 'post', 'track', 'untrack', 'search']
+
+
+class Handler(object):
+  """Has a method per command, like XmppHandler, but they don't do anything"""
+  def about_command(self, message):
+    pass
+
+  help_command = list_command = post_command = track_command = untrack_command = search_command = about_command
+
+  def unhandled_command(self, message):
+    pass
+
+
+def _legacy_extract_command_and_arg_from_string(string):
+  command = None
+  arg = None
+  results = re.search(r"\s*(\S*)\s*(.*)", string)
+  if results:
+    command = results.group(1)
+    arg = results.group(2)
+  else:
+    results = re.search(r"\s*(\S*)\s*", string)
+    if results:
+      command = results.group(1)
+  return (command,arg)
+
+
+def legacy_dispatch(handler, body):
+  command, arg = _legacy_extract_command_and_arg_from_string(body)
+  command = command.lower()
+  if command.startswith('/'):
+    command = command[1:]
+  if command == '?':
+    command = 'help'
+  if command and command in LEGACY_COMMANDS:
+    method = getattr(handler, '%s_command' % command, None)
+    if method:
+      method(arg)
+      return
+  handler.unhandled_command(arg)
+
+
+TABLE = commands.CommandTable()
+for _name in ['about', 'list', 'track', 'untrack', 'search']:
+  TABLE.register(_name, '%s_command' % _name)
+TABLE.register('post', 'post_command', abbreviate=False)
+TABLE.register('help', 'help_command', aliases=['?'])
+
+
+def table_dispatch(handler, body):
+  command, arg = commands.tokenize(body)
+  name = TABLE.handler_for(command)
+  if name:
+    getattr(handler, name)(arg)
+  else:
+    handler.unhandled_command(arg)
+
+
+def messages_per_second(dispatch, count, repeat=3):
+  handler = Handler()
+  messages = (MESSAGES * (count // len(MESSAGES) + 1))[:count]
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    for body in messages:
+      dispatch(handler, body)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return count / best
+
+
+def run(count=100000):
+  before = messages_per_second(legacy_dispatch, count)
+  after = messages_per_second(table_dispatch, count)
+  print '%-22s %14s' % ('dispatch', 'messages/s')
+  print '%-22s %14.0f' % ('regex and getattr', before)
+  print '%-22s %14.0f' % ('command table', after)
+  print 'speed up: %.2fx' % (after / before)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
@@ -0,0 +1,104 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Splits chat messages into a command and an argument and finds the handler for the command"""
+
+import re
+
+# Any white space, then a word (the command), then any white space, then everything after that (the argument)
+TOKENIZER = re.compile(r'\s*(\S*)\s*(.*)')
+
+# The old-style / prefixed commands are honoured as if they were slashless commands. This provides backwards
+# compatibility for early adopters and people who are used to IRC syntax.
+COMMAND_PREFIX = '/'
+
+
+def tokenize(string):
+  """Returns the (command, arg) in the string. Either of them may be empty."""
+  results = TOKENIZER.match(string)
+  return results.group(1), results.group(2)
+
+
+class CommandTable(object):
+  """Maps whatever someone typed to the name and handler of a command.
+
+  A command can be reached by its name, by any of its aliases, by any unambiguous prefix of its name that's at least
+  min_abbreviation characters long (so 'tr' means 'track') and by all of those with a leading slash, in any case.
+  Commands registered with abbreviate=False, such as ones that can't be undone, have to be typed in full.
+  Everything is precomputed into one dict whenever a command or alias is registered so that resolving a command is
+  a dict lookup rather than a search."""
+
+  def __init__(self, min_abbreviation=2):
+    self.min_abbreviation = min_abbreviation
+    self._handlers = {}
+    self._aliases = {}
+    self._unabbreviated = set()
+    self._lookup = {}
+
+  def register(self, name, handler, aliases=(), abbreviate=True):
+    name = name.lower()
+    self._handlers[name] = handler
+    if abbreviate:
+      self._unabbreviated.discard(name)
+    else:
+      self._unabbreviated.add(name)
+    for alias in aliases:
+      self._aliases[alias.lower()] = name
+    self._rebuild()
+
+  def add_alias(self, alias, name):
+    name = name.lower()
+    if name not in self._handlers:
+      raise KeyError('No such command: %s' % name)
+    self._aliases[alias.lower()] = name
+    self._rebuild()
+
+  def _rebuild(self):
+    lookup = {}
+
+    # A prefix only abbreviates a command if no other command starts with it, even one that can't be abbreviated
+    candidates = {}
+    for name in self._handlers:
+      for end in range(self.min_abbreviation, len(name)):
+        candidates.setdefault(name[:end], []).append(name)
+    for prefix, names in candidates.iteritems():
+      if len(names) == 1 and names[0] not in self._unabbreviated:
+        lookup[prefix] = names[0]
+
+    # Aliases and then full names overwrite any abbreviation that happens to be spelt the same way
+    lookup.update(self._aliases)
+    for name in self._handlers:
+      lookup[name] = name
+
+    for key, name in lookup.items():
+      lookup[COMMAND_PREFIX + key] = name
+    self._lookup = lookup
+
+  def resolve(self, command):
+    """Returns the name of the command that was typed or None if there isn't one"""
+    if not command:
+      return None
+    name = self._lookup.get(command)
+    if name is None:
+      name = self._lookup.get(command.lower())
+    return name
+
+  def handler_for(self, command):
+    """Returns the handler for the command that was typed or None if there isn't one"""
+    name = self.resolve(command)
+    if name is None:
+      return None
+    return self._handlers[name]
+
+  def names(self):
+    return sorted(self._handlers.keys())
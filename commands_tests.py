@@ -0,0 +1,92 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from commands import CommandTable, tokenize
+
+import unittest
+
+
+def track(message):
+  pass
+
+def untrack(message):
+  pass
+
+def help(message):
+  pass
+
+
+class TokenizeTest(unittest.TestCase):
+  def test_splits_command_from_arg(self):
+    self.assertEquals(('track', 'some  phrase'), tokenize('  track   some  phrase'))
+
+  def test_command_without_arg(self):
+    self.assertEquals(('list', ''), tokenize('list '))
+
+  def test_empty_string(self):
+    self.assertEquals(('', ''), tokenize(''))
+
+
+class CommandTableTest(unittest.TestCase):
+  def setUp(self):
+    self.table = CommandTable()
+    self.table.register('track', track)
+    self.table.register('untrack', untrack)
+    self.table.register('help', help, aliases=['?'])
+
+  def test_resolves_names_in_any_case_with_or_without_slash(self):
+    for command in ['track', 'TRACK', '/track', '/Track']:
+      self.assertEquals('track', self.table.resolve(command))
+      self.assertTrue(self.table.handler_for(command) is track)
+
+  def test_resolves_aliases(self):
+    self.assertEquals('help', self.table.resolve('?'))
+    self.assertEquals('help', self.table.resolve('/?'))
+
+  def test_resolves_unambiguous_abbreviations(self):
+    self.assertEquals('track', self.table.resolve('tr'))
+    self.assertEquals('untrack', self.table.resolve('UN'))
+    self.assertEquals('help', self.table.resolve('/hel'))
+
+  def test_does_not_resolve_abbreviations_that_are_too_short_or_ambiguous(self):
+    self.table.register('trace', help)
+
+    self.assertEquals(None, self.table.resolve('t'))
+    self.assertEquals(None, self.table.resolve('tra'))
+    self.assertEquals('trace', self.table.resolve('trace'))
+
+  def test_full_names_win_over_abbreviations(self):
+    self.table.register('tr', help)
+
+    self.assertEquals('tr', self.table.resolve('tr'))
+    self.assertEquals('track', self.table.resolve('tra'))
+
+  def test_unknown_commands_have_no_handler(self):
+    for command in ['', None, 'wibble', '~', '/']:
+      self.assertEquals(None, self.table.handler_for(command))
+
+  def test_commands_can_require_their_full_name(self):
+    self.table.register('post', help, abbreviate=False)
+    self.table.register('poll', track)
+
+    self.assertEquals(None, self.table.resolve('pos'))
+    self.assertEquals('post', self.table.resolve('/POST'))
+    # An unabbreviated command still makes the prefixes it shares with others ambiguous
+    self.assertEquals(None, self.table.resolve('po'))
+    self.assertEquals('poll', self.table.resolve('pol'))
+
+  def test_aliases_can_be_added_later(self):
+    self.table.add_alias('follow', 'track')
+
+    self.assertTrue(self.table.handler_for('follow') is track)
+    self.assertRaises(KeyError, self.table.add_alias, 'x', 'wibble')
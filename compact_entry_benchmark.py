@@ -0,0 +1,77 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares FeedParserDict entries with CompactEntrys: the memory each top level entry object takes, the time to parse
+a track feed into them and how many times a second pshb.ContentParser's reads can be done on them.
+
+Run it like this:
+python compact_entry_benchmark.py [number of entries]
+"""
+
+import benchmark_feeds
+import feedparser
+import sys
+import time
+
+
+def entry_size(entry):
+  size = sys.getsizeof(entry)
+  if hasattr(entry, '__dict__'):
+    size += sys.getsizeof(entry.__dict__)
+  if isinstance(entry, feedparser.CompactEntry):
+    size += sys.getsizeof(entry._overflow)
+  return size
+
+
+def read_like_content_parser(entry):
+  """The reads pshb.ContentParser makes to turn an entry into a Post"""
+  hasattr(entry, 'id') and entry.id
+  hasattr(entry, 'content') and entry.content[0].value
+  for link in entry.links:
+    link['rel']
+  entry.get('title', '')
+  entry.get('summary', '')
+  hasattr(entry, 'updated_parsed') and entry.updated_parsed
+  hasattr(entry, 'author_detail') and entry['author_detail']['name']
+
+
+def best_of(fn, repeat=3):
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    result = fn()
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return result, best
+
+
+def run(count=1000):
+  feed = benchmark_feeds.make_track_feed(count)
+  print '%-16s %14s %14s %14s' % ('entries', 'bytes/entry', 'parse us/entry', 'reads/s')
+  for name, compact in (('FeedParserDict', False), ('CompactEntry', True)):
+    entries, parse_time = best_of(lambda: feedparser.parse(feed, postprocess=feedparser.POSTPROCESS_NONE,
+                                                           compact=compact).entries)
+    def read_all():
+      for entry in entries:
+        read_like_content_parser(entry)
+    ignored, read_time = best_of(read_all)
+    size = sum([entry_size(entry) for entry in entries])
+    print '%-16s %14.0f %14.1f %14.0f' % (name, float(size) / count, parse_time / count * 1e6, count / read_time)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
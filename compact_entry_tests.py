@@ -0,0 +1,127 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from feedparser import CompactEntry, FeedParserDict
+from pshb import ContentParser
+
+import benchmark_feeds
+import entry_codec
+import feedparser
+import unittest
+
+RSS_FEED = '''<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+  <channel>
+    <title>A feed</title>
+    <item>
+      <title>An item</title>
+      <guid>http://example.com/1</guid>
+      <description>Some words</description>
+      <pubDate>Sun, 17 Oct 2010 21:31:44 GMT</pubDate>
+      <category domain="http://example.com/tags">things</category>
+      <enclosure url="http://example.com/1.mp3" length="42" type="audio/mpeg"/>
+      <comments>http://example.com/1/comments</comments>
+    </item>
+  </channel>
+</rss>
+'''
+
+
+def parse_entry(feed, compact):
+  return feedparser.parse(feed, compact=compact).entries[0]
+
+
+class CompactEntryTest(unittest.TestCase):
+  def setUp(self):
+    self.full = parse_entry(RSS_FEED, False)
+    self.compact = parse_entry(RSS_FEED, True)
+
+  def test_parse_can_make_compact_entries(self):
+    self.assertTrue(isinstance(self.compact, CompactEntry))
+    self.assertTrue(isinstance(self.full, FeedParserDict))
+    self.assertFalse(hasattr(self.compact, '__dict__'))
+
+  def test_has_the_same_keys_and_values(self):
+    self.assertEquals(sorted(self.full.keys()), sorted(self.compact.keys()))
+    for key in self.full.keys():
+      self.assertEquals(self.full[key], self.compact[key], key)
+    self.assertEquals(self.full, self.compact)
+    self.assertEquals(self.compact, self.full)
+    self.assertEquals(len(self.full), len(self.compact))
+
+  def test_aliases_and_derived_keys(self):
+    for key in ('guid', 'date', 'date_parsed', 'modified', 'description', 'category', 'categories', 'enclosures'):
+      self.assertEquals(self.full[key], self.compact[key], key)
+      self.assertEquals(getattr(self.full, key), getattr(self.compact, key), key)
+      self.assertTrue(key in self.compact, key)
+
+  def test_missing_keys(self):
+    self.assertRaises(KeyError, lambda: self.compact['author'])
+    self.assertRaises(KeyError, lambda: self.compact['nothing'])
+    self.assertFalse(hasattr(self.compact, 'author'))
+    self.assertFalse(hasattr(self.compact, 'nothing'))
+    self.assertFalse(hasattr(self.compact, 'license'))
+    self.assertEquals('default', self.compact.get('author', 'default'))
+    self.assertEquals(None, self.compact.get('license'))
+    self.assertFalse('nothing' in self.compact)
+
+  def test_setting_through_an_alias_sets_the_real_key(self):
+    entry = CompactEntry()
+    entry['date'] = '2010-10-17'
+    entry['guid'] = 'an id'
+    entry['extra'] = 'more'
+
+    self.assertEquals('2010-10-17', entry.updated)
+    self.assertEquals('an id', entry['id'])
+    self.assertEquals(['id', 'updated', 'extra'], entry.keys())
+    self.assertEquals('more', entry.setdefault('extra', 'other'))
+    self.assertEquals([], entry.setdefault('links', []))
+
+    del entry['guid']
+    del entry['extra']
+    self.assertEquals(['links', 'updated'], entry.keys())
+    self.assertRaises(KeyError, entry.__delitem__, 'id')
+
+  def test_can_be_made_from_any_mapping(self):
+    self.assertEquals(self.full, CompactEntry(self.full))
+    self.assertEquals(self.full, CompactEntry(self.compact))
+
+  def test_repr_is_the_same_as_a_dicts(self):
+    self.assertEquals(eval(repr(dict(self.full.items())).replace('time.struct_time', 'dict')),
+                      eval(repr(self.compact).replace('time.struct_time', 'dict')))
+
+  def test_unfinished_entries_are_compact_too(self):
+    result = feedparser.parse(RSS_FEED.replace('</item>', ''), compact=True)
+
+    self.assertTrue(result.bozo)
+    self.assertTrue(isinstance(result.entries[0], CompactEntry))
+
+  def test_round_trips_through_the_entry_codec(self):
+    entry = parse_entry(benchmark_feeds.make_track_feed(1, html=True), True)
+
+    self.assertEquals(entry, entry_codec.decode(entry_codec.encode(entry)))
+
+  def test_content_parser_extracts_the_same_posts(self):
+    feed = benchmark_feeds.make_track_feed(3, html=True)
+
+    compact = ContentParser(feed).extractPosts()
+    full = ContentParser(feed, compact=False).extractPosts()
+
+    for expected, post in zip(full, compact):
+      for attribute in ('url', 'feedUrl', 'title', 'content', 'datePublished', 'author', 'uniqueId'):
+        self.assertEquals(getattr(expected, attribute), getattr(post, attribute), attribute)
+      self.assertEquals(expected.getFeedParserEntry(), post.getFeedParserEntry())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,171 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import BaseHTTPServer
+import httplib2
+import oauth2 as oauth
+import oauth_wrap
+import threading
+import unittest
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def do_GET(self):
+    if self.path == '/redirect':
+      self.send_response(302)
+      self.send_header('Location', '/')
+      self.send_header('Content-Length', '0')
+      self.end_headers()
+      return
+    body = 'hello'
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/plain')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class StubConnection(object):
+  def __init__(self, sock=None):
+    self.sock = sock
+    self.closed = False
+
+  def close(self):
+    self.closed = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+  def test_returned_connections_are_reused(self):
+    pool = httplib2.ConnectionPool()
+    conn = pool.checkout('host', StubConnection)
+    pool.checkin('host', conn)
+
+    self.assertTrue(conn is pool.checkout('host', StubConnection))
+    self.assertEquals(1, pool.stats['hits'])
+    self.assertEquals(1, pool.stats['misses'])
+
+  def test_limits_connections_per_host(self):
+    pool = httplib2.ConnectionPool(max_per_host=1, wait_timeout=0.01)
+    pool.checkout('host', StubConnection)
+
+    # Another thread can't have a second connection to the same host
+    errors = []
+    def checkout():
+      try:
+        pool.checkout('host', StubConnection)
+      except httplib2.ConnectionPoolTimeout, e:
+        errors.append(e)
+    thread = threading.Thread(target=checkout)
+    thread.start()
+    thread.join()
+
+    self.assertEquals(1, len(errors))
+    self.assertEquals(1, pool.stats['waits'])
+    # But it can have a connection to a different host
+    pool.checkout('other host', StubConnection)
+
+  def test_waiting_checkout_gets_returned_connection(self):
+    pool = httplib2.ConnectionPool(max_per_host=1, wait_timeout=5)
+    conn = pool.checkout('host', StubConnection)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(pool.checkout('host', StubConnection)))
+    thread.start()
+
+    pool.checkin('host', conn)
+    thread.join()
+
+    self.assertTrue(results[0] is conn)
+
+  def test_idle_connections_expire(self):
+    pool = httplib2.ConnectionPool(idle_timeout=-1)
+    conn = pool.checkout('host', StubConnection)
+    pool.checkin('host', conn)
+
+    self.assertFalse(conn is pool.checkout('host', StubConnection))
+    self.assertTrue(conn.closed)
+    self.assertEquals(1, pool.stats['stale'])
+
+  def test_connections_are_only_checked_for_age_without_select(self):
+    pool = httplib2.ConnectionPool()
+    conn = StubConnection(sock='not a socket')
+    pool.checkin('host', pool.checkout('host', lambda: conn))
+    select = httplib2.select
+    httplib2.select = None
+    try:
+      self.assertTrue(conn is pool.checkout('host', StubConnection))
+    finally:
+      httplib2.select = select
+
+  def test_connections_returned_after_errors_are_discarded(self):
+    pool = httplib2.ConnectionPool()
+    conn = pool.checkout('host', StubConnection)
+    pool.checkin('host', conn, reusable=False)
+
+    self.assertTrue(conn.closed)
+    self.assertFalse(conn is pool.checkout('host', StubConnection))
+
+
+class PooledHttpTest(unittest.TestCase):
+  def setUp(self):
+    self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.setDaemon(True)
+    self.thread.start()
+    self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+  def test_connections_are_shared_between_http_instances(self):
+    pool = httplib2.ConnectionPool()
+
+    for i in range(3):
+      response, content = httplib2.Http(pool=pool).request(self.url)
+      self.assertEquals(200, response.status)
+      self.assertEquals('hello', content)
+
+    self.assertEquals(1, pool.stats['misses'])
+    self.assertEquals(2, pool.stats['hits'])
+
+  def test_redirects_to_the_same_host_reuse_the_connection(self):
+    pool = httplib2.ConnectionPool(max_per_host=1, wait_timeout=1)
+
+    response, content = httplib2.Http(pool=pool).request(self.url + 'redirect')
+
+    self.assertEquals(200, response.status)
+    self.assertEquals(0, pool.stats['waits'])
+
+  def test_wrapped_pooled_requests_are_signed_once(self):
+    signed = []
+    sign_request = oauth.Request.sign_request
+    def counting_sign_request(request, *args):
+      signed.append(request.url)
+      return sign_request(request, *args)
+    oauth.Request.sign_request = counting_sign_request
+    try:
+      consumer = oauth.Consumer('key', 'secret')
+      token = oauth.Token('token', 'token secret')
+      http = oauth_wrap.oauth_wrap(consumer, token, httplib2.Http(pool=httplib2.ConnectionPool()))
+      # The wrapper keeps the pool alive, so don't leave the server waiting on a kept-alive connection
+      response, content = http.request(self.url, headers={'connection': 'close'})
+    finally:
+      oauth.Request.sign_request = sign_request
+
+    self.assertEquals(200, response.status)
+    self.assertEquals([self.url], signed)
@@ -0,0 +1,80 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how many dates per second feedparser can parse from a 10,000 entry track feed: trying every date handler
+in turn as it used to, dispatching to the RFC 3339 fast path and the last handler that worked, and with the memo of
+recently parsed dates in front of that.
+
+Run it like this:
+python date_parsing_benchmark.py [number of entries]
+"""
+
+import benchmark_feeds
+import feedparser
+import re
+import sys
+import time
+
+DATE = re.compile(r'<(?:published|updated)>([^<]*)</')
+
+
+def legacy_parse_date(dateString):
+  for handler in feedparser._date_handlers:
+    try:
+      date9tuple = handler(dateString)
+      if not date9tuple: continue
+      map(int, date9tuple)
+      return date9tuple
+    except Exception:
+      pass
+  return None
+
+
+def cached_parse_date(dateString):
+  return feedparser._parse_date(dateString)
+
+
+def dates_per_second(parse_date, dates, repeat=3):
+  best = None
+  for i in range(repeat):
+    feedparser._date_cache[:] = [{}, {}]
+    start = time.time()
+    for dateString in dates:
+      parse_date(dateString)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return len(dates) / best
+
+
+def run(count=10000):
+  dates = DATE.findall(benchmark_feeds.make_track_feed(count))
+  for dateString in dates[:100]:
+    assert legacy_parse_date(dateString) == feedparser._parse_date(dateString), dateString
+
+  before = dates_per_second(legacy_parse_date, dates)
+  dispatched = dates_per_second(feedparser._dispatch_date, dates)
+  cached = dates_per_second(cached_parse_date, dates)
+  print '%d dates from %d entries' % (len(dates), count)
+  print '%-22s %14s' % ('parsing', 'dates/s')
+  print '%-22s %14.0f' % ('every handler', before)
+  print '%-22s %14.0f' % ('fast path', dispatched)
+  print '%-22s %14.0f' % ('fast path and memo', cached)
+  print 'speed up: %.2fx fast path, %.2fx with memo' % (dispatched / before, cached / before)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
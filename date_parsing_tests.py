@@ -0,0 +1,110 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import feedparser
+import unittest
+
+
+class Rfc3339Test(unittest.TestCase):
+  def assertParses(self, expected, dateString):
+    self.assertEquals(expected, tuple(feedparser._parse_date_rfc3339(dateString))[:6])
+
+  def test_utc(self):
+    self.assertParses((2010, 10, 17, 21, 31, 44), '2010-10-17T21:31:44Z')
+    self.assertParses((2010, 10, 17, 21, 31, 44), '2010-10-17t21:31:44z')
+
+  def test_fractional_seconds_are_dropped(self):
+    self.assertParses((2010, 10, 17, 21, 31, 44), '2010-10-17T21:31:44.999Z')
+
+  def test_offsets(self):
+    self.assertParses((2010, 10, 17, 19, 31, 44), '2010-10-17T21:31:44+02:00')
+    self.assertParses((2010, 10, 18, 3, 1, 44), '2010-10-17T21:31:44.5-0530')
+
+  def test_date_only(self):
+    self.assertParses((2010, 10, 17, 0, 0, 0), '2010-10-17')
+
+  def test_agrees_with_the_regular_expression_parser(self):
+    for dateString in ['2010-10-17T21:31:44Z', '2010-12-31T23:59:59-01:00', '2008-02-29T00:00:00+14:00']:
+      self.assertEquals(feedparser._parse_date_w3dtf(dateString), feedparser._parse_date_rfc3339(dateString))
+
+  def test_leaves_everything_else_to_the_other_handlers(self):
+    for dateString in ['', 'Sun, 17 Oct 2010 21:31:44 GMT', '20101017', '2010-10-17T21:31:44',
+                       '2010-10-17T21:31:44.Z', '2010-10-17T21:31:44+2:00', '2010-10-17 21:31:44Z']:
+      self.assertEquals(None, feedparser._parse_date_rfc3339(dateString), dateString)
+
+
+class ParseDateTest(unittest.TestCase):
+  def setUp(self):
+    self.handlers = feedparser._date_handlers[:]
+    self.calls = []
+    self.forget()
+
+  def tearDown(self):
+    feedparser._date_handlers[:] = self.handlers
+    self.forget()
+
+  def forget(self):
+    feedparser._last_date_handler = None
+    feedparser._date_cache[:] = [{}, {}]
+
+  def counting(self, handler):
+    def count(dateString):
+      self.calls.append(handler.__name__)
+      return handler(dateString)
+    count.__name__ = handler.__name__
+    return count
+
+  def test_parses_every_format_it_used_to(self):
+    self.assertEquals((2010, 10, 17, 21, 31, 44), tuple(feedparser._parse_date('Sun, 17 Oct 2010 21:31:44 GMT'))[:6])
+    self.assertEquals((2010, 10, 17, 21, 31, 44), tuple(feedparser._parse_date('2010-10-17T21:31:44.000Z'))[:6])
+    self.assertEquals(None, feedparser._parse_date('not a date'))
+
+  def test_tries_the_last_handler_that_worked_first(self):
+    feedparser.registerDateHandler(self.counting(feedparser._parse_date_rfc822))
+    feedparser.registerDateHandler(self.counting(feedparser._parse_date_perforce))
+
+    feedparser._parse_date('Sun, 17 Oct 2010 21:31:44 GMT')
+    self.assertEquals(['_parse_date_perforce', '_parse_date_rfc822'], self.calls)
+
+    self.calls = []
+    feedparser._parse_date('Mon, 18 Oct 2010 21:31:44 GMT')
+    self.assertEquals(['_parse_date_rfc822'], self.calls)
+
+  def test_remembers_dates_it_has_parsed(self):
+    feedparser.registerDateHandler(self.counting(feedparser._parse_date_rfc822))
+
+    first = feedparser._parse_date('Sun, 17 Oct 2010 21:31:44 GMT')
+    second = feedparser._parse_date('Sun, 17 Oct 2010 21:31:44 GMT')
+
+    self.assertEquals(first, second)
+    self.assertEquals(['_parse_date_rfc822'], self.calls)
+
+  def test_forgets_the_least_recently_used_dates(self):
+    feedparser.registerDateHandler(self.counting(feedparser._parse_date_rfc822))
+    dates = ['%s Oct 2010 21:31:44 GMT' % day for day in range(1, 29)]
+    size = feedparser._DATE_CACHE_SIZE
+    feedparser._DATE_CACHE_SIZE = 10
+    try:
+      for dateString in dates:
+        feedparser._parse_date(dateString)
+      self.calls = []
+      feedparser._parse_date(dates[-1])
+      feedparser._parse_date(dates[0])
+    finally:
+      feedparser._DATE_CACHE_SIZE = size
+
+    self.assertEquals(['_parse_date_rfc822'], self.calls)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,146 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from google.appengine.api import memcache
+from google.appengine.ext import db
+from stubs import StubSender
+from xmpp import DeliveryThrottle, Digest
+
+import executors
+import fanout
+import pshb
+import settings
+import unittest
+import xmpp
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1287316800.0
+
+  def __call__(self):
+    return self.now
+
+
+def make_posts(count):
+  return [pshb.Post(url='http://www.google.com/buzz/%d' % i, feedUrl='http://feed', title='Post %d' % i)
+          for i in range(count)]
+
+
+class DeliveryThrottleTest(unittest.TestCase):
+  def setUp(self):
+    self.clock = FakeClock()
+    self.throttle = DeliveryThrottle(clock=self.clock)
+    self.sender = StubSender()
+    self.fan_out = fanout.FanOut(self.sender, executors.InlineExecutor())
+
+  def tearDown(self):
+    db.delete(Digest.all(keys_only=True).fetch(1000))
+    memcache.flush_all()
+
+  def send(self, count, subscribers, term='somestring'):
+    return xmpp.send_posts(make_posts(count), subscribers, term, fan_out=self.fan_out,
+                           delivery_throttle=self.throttle)
+
+  def recipients(self):
+    recipients = set()
+    for batch, body in self.sender.sent:
+      recipients.update(batch)
+    return recipients
+
+  def test_sends_posts_at_once_within_the_burst(self):
+    self.send(settings.DELIVERY_BURST, ['foo@example.com'])
+
+    self.assertEquals(set(['foo@example.com']), self.recipients())
+    self.assertEquals(None, Digest.get_by_term('somestring'))
+
+  def test_posts_beyond_the_budget_wait_for_the_digest(self):
+    self.send(settings.DELIVERY_BURST, ['foo@example.com'])
+    self.sender.sent = []
+
+    self.send(3, ['foo@example.com', 'bar@example.com'])
+
+    self.assertEquals(set(['bar@example.com']), self.recipients())
+    self.assertEquals(['foo@example.com'], Digest.waiting('somestring'))
+
+  def test_waiting_subscribers_keep_waiting_until_the_digest_is_sent(self):
+    self.send(settings.DELIVERY_BURST + 1, ['foo@example.com'])
+    self.clock.now += 3600
+
+    self.send(1, ['foo@example.com'])
+
+    self.assertEquals([], self.sender.sent)
+    self.assertEquals(settings.DELIVERY_BURST + 2, Digest.get_by_term('somestring').total)
+
+  def test_digests_collapse_the_posts_into_one_message(self):
+    self.send(settings.DELIVERY_BURST + 5, ['foo@example.com'])
+
+    self.assertEquals(1, xmpp.send_digests(fan_out=self.fan_out))
+
+    self.assertEquals(set(['foo@example.com']), self.recipients())
+    body = self.sender.sent[0][1]
+    self.assertTrue(body.startswith('Digest of %d posts for [somestring]:' % (settings.DELIVERY_BURST + 5)))
+    self.assertEquals(None, Digest.get_by_term('somestring'))
+
+  def test_digests_of_terms_that_cannot_be_key_names(self):
+    self.send(settings.DELIVERY_BURST + 1, ['foo@example.com'], term='__x__')
+
+    self.assertEquals(1, xmpp.send_digests(fan_out=self.fan_out))
+
+    body = self.sender.sent[0][1]
+    self.assertTrue(body.startswith('Digest of %d posts for [__x__]:' % (settings.DELIVERY_BURST + 1)), body)
+    self.assertEquals(None, Digest.get_by_term('__x__'))
+
+  def test_subscribers_only_get_the_posts_since_they_started_waiting(self):
+    self.send(settings.DELIVERY_BURST, ['foo@example.com'])
+    self.send(settings.DELIVERY_BURST + 1, ['bar@example.com'])
+    self.send(2, ['foo@example.com', 'bar@example.com'])
+
+    digest = Digest.get_by_term('somestring')
+    messages = digest.messages()
+
+    self.assertEquals(['bar@example.com', 'foo@example.com'], digest.subscribers)
+    self.assertEquals('Digest of %d posts for [somestring]:' % (settings.DELIVERY_BURST + 3),
+                      messages[0][0])
+    self.assertEquals('Digest of 2 posts for [somestring]:', messages[settings.DELIVERY_BURST + 1][0])
+
+  def test_long_digests_count_the_posts_they_do_not_list(self):
+    self.send(settings.DIGEST_MAX_LINES + 10, ['foo@example.com'])
+
+    lines = Digest.get_by_term('somestring').messages()[0]
+
+    self.assertEquals(settings.DIGEST_MAX_LINES + 2, len(lines))
+    self.assertEquals('...and 10 more', lines[-1])
+
+  def test_popular_terms_go_to_the_digest_for_everyone(self):
+    self.throttle.popularity.add('popular', settings.POPULAR_TERM_THRESHOLD)
+
+    self.send(1, ['foo@example.com', 'bar@example.com'], term='popular')
+
+    self.assertEquals([], self.sender.sent)
+    self.assertEquals(['foo@example.com', 'bar@example.com'], Digest.waiting('popular'))
+
+  def test_stopword_terms_go_to_the_digest_for_everyone(self):
+    stopwords = settings.STOPWORDS
+    settings.STOPWORDS = ['the']
+    try:
+      self.send(1, ['foo@example.com'], term='the')
+    finally:
+      settings.STOPWORDS = stopwords
+
+    self.assertEquals([], self.sender.sent)
+    self.assertEquals(['foo@example.com'], Digest.waiting('the'))
+
+
+if __name__ == '__main__':
+  unittest.main()
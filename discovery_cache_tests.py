@@ -0,0 +1,138 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from apiclient import discovery
+
+import httplib2
+import os
+import shutil
+import simplejson
+import tempfile
+import unittest
+
+# Just enough of the Buzz discovery document to build activities().search()
+DISCOVERY_DOCUMENT = simplejson.dumps({
+  'restBasePath': '/buzz/v1/',
+  'resources': {
+    'activities': {
+      'methods': {
+        'search': {
+          'restPath': 'activities/search',
+          'httpMethod': 'GET',
+          'parameters': {
+            'q': {'restParameterType': 'query'},
+            'max-results': {'restParameterType': 'query'}
+          }
+        }
+      }
+    }
+  }
+})
+
+class CountingHttp(object):
+  """Returns the discovery document, or whatever it's given, and counts how often it was asked for"""
+  def __init__(self, status=200, content=DISCOVERY_DOCUMENT):
+    self.requests = 0
+    self.status = status
+    self.content = content
+
+  def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+    self.requests += 1
+    return httplib2.Response({'status': str(self.status)}), self.content
+
+class DiscoveryCacheTest(unittest.TestCase):
+  def setUp(self):
+    discovery.clearCache()
+
+  def tearDown(self):
+    discovery.clearCache()
+
+  def test_discovery_document_is_only_fetched_once(self):
+    http = CountingHttp()
+
+    discovery.build('buzz', 'v1', http=http)
+    discovery.build('buzz', 'v1', http=http)
+
+    self.assertEquals(1, http.requests)
+
+  def test_each_build_uses_its_own_http_and_key(self):
+    first_http = CountingHttp()
+    second_http = CountingHttp()
+
+    first = discovery.build('buzz', 'v1', http=first_http, developerKey='first')
+    second = discovery.build('buzz', 'v1', http=second_http, developerKey='second')
+
+    self.assertEquals(first.__class__, second.__class__)
+    self.assertTrue(first.activities()._http is first_http)
+    self.assertTrue(second.activities()._http is second_http)
+    self.assertTrue('key=second' in second.activities().search(q='foo').uri)
+
+  def test_resource_classes_are_shared(self):
+    service = discovery.build('buzz', 'v1', http=CountingHttp())
+
+    self.assertEquals(service.activities().__class__, service.activities().__class__)
+
+  def test_expired_entries_are_rebuilt(self):
+    http = CountingHttp()
+
+    discovery.build('buzz', 'v1', http=http)
+    discovery.build('buzz', 'v1', http=http, cacheTtl=0)
+
+    self.assertEquals(2, http.requests)
+
+  def test_snapshot_is_used_by_a_cold_process(self):
+    snapshot_dir = tempfile.mkdtemp()
+    try:
+      discovery.build('buzz', 'v1', http=CountingHttp(), snapshotDir=snapshot_dir)
+      discovery.clearCache()
+      http = CountingHttp()
+
+      service = discovery.build('buzz', 'v1', http=http, snapshotDir=snapshot_dir)
+
+      self.assertEquals(0, http.requests)
+      self.assertTrue(service.activities().search(q='foo').uri is not None)
+    finally:
+      shutil.rmtree(snapshot_dir)
+
+  def _snapshot_path(self, snapshot_dir):
+    return os.path.join(snapshot_dir, 'buzz.v1.discovery.json')
+
+  def test_failed_fetches_are_not_snapshotted(self):
+    snapshot_dir = tempfile.mkdtemp()
+    try:
+      error = simplejson.dumps({'error': {'code': 503, 'message': 'Unavailable'}})
+      self.assertRaises(KeyError, discovery.build, 'buzz', 'v1', http=CountingHttp(503, error),
+                        snapshotDir=snapshot_dir)
+      self.assertRaises(ValueError, discovery.build, 'buzz', 'v1', http=CountingHttp(200, '{"restBase'),
+                        snapshotDir=snapshot_dir)
+
+      self.assertFalse(os.path.exists(self._snapshot_path(snapshot_dir)))
+    finally:
+      shutil.rmtree(snapshot_dir)
+
+  def test_unreadable_snapshots_are_fetched_again(self):
+    snapshot_dir = tempfile.mkdtemp()
+    try:
+      f = open(self._snapshot_path(snapshot_dir), 'w')
+      f.write('<html>Server Error</html>')
+      f.close()
+      http = CountingHttp()
+
+      service = discovery.build('buzz', 'v1', http=http, snapshotDir=snapshot_dir)
+
+      self.assertEquals(1, http.requests)
+      self.assertTrue(service.activities().search(q='foo').uri is not None)
+      self.assertEquals(DISCOVERY_DOCUMENT, open(self._snapshot_path(snapshot_dir)).read())
+    finally:
+      shutil.rmtree(snapshot_dir)
+
@@ -0,0 +1,75 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how long feedparser takes to get a UTF-8 track feed from bytes to the start of parsing when it is passed
+straight through with how long detecting its encoding and converting it took, and prints how often each path was
+taken.
+
+Run it like this:
+python encoding_benchmark.py [number of entries]
+"""
+
+import benchmark_feeds
+import feedparser
+import sys
+import time
+
+
+class StopBeforeParsing(Exception):
+  pass
+
+
+def _stop(*args, **kwargs):
+  raise StopBeforeParsing()
+
+
+def time_to_parser(data, fast, repeat=5):
+  """Returns the best time parse() takes to reach the XML parser"""
+  isDeclaredUTF8 = feedparser._isDeclaredUTF8
+  make_parser = feedparser.xml.sax.make_parser
+  if not fast:
+    feedparser._isDeclaredUTF8 = lambda http_headers, data: 0
+  feedparser.xml.sax.make_parser = _stop
+  best = None
+  try:
+    for i in range(repeat):
+      start = time.time()
+      try:
+        feedparser.parse(data)
+      except StopBeforeParsing:
+        pass
+      elapsed = time.time() - start
+      if best is None or elapsed < best:
+        best = elapsed
+  finally:
+    feedparser._isDeclaredUTF8 = isDeclaredUTF8
+    feedparser.xml.sax.make_parser = make_parser
+  return best
+
+
+def run(count=1000):
+  for html in (False, True):
+    data = benchmark_feeds.make_track_feed(count, html=html)
+    data = data.replace('Google Buzz', u'Google Buzz \u00e9'.encode('utf-8'))
+    slow = time_to_parser(data, False)
+    fast = time_to_parser(data, True)
+    print '%s feed of %d bytes: detect and convert %.2fms, pass through %.2fms, %.1fx faster' % (
+        html and 'html' or 'text', len(data), slow * 1e3, fast * 1e3, slow / fast)
+  print 'paths taken: %(fast)d fast, %(slow)d slow' % feedparser.encodingPaths
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
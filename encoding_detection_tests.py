@@ -0,0 +1,86 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import benchmark_feeds
+import feedparser
+import unittest
+
+FEED = benchmark_feeds.make_track_feed(2).replace('Google Buzz', u'Google Buzz \u00e9\u00e8'.encode('utf-8'))
+
+
+class EncodingDetectionTest(unittest.TestCase):
+  def setUp(self):
+    self.paths = feedparser.encodingPaths.copy()
+
+  def tearDown(self):
+    feedparser.encodingPaths.update(self.paths)
+
+  def parse(self, data, headers=None):
+    feedparser.encodingPaths.update({'fast': 0, 'slow': 0})
+    return feedparser.parse(data, response_headers=headers)
+
+  def path(self):
+    if feedparser.encodingPaths['fast']:
+      return 'fast'
+    return 'slow'
+
+  def test_declared_utf8_takes_the_fast_path(self):
+    result = self.parse(FEED)
+
+    self.assertEquals('fast', self.path())
+    self.assertEquals('utf-8', result.encoding)
+    self.assertEquals(u'Google Buzz \u00e9\u00e8', result.feed.title)
+    self.assertFalse(result.bozo)
+
+  def test_the_fast_path_parses_the_same_as_the_slow_path(self):
+    fast = self.parse(FEED)
+    isDeclaredUTF8 = feedparser._isDeclaredUTF8
+    feedparser._isDeclaredUTF8 = lambda http_headers, data: 0
+    try:
+      slow = self.parse(FEED)
+    finally:
+      feedparser._isDeclaredUTF8 = isDeclaredUTF8
+
+    self.assertEquals('slow', self.path())
+    self.assertEquals(slow.encoding, fast.encoding)
+    self.assertEquals(slow.feed, fast.feed)
+    self.assertEquals(slow.entries, fast.entries)
+
+  def test_headers_that_agree_keep_the_fast_path(self):
+    for content_type in ('application/atom+xml', 'application/xml; charset=utf-8', 'text/xml; charset="UTF-8"'):
+      self.parse(FEED, {'Content-Type': content_type})
+      self.assertEquals('fast', self.path(), content_type)
+
+  def test_headers_that_disagree_take_the_slow_path(self):
+    for content_type in ('text/xml', 'application/atom+xml; charset=iso-8859-1', 'text/html'):
+      self.parse(FEED, {'Content-Type': content_type})
+      self.assertEquals('slow', self.path(), content_type)
+
+    self.parse(FEED, {'Content-Language': 'en'})
+    self.assertEquals('slow', self.path())
+
+  def test_other_documents_take_the_slow_path(self):
+    for data in (FEED.replace('UTF-8', 'ISO-8859-1'), '\xef\xbb\xbf' + FEED, FEED[FEED.index('?>') + 2:].lstrip()):
+      self.parse(data)
+      self.assertEquals('slow', self.path())
+
+  def test_invalid_utf8_is_still_detected(self):
+    result = self.parse(FEED.replace('Google Buzz', 'Google Buzz \xff'))
+
+    self.assertEquals('slow', self.path())
+    self.assertEquals('windows-1252', result.encoding)
+    self.assertTrue(isinstance(result.bozo_exception, feedparser.CharacterEncodingOverride))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,176 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A compact, versioned serialisation for FeedParser entries.
+
+An encoded entry is a two byte header followed by a payload:
+  byte 0: the format version, currently 1
+  byte 1: flags. FLAG_ZLIB means the payload is zlib compressed
+  payload: the entry converted to plain dicts, lists, tuples, strings and numbers and then marshalled
+
+Entries used to be stored as repr() strings which were read back with eval(). decode_legacy() still reads
+those, without evaluating them, so that old rows can be migrated.
+"""
+
+import compiler
+import feedparser
+import marshal
+import time
+import zlib
+
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+
+# Marshal format 2 is understood by every Python from 2.5 onwards
+MARSHAL_VERSION = 2
+
+# Payloads smaller than this are rarely worth compressing
+COMPRESSION_THRESHOLD = 512
+
+PLAIN_TYPES = (str, unicode, int, long, float, bool, type(None))
+
+
+class EntryCodecError(Exception):
+  """The encoded entry was corrupt or written by an unknown version of this module."""
+  pass
+
+
+def to_plain(value):
+  """Convert a FeedParser entry into built-in types that marshal understands"""
+  if isinstance(value, PLAIN_TYPES):
+    return value
+  if isinstance(value, feedparser.CompactEntry):
+    plain = {}
+    for key, item in value.iteritems():
+      plain[key] = to_plain(item)
+    return plain
+  if isinstance(value, dict):
+    # This also handles FeedParserDicts. Going straight to dict's methods avoids their alias lookups.
+    plain = {}
+    for key, item in dict.iteritems(value):
+      plain[key] = to_plain(item)
+    return plain
+  if isinstance(value, list):
+    return [to_plain(item) for item in value]
+  if isinstance(value, (tuple, time.struct_time)):
+    return tuple([to_plain(item) for item in value])
+  return unicode(value)
+
+
+def from_plain(value, key=None):
+  """Turn the output of to_plain back into the types FeedParser would have produced"""
+  if isinstance(value, dict):
+    # The keys were taken from a FeedParserDict so they've already been through its alias mapping
+    entry = feedparser.FeedParserDict()
+    for item_key, item in value.iteritems():
+      dict.__setitem__(entry, item_key, from_plain(item, item_key))
+    return entry
+  if isinstance(value, list):
+    return [from_plain(item) for item in value]
+  if isinstance(value, tuple) and key and key.endswith('_parsed') and len(value) == 9:
+    return time.struct_time(value)
+  return value
+
+
+def encode(entry, compress=True):
+  payload = marshal.dumps(to_plain(entry), MARSHAL_VERSION)
+  flags = 0
+  if compress and len(payload) >= COMPRESSION_THRESHOLD:
+    compressed = zlib.compress(payload)
+    if len(compressed) < len(payload):
+      payload = compressed
+      flags |= FLAG_ZLIB
+  return chr(FORMAT_VERSION) + chr(flags) + payload
+
+
+def is_encoded(data):
+  return bool(data) and len(data) >= 2 and ord(data[0]) == FORMAT_VERSION
+
+
+def decode(data):
+  if not is_encoded(data):
+    raise EntryCodecError('Unknown entry format version')
+  flags = ord(data[1])
+  payload = data[2:]
+  try:
+    if flags & FLAG_ZLIB:
+      payload = zlib.decompress(payload)
+    return from_plain(marshal.loads(payload))
+  except (ValueError, EOFError, TypeError, zlib.error), e:
+    raise EntryCodecError('Corrupt entry: %s' % e)
+
+
+# The names a repr() can contain and the values they stand for
+_LEGACY_NAMES = {'None': None, 'True': True, 'False': False}
+
+_STRUCT_TIME_FIELDS = ('tm_year', 'tm_mon', 'tm_mday', 'tm_hour', 'tm_min', 'tm_sec', 'tm_wday', 'tm_yday',
+                       'tm_isdst')
+
+
+def _literal(node):
+  """Build the value of a parsed repr(), refusing anything that isn't a literal or time.struct_time(...)"""
+  if isinstance(node, compiler.ast.Const):
+    return node.value
+  if isinstance(node, compiler.ast.Name) and node.name in _LEGACY_NAMES:
+    return _LEGACY_NAMES[node.name]
+  if isinstance(node, compiler.ast.UnarySub) and isinstance(node.expr, compiler.ast.Const):
+    return -node.expr.value
+  if isinstance(node, compiler.ast.Dict):
+    plain = {}
+    for key, value in node.items:
+      plain[_literal(key)] = _literal(value)
+    return plain
+  if isinstance(node, compiler.ast.List):
+    return [_literal(item) for item in node.nodes]
+  if isinstance(node, compiler.ast.Tuple):
+    return tuple([_literal(item) for item in node.nodes])
+  if _is_struct_time(node):
+    return _struct_time(node)
+  raise EntryCodecError('Legacy entry contains %s which is not a literal' % node.__class__.__name__)
+
+
+def _is_struct_time(node):
+  return (isinstance(node, compiler.ast.CallFunc) and isinstance(node.node, compiler.ast.Getattr)
+          and isinstance(node.node.expr, compiler.ast.Name) and node.node.expr.name == 'time'
+          and node.node.attrname == 'struct_time' and node.star_args is None and node.dstar_args is None)
+
+
+def _struct_time(node):
+  """Python 2.6 and later write a time.struct_time as time.struct_time(tm_year=..., ...)"""
+  if len(node.args) == 1 and not isinstance(node.args[0], compiler.ast.Keyword):
+    fields = _literal(node.args[0])
+  else:
+    values = {}
+    for position, arg in enumerate(node.args):
+      if isinstance(arg, compiler.ast.Keyword):
+        values[arg.name] = _literal(arg.expr)
+      elif position < len(_STRUCT_TIME_FIELDS):
+        values[_STRUCT_TIME_FIELDS[position]] = _literal(arg)
+    if sorted(values.keys()) != sorted(_STRUCT_TIME_FIELDS):
+      raise EntryCodecError('Legacy entry contains a malformed time.struct_time')
+    fields = [values[field] for field in _STRUCT_TIME_FIELDS]
+  if len(fields) != len(_STRUCT_TIME_FIELDS):
+    raise EntryCodecError('Legacy entry contains a malformed time.struct_time')
+  return tuple(fields)
+
+
+def decode_legacy(entry_string):
+  """Read an entry which was stored as repr(entry).
+
+  The string is parsed, not evaluated: only literals and time.struct_time(...) are accepted and anything else
+  raises EntryCodecError."""
+  try:
+    tree = compiler.parse(entry_string, 'eval')
+  except SyntaxError, e:
+    raise EntryCodecError('Corrupt legacy entry: %s' % e)
+  return from_plain(_literal(tree.node))
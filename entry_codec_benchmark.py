@@ -0,0 +1,72 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares the entry_codec format with the repr/eval format that Post.entryString used to hold.
+
+Run it like this:
+python entry_codec_benchmark.py [number of entries]
+"""
+
+import benchmark_feeds
+import entry_codec
+import feedparser
+import sys
+import time
+
+
+def _time_per_entry(fn, items, repeat=3):
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    for item in items:
+      fn(item)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best / len(items)
+
+
+def _legacy_encode(entry):
+  return repr(entry)
+
+
+def _encode_uncompressed(entry):
+  return entry_codec.encode(entry, compress=False)
+
+
+FORMATS = [
+  ('repr', _legacy_encode, entry_codec.decode_legacy),
+  ('marshal', _encode_uncompressed, entry_codec.decode),
+  ('marshal+zlib', entry_codec.encode, entry_codec.decode),
+]
+
+
+def run(count=200):
+  for html in (False, True):
+    entries = feedparser.parse(benchmark_feeds.make_track_feed(count, html=html)).entries
+    print '%d entries, html content: %s' % (len(entries), html)
+    print '%-14s %12s %14s %14s' % ('format', 'bytes/entry', 'encode us', 'decode us')
+    for name, encode, decode in FORMATS:
+      encoded = [encode(entry) for entry in entries]
+      size = sum([len(data) for data in encoded]) / float(len(encoded))
+      encode_time = _time_per_entry(encode, entries)
+      decode_time = _time_per_entry(decode, encoded)
+      print '%-14s %12.0f %14.1f %14.1f' % (name, size, encode_time * 1e6, decode_time * 1e6)
+    print
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
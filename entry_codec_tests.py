@@ -0,0 +1,90 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import benchmark_feeds
+import entry_codec
+import feedparser
+import time
+import unittest
+
+
+class EntryCodecTest(unittest.TestCase):
+  def _parse_entry(self, html=False):
+    return feedparser.parse(benchmark_feeds.make_track_feed(1, html=html)).entries[0]
+
+  def test_round_trips_feedparser_entry(self):
+    entry = self._parse_entry()
+
+    decoded = entry_codec.decode(entry_codec.encode(entry))
+
+    self.assertEquals(entry, decoded)
+    self.assertTrue(isinstance(decoded, feedparser.FeedParserDict))
+    self.assertEquals(entry.title, decoded.title)
+    self.assertEquals(entry.content[0].value, decoded.content[0].value)
+    self.assertEquals(entry.links[0]['href'], decoded.links[0]['href'])
+
+  def test_parsed_dates_come_back_as_struct_times(self):
+    entry = self._parse_entry()
+
+    decoded = entry_codec.decode(entry_codec.encode(entry))
+
+    self.assertTrue(isinstance(decoded.updated_parsed, time.struct_time))
+    self.assertEquals(tuple(entry.updated_parsed), tuple(decoded.updated_parsed))
+
+  def test_compressed_and_uncompressed_entries_decode_identically(self):
+    entry = self._parse_entry(html=True)
+    compressed = entry_codec.encode(entry)
+    uncompressed = entry_codec.encode(entry, compress=False)
+
+    self.assertTrue(len(compressed) < len(uncompressed))
+    self.assertEquals(entry_codec.decode(uncompressed), entry_codec.decode(compressed))
+
+  def test_small_entries_are_not_compressed(self):
+    encoded = entry_codec.encode(feedparser.FeedParserDict({'id': 'http://example.com/feed'}))
+
+    self.assertEquals(0, ord(encoded[1]) & entry_codec.FLAG_ZLIB)
+
+  def test_encoded_entries_are_smaller_than_legacy_entries(self):
+    entry = self._parse_entry()
+
+    self.assertTrue(len(entry_codec.encode(entry)) < len(repr(entry)))
+
+  def test_reads_legacy_repr_entries(self):
+    entry = self._parse_entry()
+
+    decoded = entry_codec.decode_legacy(repr(entry))
+
+    self.assertEquals(entry.title, decoded.title)
+    self.assertEquals(tuple(entry.updated_parsed), tuple(decoded.updated_parsed))
+
+  def test_legacy_entries_cannot_call_builtins(self):
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode_legacy, "open('/etc/passwd')")
+
+  def test_legacy_entries_cannot_reach_other_classes(self):
+    subclasses = "().__class__.__bases__[0].__subclasses__()"
+    payload = "{'id': [c for c in %s if c.__name__ == 'file'][0]('/etc/passwd')}" % subclasses
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode_legacy, payload)
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode_legacy, subclasses)
+
+  def test_legacy_entries_must_be_well_formed(self):
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode_legacy, "{'id': ")
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode_legacy, "{'x': time.struct_time(tm_year=2010)}")
+
+  def test_rejects_unknown_versions(self):
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode, "{'id': 'legacy'}")
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode, '')
+
+  def test_rejects_corrupt_entries(self):
+    encoded = entry_codec.encode(self._parse_entry())
+
+    self.assertRaises(entry_codec.EntryCodecError, entry_codec.decode, encoded[:len(encoded) / 2])
@@ -0,0 +1,124 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Executors decide where and when a piece of work runs.
+
+They all share a single method: submit(fn, *args, **kwargs). Keyword arguments that start with an underscore,
+such as _countdown or _name, are task options in the style of the deferred library. Executors that don't
+understand them ignore them.
+
+This module deliberately doesn't import anything from AppEngine at load time so that it can be used from tests
+and benchmarks which run outside the SDK.
+"""
+
+import logging
+import Queue
+import threading
+
+
+def _strip_task_options(kwargs):
+  return dict([(key, value) for key, value in kwargs.items() if not key.startswith('_')])
+
+
+class InlineExecutor(object):
+  """Runs work immediately in the calling thread. Useful for tests and for local benchmarks."""
+
+  def submit(self, fn, *args, **kwargs):
+    return fn(*args, **_strip_task_options(kwargs))
+
+
+class ThreadPoolExecutor(object):
+  """Runs work on a bounded pool of worker threads.
+
+  The Python 2.5 AppEngine runtime doesn't allow threads so this is only for local use such as benchmarking a
+  sender against a stub."""
+
+  def __init__(self, max_workers=4, max_pending=0):
+    self.queue = Queue.Queue(max_pending)
+    self.workers = []
+    for i in range(max_workers):
+      worker = threading.Thread(target=self._work)
+      worker.setDaemon(True)
+      worker.start()
+      self.workers.append(worker)
+
+  def _work(self):
+    while True:
+      fn, args, kwargs = self.queue.get()
+      try:
+        try:
+          fn(*args, **kwargs)
+        except Exception, e:
+          logging.exception('Work submitted to thread pool failed: %s' % e)
+      finally:
+        self.queue.task_done()
+
+  def submit(self, fn, *args, **kwargs):
+    self.queue.put((fn, args, _strip_task_options(kwargs)))
+
+  def join(self):
+    """Block until all the work submitted so far has finished"""
+    self.queue.join()
+
+
+class LocalTaskQueue(object):
+  """Keeps submitted work in memory until it's run explicitly, so tests decide when queued work happens.
+
+  Like the task queue, work submitted with a _name that has already been used is dropped."""
+
+  def __init__(self):
+    self.tasks = []
+    self.names = set()
+
+  def __len__(self):
+    return len(self.tasks)
+
+  def submit(self, fn, *args, **kwargs):
+    name = kwargs.get('_name')
+    if name is not None:
+      if name in self.names:
+        return None
+      self.names.add(name)
+    self.tasks.append((fn, args, _strip_task_options(kwargs)))
+
+  def run_next(self):
+    """Run the oldest piece of work. Returns False if there wasn't any."""
+    if not self.tasks:
+      return False
+    fn, args, kwargs = self.tasks.pop(0)
+    fn(*args, **kwargs)
+    return True
+
+
+class DeferredExecutor(object):
+  """Runs work on the AppEngine task queue using the deferred library so the current request can finish at once.
+
+  The function and its arguments must be picklable, so pass module-level functions rather than bound methods."""
+
+  def __init__(self, queue='default'):
+    self.queue = queue
+
+  def submit(self, fn, *args, **kwargs):
+    try:
+      from google.appengine.api import taskqueue
+    except ImportError:
+      # Older SDKs only have the labs version
+      from google.appengine.api.labs import taskqueue
+    from google.appengine.ext import deferred
+    kwargs.setdefault('_queue', self.queue)
+    try:
+      return deferred.defer(fn, *args, **kwargs)
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+      # Named work is only ever done once
+      logging.info('Task %s has already been added' % kwargs.get('_name'))
+      return None
@@ -0,0 +1,89 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Delivers lines of text to many chat subscribers without blocking the request that produced them.
+
+The lines are coalesced into as few messages as possible. Every subscriber of a search term gets the same
+messages so each message is sent to a batch of subscribers with a single call to the sender. The sends are handed
+to an executor which decides where they run: the task queue in production, the calling thread in tests or a
+thread pool when benchmarking a stub sender.
+"""
+
+import executors
+import logging
+
+# Keep messages comfortably below the size at which chat clients start to truncate or split them
+MAX_MESSAGE_LENGTH = 4000
+MAX_LINES_PER_MESSAGE = 10
+
+# How many recipients are passed to a single call of the sender
+MAX_RECIPIENTS_PER_SEND = 100
+
+
+def coalesce(lines, max_lines=MAX_LINES_PER_MESSAGE, max_length=MAX_MESSAGE_LENGTH):
+  """Join lines into newline separated messages that hold at most max_lines lines and, unless a single line is
+  longer than that, max_length characters."""
+  messages = []
+  current = []
+  current_length = 0
+  for line in lines:
+    extra = len(line)
+    if current:
+      extra += 1
+    if current and (len(current) >= max_lines or current_length + extra > max_length):
+      messages.append('\n'.join(current))
+      current = []
+      current_length = 0
+      extra = len(line)
+    current.append(line)
+    current_length += extra
+  if current:
+    messages.append('\n'.join(current))
+  return messages
+
+
+def send_message(sender, recipients, body):
+  """Module level so that it can be pickled by the deferred library"""
+  sender.send(recipients, body)
+
+
+class FanOut(object):
+  def __init__(self, sender, executor=None, max_lines_per_message=MAX_LINES_PER_MESSAGE,
+               max_message_length=MAX_MESSAGE_LENGTH, max_recipients_per_send=MAX_RECIPIENTS_PER_SEND):
+    """
+    Args:
+      sender: anything with a send(recipients, body) method.
+      executor: anything with a submit(fn, *args) method. Defaults to sending in the calling thread.
+    """
+    self.sender = sender
+    if executor is None:
+      executor = executors.InlineExecutor()
+    self.executor = executor
+    self.max_lines_per_message = max_lines_per_message
+    self.max_message_length = max_message_length
+    self.max_recipients_per_send = max_recipients_per_send
+
+  def deliver(self, recipients, lines):
+    """Coalesce the lines into messages and submit one send per message per batch of recipients.
+    Returns the number of sends submitted."""
+    if not recipients or not lines:
+      return 0
+    messages = coalesce(lines, self.max_lines_per_message, self.max_message_length)
+    sends = 0
+    for start in range(0, len(recipients), self.max_recipients_per_send):
+      batch = list(recipients[start:start + self.max_recipients_per_send])
+      for body in messages:
+        self.executor.submit(send_message, self.sender, batch, body)
+        sends += 1
+    logging.debug('Submitted %s sends of %s lines to %s recipients' % (sends, len(lines), len(recipients)))
+    return sends
@@ -0,0 +1,72 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from fanout import coalesce, FanOut
+from stubs import StubSender
+
+import executors
+import unittest
+
+
+class CoalesceTest(unittest.TestCase):
+  def test_joins_lines_into_one_message(self):
+    self.assertEquals(['a\nb\nc'], coalesce(['a', 'b', 'c']))
+
+  def test_splits_messages_with_too_many_lines(self):
+    self.assertEquals(['a\nb', 'c\nd', 'e'], coalesce(['a', 'b', 'c', 'd', 'e'], max_lines=2))
+
+  def test_splits_messages_that_would_be_too_long(self):
+    self.assertEquals(['aaaa\nbbbb', 'cccc'], coalesce(['aaaa', 'bbbb', 'cccc'], max_length=9))
+
+  def test_never_drops_a_line_that_is_longer_than_the_limit(self):
+    self.assertEquals(['a', 'bbbbbbbbbb', 'c'], coalesce(['a', 'bbbbbbbbbb', 'c'], max_length=3))
+
+  def test_handles_no_lines(self):
+    self.assertEquals([], coalesce([]))
+
+
+class FanOutTest(unittest.TestCase):
+  def test_sends_one_message_to_all_recipients(self):
+    sender = StubSender()
+    fan_out = FanOut(sender)
+
+    sends = fan_out.deliver(['a@example.com', 'b@example.com'], ['post 1', 'post 2'])
+
+    self.assertEquals(1, sends)
+    self.assertEquals([(['a@example.com', 'b@example.com'], 'post 1\npost 2')], sender.sent)
+
+  def test_batches_recipients(self):
+    sender = StubSender()
+    fan_out = FanOut(sender, max_recipients_per_send=2)
+
+    fan_out.deliver(['a', 'b', 'c'], ['post'])
+
+    self.assertEquals([(['a', 'b'], 'post'), (['c'], 'post')], sender.sent)
+
+  def test_sends_nothing_when_there_is_nothing_to_send(self):
+    sender = StubSender()
+    fan_out = FanOut(sender)
+
+    self.assertEquals(0, fan_out.deliver([], ['post']))
+    self.assertEquals(0, fan_out.deliver(['a'], []))
+    self.assertEquals([], sender.sent)
+
+  def test_can_send_from_a_thread_pool(self):
+    sender = StubSender()
+    executor = executors.ThreadPoolExecutor(max_workers=2)
+    fan_out = FanOut(sender, executor=executor, max_lines_per_message=1)
+
+    fan_out.deliver(['a'], ['1', '2', '3'])
+    executor.join()
+
+    self.assertEquals(['1', '2', '3'], sorted([body for recipients, body in sender.sent]))
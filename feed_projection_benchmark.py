@@ -0,0 +1,67 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares parsing track feeds into every field feedparser knows with parsing them into just the fields that
+pshb.ContentParser reads: the time per entry, the dicts left in each entry and the size each entry is stored at.
+
+Run it like this:
+python feed_projection_benchmark.py [number of entries]
+"""
+
+import benchmark_feeds
+import entry_codec
+import feedparser
+import sys
+import time
+
+# The same as pshb.ContentParser.ENTRY_FIELDS, which can't be imported without App Engine
+ENTRY_FIELDS = ('id', 'link', 'links', 'title', 'content', 'summary', 'description', 'updated_parsed', 'author',
+                'author_detail')
+
+
+def count_dicts(value):
+  if isinstance(value, dict):
+    return 1 + sum([count_dicts(child) for child in value.values()])
+  if isinstance(value, list):
+    return sum([count_dicts(child) for child in value])
+  return 0
+
+
+def parse(feed, fields, repeat=3):
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    result = feedparser.parse(feed, postprocess=feedparser.POSTPROCESS_NONE, fields=fields)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return result.entries, best
+
+
+def run(count=200):
+  print '%-7s %-10s %12s %14s %14s' % ('content', 'fields', 'us/entry', 'dicts/entry', 'bytes/entry')
+  for html in (False, True):
+    feed = benchmark_feeds.make_track_feed(count, html=html)
+    for name, fields in (('all', None), ('projected', ENTRY_FIELDS)):
+      entries, elapsed = parse(feed, fields)
+      dicts = count_dicts(entries)
+      size = sum([len(entry_codec.encode(entry)) for entry in entries])
+      print '%-7s %-10s %12.1f %14.1f %14.0f' % (html and 'html' or 'text', name, elapsed / count * 1e6,
+                                                 float(dicts) / count, float(size) / count)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
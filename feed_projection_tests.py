@@ -0,0 +1,111 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from pshb import ContentParser
+
+import benchmark_feeds
+import feedparser
+import unittest
+
+RSS_FEED = '''<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel>
+    <title>A feed</title>
+    <link>http://example.com/</link>
+    <item>
+      <title>An item</title>
+      <link>http://example.com/1</link>
+      <guid isPermaLink="false">item-1</guid>
+      <description>Some &lt;b&gt;words&lt;/b&gt; &amp;amp; more</description>
+      <dc:date>2010-10-17T21:31:44Z</dc:date>
+      <category>things</category>
+      <comments>http://example.com/1/comments</comments>
+    </item>
+  </channel>
+</rss>
+'''
+
+RSS_CONTENT_FEED = RSS_FEED.replace(
+    'xmlns:dc=', 'xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:dc=').replace(
+    '<category>', '<content:encoded>&lt;p&gt;All of the words&lt;/p&gt;</content:encoded>\n      <category>')
+
+
+class FeedProjectionTest(unittest.TestCase):
+  def test_entries_only_get_the_fields_asked_for(self):
+    feed = benchmark_feeds.make_track_feed(2)
+
+    entry = feedparser.parse(feed, fields=['id', 'title']).entries[1]
+
+    self.assertEquals(['id', 'title', 'title_detail'], sorted(entry.keys()))
+    self.assertEquals('tag:google.com,2010:buzz:z1200000001', entry.id)
+
+  def test_the_fields_are_the_same_as_without_a_projection(self):
+    feed = benchmark_feeds.make_track_feed(3, html=True)
+    fields = ['id', 'link', 'links', 'title', 'content', 'updated_parsed', 'author_detail']
+
+    everything = feedparser.parse(feed).entries
+    projected = feedparser.parse(feed, fields=fields).entries
+
+    for full, entry in zip(everything, projected):
+      for field in ['id', 'link', 'title', 'title_detail', 'updated_parsed', 'updated', 'author', 'author_detail']:
+        self.assertEquals(full[field], entry[field], field)
+      self.assertEquals(full.content[0], entry.content[0])
+      self.assertEquals(full.links[:2], entry.links[:2])
+
+  def test_skips_whole_elements_with_everything_inside_them(self):
+    entry = feedparser.parse(benchmark_feeds.make_track_feed(1), fields=['content']).entries[0]
+
+    # The activity:object has a content element of its own
+    self.assertEquals(1, len(entry.content))
+    self.assertFalse('activity_verb' in entry)
+    self.assertFalse('source' in entry)
+
+  def test_the_feed_is_not_projected(self):
+    feed = benchmark_feeds.make_track_feed(1)
+
+    self.assertEquals(feedparser.parse(feed).feed, feedparser.parse(feed, fields=['id']).feed)
+
+  def test_fields_filled_in_by_differently_named_elements(self):
+    entry = feedparser.parse(RSS_FEED, fields=['id', 'summary', 'updated_parsed', 'tags']).entries[0]
+
+    self.assertEquals('item-1', entry.id)
+    self.assertEquals(u'Some <b>words</b> &amp; more', entry.summary)
+    self.assertEquals((2010, 10, 17, 21, 31, 44), tuple(entry.updated_parsed)[:6])
+    self.assertEquals('things', entry.tags[0].term)
+    self.assertFalse('link' in entry)
+    self.assertFalse('comments' in entry)
+
+  def test_the_loose_parser_projects_too(self):
+    result = feedparser.parse(RSS_FEED.replace('</channel>', ''), fields=['title'])
+
+    self.assertTrue(result.bozo)
+    self.assertEquals(['title', 'title_detail'], sorted(result.entries[0].keys()))
+
+  def test_content_parser_extracts_the_same_posts(self):
+    for feed in (benchmark_feeds.make_track_feed(3, html=True), RSS_CONTENT_FEED):
+      projected = ContentParser(feed).extractPosts()
+      everything = ContentParser(feed, fields=None).extractPosts()
+
+      self.assertEquals(len(everything), len(projected))
+      for expected, post in zip(everything, projected):
+        for attribute in ('url', 'feedUrl', 'title', 'content', 'datePublished', 'author', 'uniqueId'):
+          self.assertEquals(getattr(expected, attribute), getattr(post, attribute), attribute)
+
+  def test_rss_content_modules_fill_in_content(self):
+    entry = feedparser.parse(RSS_CONTENT_FEED, fields=['content']).entries[0]
+
+    self.assertEquals(u'<p>All of the words</p>', entry.content[0].value)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -75,8 +75,33 @@ RESOLVE_RELATIVE_URIS = 1
 # HTML content, set this to 1.
 SANITIZE_HTML = 1
 
+# How much post-processing parse() does to embedded HTML by default.  Each
+# stage re-parses the HTML, so callers that never render it can pass a
+# cheaper setting as parse()'s postprocess argument:
+# POSTPROCESS_FULL resolves relative URIs, parses microformats and sanitizes
+# (as far as RESOLVE_RELATIVE_URIS and SANITIZE_HTML allow),
+# POSTPROCESS_SANITIZE only sanitizes and POSTPROCESS_NONE leaves the HTML
+# as the feed sent it.
+POSTPROCESS_NONE = 'none'
+POSTPROCESS_SANITIZE = 'sanitize'
+POSTPROCESS_FULL = 'full'
+POSTPROCESS_STAGES = (POSTPROCESS_NONE, POSTPROCESS_SANITIZE, POSTPROCESS_FULL)
+
+# parse()'s fields argument names the entry keys a caller reads.  An element
+# of an entry fills in the key named after its start handler, or after the
+# element itself when there's no handler, and these keys are filled in by
+# elements named otherwise.
+PROJECTION_ELEMENTS = {'id': ['guid'],
+                       'links': ['link'],
+                       'summary': ['description'],
+                       'tags': ['category'],
+                       'author_detail': ['author'],
+                       'contributors': ['contributor'],
+                       'enclosures': ['enclosure', 'link'],
+                       'content': ['content_encoded', 'body', 'xhtml_body', 'fullitem']}
+
 # ---------- required modules (should come with any Python distribution) ----------
-import sgmllib, re, sys, copy, urlparse, time, rfc822, types, cgi, urllib, urllib2
+import sgmllib, re, sys, copy, urlparse, time, calendar, rfc822, types, cgi, urllib, urllib2
 try:
     from cStringIO import StringIO as _StringIO
 except:
@@ -295,6 +320,178 @@ class FeedParserDict(UserDict):
     def __contains__(self, key):
         return self.has_key(key)
 
+def _compactSlotGetter(name):
+    get = CompactEntry.__dict__[name].__get__
+    def getter(entry):
+        try:
+            return get(entry)
+        except AttributeError:
+            raise KeyError, name
+    return getter
+
+def _compactOverflowGetter(name):
+    def getter(entry):
+        return entry._overflow[name]
+    return getter
+
+def _compactFirstGetter(getters):
+    def getter(entry):
+        for get in getters:
+            try:
+                return get(entry)
+            except KeyError:
+                pass
+        raise KeyError, getters
+    return getter
+
+def _compactCategory(entry):
+    return entry['tags'][0]['term']
+
+def _compactCategories(entry):
+    return [(tag['scheme'], tag['term']) for tag in entry['tags']]
+
+def _compactEnclosures(entry):
+    norel = lambda link: FeedParserDict([(name,value) for (name,value) in link.items() if name!='rel'])
+    return [norel(link) for link in entry['links'] if link['rel']=='enclosure']
+
+def _compactLicense(entry):
+    for link in entry['links']:
+        if link['rel']=='license' and link.has_key('href'):
+            return link['href']
+    raise KeyError, 'license'
+
+class CompactEntry(object):
+    '''An entry that keeps the keys most entries have in slots, and any
+    others in an overflow dict, rather than in a FeedParserDict.
+
+    It reads like a FeedParserDict: by key or by attribute, through the same
+    aliases and with the same derived keys (category, categories, enclosures
+    and license).  Where a FeedParserDict works each key out through keymap
+    on every access, the route to every key and alias is worked out once,
+    into _lookup, when the class is made.'''
+    FIELDS = ('id', 'link', 'links', 'title', 'title_detail', 'content',
+              'summary', 'summary_detail', 'updated', 'updated_parsed',
+              'published', 'published_parsed', 'author', 'author_detail',
+              'authors')
+    __slots__ = FIELDS + ('_overflow',)
+
+    def __init__(self, entry=None):
+        self._overflow = {}
+        if entry:
+            if isinstance(entry, dict):
+                items = dict.iteritems(entry)
+            else:
+                items = entry.iteritems()
+            for key, value in items:
+                self[key] = value
+
+    def __getitem__(self, key):
+        get = self._lookup.get(key)
+        if get is None:
+            return self._overflow[key]
+        return get(self)
+
+    def __setitem__(self, key, value):
+        key = self._canonical.get(key, key)
+        if key in self._fields:
+            setattr(self, key, value)
+        else:
+            self._overflow[key] = value
+
+    def __delitem__(self, key):
+        key = self._canonical.get(key, key)
+        if key in self._fields:
+            if not hasattr(self, key):
+                raise KeyError, key
+            delattr(self, key)
+        else:
+            del self._overflow[key]
+
+    def __getattr__(self, key):
+        # only called for empty slots and keys that aren't slots
+        if key.startswith('_'):
+            raise AttributeError, "object has no attribute '%s'" % key
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            raise AttributeError, "object has no attribute '%s'" % key
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            return default
+
+    def setdefault(self, key, value):
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            self[key] = value
+            return value
+
+    def has_key(self, key):
+        try:
+            self[key]
+        except (KeyError, IndexError):
+            return False
+        return True
+    __contains__ = has_key
+
+    def keys(self):
+        return [key for key in self.FIELDS if hasattr(self, key)] + self._overflow.keys()
+
+    def iteritems(self):
+        for key in self.FIELDS:
+            try:
+                yield key, getattr(self, key)
+            except AttributeError:
+                pass
+        for item in self._overflow.iteritems():
+            yield item
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return [value for key, value in self.iteritems()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, CompactEntry):
+            other = dict(other.iteritems())
+        return dict(self.iteritems()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+CompactEntry._fields = dict([(field, 1) for field in CompactEntry.FIELDS])
+CompactEntry._canonical = {}
+CompactEntry._lookup = {}
+for _key in CompactEntry.FIELDS:
+    CompactEntry._lookup[_key] = _compactSlotGetter(_key)
+def _compactGetter(key):
+    return CompactEntry._lookup.get(key) or _compactOverflowGetter(key)
+for _alias, _keys in FeedParserDict.keymap.items():
+    if type(_keys) == types.ListType:
+        CompactEntry._canonical[_alias] = _keys[0]
+        CompactEntry._lookup[_alias] = _compactFirstGetter([_compactGetter(_key) for _key in _keys])
+    else:
+        CompactEntry._canonical[_alias] = _keys
+        CompactEntry._lookup[_alias] = _compactGetter(_keys)
+CompactEntry._lookup.update({'category': _compactCategory,
+                             'categories': _compactCategories,
+                             'enclosures': _compactEnclosures,
+                             'license': _compactLicense})
+del _key, _alias, _keys
+
 def zopeCompatibilityHack():
     global FeedParserDict
     del FeedParserDict
@@ -441,13 +638,17 @@ class _FeedParserMixin:
     can_contain_dangerous_markup = ['content', 'title', 'summary', 'info', 'tagline', 'subtitle', 'copyright', 'rights', 'description']
     html_types = ['text/html', 'application/xhtml+xml']
     
-    def __init__(self, baseuri=None, baselang=None, encoding='utf-8'):
+    def __init__(self, baseuri=None, baselang=None, encoding='utf-8', postprocess=POSTPROCESS_FULL, fields=None, compact=0):
         if _debug: sys.stderr.write('initializing FeedParser\n')
         if not self._matchnamespaces:
             for k, v in self.namespaces.items():
                 self._matchnamespaces[k.lower()] = v
         self.feeddata = FeedParserDict() # feed-level data
         self.encoding = encoding # character encoding
+        self.postprocess = postprocess # see POSTPROCESS_STAGES
+        self.projection = _projectedElements(fields) # None means every element
+        self._projected = {} # whether each entry element is in the projection
+        self.compact = compact # turn each entry into a CompactEntry once it ends
         self.entries = [] # list of entry-level data
         self.version = '' # feed type/version, see SUPPORTED_VERSIONS
         self.namespacesInUse = {} # dictionary of namespaces defined by the feed
@@ -474,11 +675,23 @@ class _FeedParserMixin:
         self.lang = baselang or None
         self.svgOK = 0
         self.hasTitle = 0
+        self.entrydepth = 0
+        self.skipping = 0
         if baselang:
             self.feeddata['language'] = baselang.replace('_','-')
 
     def unknown_starttag(self, tag, attrs):
         if _debug: sys.stderr.write('start %s with %s\n' % (tag, attrs))
+        # skip the elements of an entry that aren't in the projection, along
+        # with everything inside them
+        if self.skipping:
+            self.skipping += 1
+            return
+        if self.projection is not None and self.inentry and \
+               len(self.basestack) == self.entrydepth and not self._isProjected(tag):
+            self.skipping = 1
+            return
+
         # normalize attrs
         attrs = [(k.lower(), v) for k, v in attrs]
         attrs = [(k, k in ('rel', 'type') and v.lower() or v) for k, v in attrs]
@@ -562,6 +775,9 @@ class _FeedParserMixin:
 
     def unknown_endtag(self, tag):
         if _debug: sys.stderr.write('end %s\n' % tag)
+        if self.skipping:
+            self.skipping -= 1
+            return
         # match namespaces
         if tag.find(':') <> -1:
             prefix, suffix = tag.split(':', 1)
@@ -602,7 +818,7 @@ class _FeedParserMixin:
 
     def handle_charref(self, ref):
         # called for each character reference, e.g. for '&#160;', ref will be '160'
-        if not self.elementstack: return
+        if self.skipping or not self.elementstack: return
         ref = ref.lower()
         if ref in ('34', '38', '39', '60', '62', 'x22', 'x26', 'x27', 'x3c', 'x3e'):
             text = '&#%s;' % ref
@@ -616,7 +832,7 @@ class _FeedParserMixin:
 
     def handle_entityref(self, ref):
         # called for each entity reference, e.g. for '&copy;', ref will be 'copy'
-        if not self.elementstack: return
+        if self.skipping or not self.elementstack: return
         if _debug: sys.stderr.write('entering handle_entityref with %s\n' % ref)
         if ref in ('lt', 'gt', 'quot', 'amp', 'apos'):
             text = '&%s;' % ref
@@ -633,7 +849,7 @@ class _FeedParserMixin:
     def handle_data(self, text, escape=1):
         # called for each block of plain text, i.e. outside of any tag and
         # not containing any character or entity references
-        if not self.elementstack: return
+        if self.skipping or not self.elementstack: return
         if escape and self.contentparams.get('type') == 'application/xhtml+xml':
             text = _xmlescape(text)
         self.elementstack[-1][2].append(text)
@@ -698,6 +914,24 @@ class _FeedParserMixin:
 
     def resolveURI(self, uri):
         return _urljoin(self.baseuri or '', uri)
+
+    def _isProjected(self, tag):
+        '''Whether the entry element tag fills in a key in the projection'''
+        projected = self._projected.get(tag)
+        if projected is None:
+            if tag.find(':') <> -1:
+                prefix, suffix = tag.split(':', 1)
+            else:
+                prefix, suffix = '', tag
+            prefix = self.namespacemap.get(prefix, prefix)
+            if prefix:
+                prefix = prefix + '_'
+            key = prefix + suffix
+            method = getattr(self, '_start_' + key, None)
+            if method is not None:
+                key = method.__name__[len('_start_'):]
+            projected = self._projected[tag] = self.projection.has_key(key)
+        return projected
     
     def decodeEntities(self, element, data):
         return data
@@ -770,15 +1004,16 @@ class _FeedParserMixin:
             pass
 
         is_htmlish = self.mapContentType(self.contentparams.get('type', 'text/html')) in self.html_types
+        full = self.postprocess == POSTPROCESS_FULL
         # resolve relative URIs within embedded markup
-        if is_htmlish and RESOLVE_RELATIVE_URIS:
+        if is_htmlish and full and RESOLVE_RELATIVE_URIS:
             if element in self.can_contain_relative_uris:
                 output = _resolveRelativeURIs(output, self.baseuri, self.encoding, self.contentparams.get('type', 'text/html'))
                 
         # parse microformats
         # (must do this before sanitizing because some microformats
         # rely on elements that we sanitize)
-        if is_htmlish and element in ['content', 'description', 'summary']:
+        if is_htmlish and full and element in ['content', 'description', 'summary']:
             mfresults = _parseMicroformats(output, self.baseuri, self.encoding)
             if mfresults:
                 for tag in mfresults.get('tags', []):
@@ -792,7 +1027,7 @@ class _FeedParserMixin:
                     self._getContext()['vcard'] = vcard
         
         # sanitize embedded markup
-        if is_htmlish and SANITIZE_HTML:
+        if is_htmlish and SANITIZE_HTML and self.postprocess != POSTPROCESS_NONE:
             if element in self.can_contain_dangerous_markup:
                 output = _sanitizeHTML(output, self.encoding, self.contentparams.get('type', 'text/html'))
 
@@ -1217,6 +1452,7 @@ class _FeedParserMixin:
         self.entries.append(FeedParserDict())
         self.push('item', 0)
         self.inentry = 1
+        self.entrydepth = len(self.basestack)
         self.guidislink = 0
         self.hasTitle = 0
         id = self._getAttribute(attrsD, 'rdf:about')
@@ -1230,6 +1466,8 @@ class _FeedParserMixin:
     def _end_item(self):
         self.pop('item')
         self.inentry = 0
+        if self.compact and self.entries:
+            self.entries[-1] = CompactEntry(self.entries[-1])
     _end_entry = _end_item
 
     def _start_dc_language(self, attrsD):
@@ -1594,10 +1832,10 @@ class _FeedParserMixin:
 
 if _XML_AVAILABLE:
     class _StrictFeedParser(_FeedParserMixin, xml.sax.handler.ContentHandler):
-        def __init__(self, baseuri, baselang, encoding):
+        def __init__(self, baseuri, baselang, encoding, postprocess=POSTPROCESS_FULL, fields=None, compact=0):
             if _debug: sys.stderr.write('trying StrictFeedParser\n')
             xml.sax.handler.ContentHandler.__init__(self)
-            _FeedParserMixin.__init__(self, baseuri, baselang, encoding)
+            _FeedParserMixin.__init__(self, baseuri, baselang, encoding, postprocess, fields, compact)
             self.bozo = 0
             self.exc = None
             self.decls = {}
@@ -1845,9 +2083,9 @@ class _BaseHTMLProcessor(sgmllib.SGMLParser):
         return ''.join([str(p) for p in self.pieces])
 
 class _LooseFeedParser(_FeedParserMixin, _BaseHTMLProcessor):
-    def __init__(self, baseuri, baselang, encoding, entities):
+    def __init__(self, baseuri, baselang, encoding, entities, postprocess=POSTPROCESS_FULL, fields=None, compact=0):
         sgmllib.SGMLParser.__init__(self)
-        _FeedParserMixin.__init__(self, baseuri, baselang, encoding)
+        _FeedParserMixin.__init__(self, baseuri, baselang, encoding, postprocess, fields, compact)
         _BaseHTMLProcessor.__init__(self, encoding, 'application/xhtml+xml')
         self.entities=entities
 
@@ -2771,10 +3009,35 @@ def _open_resource(url_file_stream_or_string, etag, modified, agent, referrer, h
     # treat url_file_stream_or_string as string
     return _StringIO(str(url_file_stream_or_string))
 
+def _projectedElements(fields):
+    '''Returns the names of the start handlers (less _start_), or of the
+    elements with no handler, that fill in the entry keys in fields'''
+    if fields is None:
+        return None
+    elements = {}
+    for field in fields:
+        for suffix in ('_detail', '_parsed'):
+            if field.endswith(suffix):
+                field = field[:-len(suffix)]
+        elements[field] = 1
+        for element in PROJECTION_ELEMENTS.get(field, []):
+            elements[element] = 1
+    return elements
+
 _date_handlers = []
+# The handler that parsed the last date that _parse_date_rfc3339 couldn't.  It
+# is tried before the others because the dates in a feed all look alike.
+_last_date_handler = None
+# Dates that have already been parsed, newest generation first.  When the
+# newest fills up it becomes the oldest, so the most recently used dates stay.
+_DATE_CACHE_SIZE = 1024
+_date_cache = [{}, {}]
 def registerDateHandler(func):
     '''Register a date handler function (takes string, returns 9-tuple date in GMT)'''
+    global _last_date_handler
     _date_handlers.insert(0, func)
+    _last_date_handler = None
+    _date_cache[:] = [{}, {}]
     
 # ISO-8601 date parsing routines written by Fazal Majid.
 # The ISO 8601 standard is very convoluted and irregular - a full ISO 8601
@@ -3176,22 +3439,91 @@ def _parse_date_perforce(aDateString):
 		return time.gmtime(rfc822.mktime_tz(tm))
 registerDateHandler(_parse_date_perforce)
 
-def _parse_date(dateString):
-    '''Parses a variety of date formats into a 9-tuple in GMT'''
+def _parse_date_rfc3339(dateString):
+    '''Parse an RFC 3339 timestamp like 2010-10-17T21:31:44.000Z, or just its
+    date, without regular expressions.  Returns None for anything else.'''
+    length = len(dateString)
+    if length < 10 or dateString[4:5] != '-' or dateString[7:8] != '-':
+        return None
+    year, month, day = dateString[:4], dateString[5:7], dateString[8:10]
+    if not (year.isdigit() and month.isdigit() and day.isdigit()):
+        return None
+    hour = minute = second = '0'
+    offset = 0
+    if length > 10:
+        if length < 20 or dateString[10] not in 'Tt' or \
+               dateString[13] != ':' or dateString[16] != ':':
+            return None
+        hour, minute, second = dateString[11:13], dateString[14:16], dateString[17:19]
+        if not (hour.isdigit() and minute.isdigit() and second.isdigit()):
+            return None
+        i = 19
+        if dateString[i] in '.,':
+            i += 1
+            while i < length and dateString[i].isdigit():
+                i += 1
+            if i == 20:
+                return None
+        tzd = dateString[i:]
+        if tzd not in ('Z', 'z'):
+            if len(tzd) == 6 and tzd[3] == ':':
+                tzdhours, tzdminutes = tzd[1:3], tzd[4:]
+            elif len(tzd) == 5:
+                tzdhours, tzdminutes = tzd[1:3], tzd[3:]
+            else:
+                return None
+            if tzd[0] not in '+-' or not (tzdhours.isdigit() and tzdminutes.isdigit()):
+                return None
+            offset = (int(tzdhours) * 60 + int(tzdminutes)) * 60
+            if tzd[0] == '-':
+                offset = -offset
+    return time.gmtime(calendar.timegm((int(year), int(month), int(day),
+                                        int(hour), int(minute), int(second))) - offset)
+
+def _try_date_handler(handler, dateString):
+    try:
+        date9tuple = handler(dateString)
+        if not date9tuple: return None
+        if len(date9tuple) != 9:
+            if _debug: sys.stderr.write('date handler function must return 9-tuple\n')
+            raise ValueError
+        map(int, date9tuple)
+        return date9tuple
+    except Exception, e:
+        if _debug: sys.stderr.write('%s raised %s\n' % (handler.__name__, repr(e)))
+    return None
+
+def _dispatch_date(dateString):
+    global _last_date_handler
+    date9tuple = _try_date_handler(_parse_date_rfc3339, dateString)
+    if date9tuple: return date9tuple
+    last_handler = _last_date_handler
+    if last_handler is not None:
+        date9tuple = _try_date_handler(last_handler, dateString)
+        if date9tuple: return date9tuple
     for handler in _date_handlers:
-        try:
-            date9tuple = handler(dateString)
-            if not date9tuple: continue
-            if len(date9tuple) != 9:
-                if _debug: sys.stderr.write('date handler function must return 9-tuple\n')
-                raise ValueError
-            map(int, date9tuple)
+        if handler is last_handler: continue
+        date9tuple = _try_date_handler(handler, dateString)
+        if date9tuple:
+            _last_date_handler = handler
             return date9tuple
-        except Exception, e:
-            if _debug: sys.stderr.write('%s raised %s\n' % (handler.__name__, repr(e)))
-            pass
     return None
 
+def _parse_date(dateString):
+    '''Parses a variety of date formats into a 9-tuple in GMT'''
+    newest, oldest = _date_cache
+    if dateString in newest:
+        return newest[dateString]
+    if dateString in oldest:
+        date9tuple = newest[dateString] = oldest[dateString]
+        return date9tuple
+    date9tuple = _dispatch_date(dateString)
+    if len(newest) >= _DATE_CACHE_SIZE:
+        newest = {}
+        _date_cache[:] = [newest, _date_cache[0]]
+    newest[dateString] = date9tuple
+    return date9tuple
+
 def _getCharacterEncoding(http_headers, xml_data):
     '''Get the character encoding of the XML document
 
@@ -3393,6 +3725,9 @@ def _stripDoctype(data):
     '''
     start = re.search('<\w',data)
     start = start and start.start() or -1
+    if data.find('<!', 0, start+1) == -1:
+        # nothing to strip, so don't copy the document
+        return None, data, {}
     head,data = data[:start+1], data[start+1:]
     
     entity_pattern = re.compile(r'^\s*<!ENTITY([^>]*?)>', re.MULTILINE)
@@ -3417,8 +3752,57 @@ def _stripDoctype(data):
 
     return version, data, dict(replacement and safe_pattern.findall(replacement))
     
-def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, referrer=None, handlers=[]):
-    '''Parse a feed from a URL, file, stream, or string'''
+_utf8_declaration_match = re.compile('<\?xml[^>]*?\sencoding=[\'"]([^\'"]*)[\'"][^>]*\?>').match
+_non_ascii_search = re.compile('[\x80-\xff]').search
+
+def _isDeclaredUTF8(http_headers, data):
+    '''Returns whether data is UTF-8 by every account, so that it can go to
+    the parser as it is: the XML declaration says UTF-8, the Content-Type
+    header (if there are any headers) is an XML media type that agrees, there
+    is no byte order mark and the bytes are valid UTF-8'''
+    m = _utf8_declaration_match(data)
+    if (not m) or m.group(1).lower() != 'utf-8':
+        return 0
+    if http_headers:
+        content_type, params = cgi.parse_header(http_headers.get('content-type', ''))
+        charset = params.get('charset', '').replace("'", '').lower()
+        if (content_type in ('application/xml', 'application/xml-external-parsed-entity')) or \
+           (content_type.startswith('application/') and content_type.endswith('+xml')):
+            # an application/ type defers to the XML declaration
+            if charset not in ('', 'utf-8'):
+                return 0
+        elif (content_type in ('text/xml', 'text/xml-external-parsed-entity')) or \
+             (content_type.startswith('text/') and content_type.endswith('+xml')):
+            # a text/ type without a charset means us-ascii
+            if charset != 'utf-8':
+                return 0
+        else:
+            return 0
+    if _non_ascii_search(data):
+        try:
+            unicode(data, 'utf-8')
+        except UnicodeError:
+            return 0
+    return 1
+
+# How many documents parse() has passed straight to the parser because they
+# were declared and valid UTF-8, and how many it has had to detect the
+# encoding of and convert
+encodingPaths = {'fast': 0, 'slow': 0}
+
+def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, referrer=None, handlers=[], postprocess=POSTPROCESS_FULL, fields=None, compact=0, response_headers=None):
+    '''Parse a feed from a URL, file, stream, or string
+
+    postprocess is one of POSTPROCESS_STAGES and says what is done to
+    embedded HTML after it has been parsed.  If fields is given then each
+    entry only gets those keys (see PROJECTION_ELEMENTS) and the elements that
+    fill in the others are skipped without their text being kept.  If compact
+    is true the entries are CompactEntrys rather than FeedParserDicts.
+    response_headers are HTTP headers that the document came with, such as
+    the Content-Type of a string that was POSTed; they override any that
+    were fetched'''
+    if postprocess not in POSTPROCESS_STAGES:
+        raise ValueError('postprocess must be one of %s, not %r' % (', '.join(POSTPROCESS_STAGES), postprocess))
     result = FeedParserDict()
     result['feed'] = FeedParserDict()
     result['entries'] = []
@@ -3472,6 +3856,11 @@ def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, refer
         result['status'] = f.status
     if hasattr(f, 'headers'):
         result['headers'] = f.headers.dict
+    if response_headers:
+        headers = dict(result.get('headers', {}))
+        for name, value in response_headers.items():
+            headers[name.lower()] = value
+        result['headers'] = headers
     if hasattr(f, 'close'):
         f.close()
 
@@ -3481,8 +3870,17 @@ def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, refer
     # - sniffed_encoding is the encoding sniffed from the first 4 bytes of the XML data
     # - result['encoding'] is the actual encoding, as per RFC 3023 and a variety of other conflicting specifications
     http_headers = result.get('headers', {})
-    result['encoding'], http_encoding, xml_encoding, sniffed_xml_encoding, acceptable_content_type = \
-        _getCharacterEncoding(http_headers, data)
+    declared_utf8 = data is not None and _isDeclaredUTF8(http_headers, data)
+    if declared_utf8:
+        # the common case: everything agrees on UTF-8, so there's nothing to
+        # sniff or convert
+        encodingPaths['fast'] += 1
+        result['encoding'], acceptable_content_type = 'utf-8', 1
+    else:
+        if data is not None:
+            encodingPaths['slow'] += 1
+        result['encoding'], http_encoding, xml_encoding, sniffed_xml_encoding, acceptable_content_type = \
+            _getCharacterEncoding(http_headers, data)
     if http_headers and (not acceptable_content_type):
         if http_headers.has_key('content-type'):
             bozo_message = '%s is not an XML media type' % http_headers['content-type']
@@ -3512,8 +3910,14 @@ def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, refer
     use_strict_parser = 0
     known_encoding = 0
     tried_encodings = []
+    if declared_utf8:
+        proposed_encoding = 'utf-8'
+        known_encoding = use_strict_parser = 1
+        proposed_encodings = ()
+    else:
+        proposed_encodings = (result['encoding'], xml_encoding, sniffed_xml_encoding)
     # try: HTTP encoding, declared XML encoding, encoding sniffed from BOM
-    for proposed_encoding in (result['encoding'], xml_encoding, sniffed_xml_encoding):
+    for proposed_encoding in proposed_encodings:
         if not proposed_encoding: continue
         if proposed_encoding in tried_encodings: continue
         tried_encodings.append(proposed_encoding)
@@ -3579,7 +3983,7 @@ def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, refer
         use_strict_parser = 0
     if use_strict_parser:
         # initialize the SAX parser
-        feedparser = _StrictFeedParser(baseuri, baselang, 'utf-8')
+        feedparser = _StrictFeedParser(baseuri, baselang, 'utf-8', postprocess, fields, compact)
         saxparser = xml.sax.make_parser(PREFERRED_XML_PARSERS)
         saxparser.setFeature(xml.sax.handler.feature_namespaces, 1)
         saxparser.setContentHandler(feedparser)
@@ -3602,10 +4006,15 @@ def parse(url_file_stream_or_string, etag=None, modified=None, agent=None, refer
             result['bozo_exception'] = feedparser.exc or e
             use_strict_parser = 0
     if not use_strict_parser:
-        feedparser = _LooseFeedParser(baseuri, baselang, known_encoding and 'utf-8' or '', entities)
+        feedparser = _LooseFeedParser(baseuri, baselang, known_encoding and 'utf-8' or '', entities, postprocess, fields, compact)
         feedparser.feed(data)
     result['feed'] = feedparser.feeddata
-    result['entries'] = feedparser.entries
+    if compact:
+        # entries that never ended haven't been turned into CompactEntrys yet
+        result['entries'] = [isinstance(entry, CompactEntry) and entry or CompactEntry(entry)
+                             for entry in feedparser.entries]
+    else:
+        result['entries'] = feedparser.entries
     result['version'] = result['version'] or feedparser.version
     result['namespaces'] = feedparser.namespacesInUse
     return result
@@ -12,16 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import benchmark_feeds
+import datetime
 import main
 import os
 import unittest
+import urllib
 
 from gaetestbed import FunctionalTestCase
 from stubs import StubMessage, StubSimpleBuzzWrapper
 from tracker_tests import StubHubSubscriber
-from xmpp import Tracker, XmppHandler, extract_sender_email_address
+from xmpp import SearchTerm, Subscription, Tracker, XmppHandler, extract_sender_email_address
 
 import oauth_handlers
+import pshb
 import settings
   
 class FrontPageHandlerFunctionalTest(FunctionalTestCase, unittest.TestCase):
@@ -58,28 +62,129 @@ class PostsHandlerTest(BuzzChatBotFunctionalTestCase):
     challenge = 'somechallengetoken'
     topic = 'https://www.googleapis.com/buzz/v1/activities/track?q=somestring'
 
-    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&id=%s' % (challenge, 'subscribe', topic, subscription.id()))
+    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&term=%s' % (challenge, 'subscribe', topic, urllib.quote(subscription.canonical_term)))
 
     self.assertOK(response)
     response.mustcontain(challenge)
 
+  def test_subscribe_challenge_records_the_lease(self):
+    subscription = self._setup_subscription()
+    topic = 'https://www.googleapis.com/buzz/v1/activities/track?q=somestring'
+
+    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&hub.lease_seconds=%s&term=%s' % ('somechallengetoken', 'subscribe', topic, 3600, urllib.quote(subscription.canonical_term)))
+
+    self.assertOK(response)
+    lease_expires = SearchTerm.get_by_term(subscription.canonical_term).lease_expires
+    self.assertTrue(lease_expires <= datetime.datetime.utcnow() + datetime.timedelta(seconds=3600))
+    self.assertTrue(lease_expires > datetime.datetime.utcnow() + datetime.timedelta(seconds=3500))
+
   def test_can_validate_hub_challenge_for_unsubscribe(self):
     subscription = self._setup_subscription()
-    subscription.delete()
+    Tracker(hub_subscriber=StubHubSubscriber()).untrack(subscription.subscriber, subscription.id())
     challenge = 'somechallengetoken'
     topic = 'https://www.googleapis.com/buzz/v1/activities/track?q=somestring'
 
-    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&id=%s' % (challenge, 'unsubscribe', topic, subscription.id()))
+    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&term=%s' % (challenge, 'unsubscribe', topic, urllib.quote(subscription.canonical_term)))
 
     self.assertOK(response)
     response.mustcontain(challenge)
 
+  def test_can_validate_hub_challenge_for_subscription_created_before_search_terms_were_shared(self):
+    topic = 'https://www.googleapis.com/buzz/v1/activities/track?q=somestring'
+    subscription = Subscription(url=topic, search_term='somestring', subscriber='foo@example.com')
+    subscription.put()
+    challenge = 'somechallengetoken'
+
+    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&id=%s' % (challenge, 'subscribe', topic, subscription.id()))
+
+    self.assertOK(response)
+    response.mustcontain(challenge)
+    self.assertEquals(None, SearchTerm.get_by_term('somestring'))
+    self.assertTrue(Subscription.get_by_id(subscription.id()).lease_expires > datetime.datetime.utcnow())
+
+  def test_challenges_for_shared_subscriptions_do_not_give_the_subscription_a_lease(self):
+    subscription = self._setup_subscription()
+    topic = 'https://www.googleapis.com/buzz/v1/activities/track?q=somestring'
+
+    response = self.get('/posts?hub.challenge=%s&hub.mode=%s&hub.topic=%s&id=%s' % ('somechallengetoken', 'subscribe', topic, subscription.id()))
+
+    self.assertOK(response)
+    self.assertEquals(None, Subscription.get_by_id(subscription.id()).lease_expires)
+
+  def _post_streamed_notification(self, feed):
+    threshold, batch_size = settings.STREAMING_PARSE_THRESHOLD, settings.STREAMING_BATCH_SIZE
+    settings.STREAMING_PARSE_THRESHOLD, settings.STREAMING_BATCH_SIZE = 0, 2
+    try:
+      return self.post('/posts?term=somestring', data=feed)
+    finally:
+      settings.STREAMING_PARSE_THRESHOLD, settings.STREAMING_BATCH_SIZE = threshold, batch_size
+
+  def _unseen(self, feed):
+    posts = list(pshb.StreamingContentParser(feed).iterPosts())
+    return pshb.SeenEntries.filterUnseen(SearchTerm.get_by_term('somestring').seen_key, posts)[0]
+
+  def test_streamed_notifications_are_delivered_in_batches(self):
+    self._setup_subscription()
+    feed = benchmark_feeds.make_track_feed(5)
+
+    response = self._post_streamed_notification(feed)
+
+    self.assertOK(response)
+    self.assertEquals([], self._unseen(feed))
+
+  def test_posts_before_an_error_in_a_streamed_notification_are_delivered(self):
+    self._setup_subscription()
+    feed = benchmark_feeds.make_track_feed(5)
+    # Break the document after the third entry
+    broken = '</entry>'.join(feed.split('</entry>')[:3]) + '</entry><entry><oops></entry>'
+
+    response = self._post_streamed_notification(broken)
+
+    response.mustcontain('Bad entries')
+    self.assertEquals(['tag:google.com,2010:buzz:z1200000003', 'tag:google.com,2010:buzz:z1200000004'],
+                      [post.uniqueId for post in self._unseen(feed)])
 
 class StubXmppHandler(XmppHandler):
   def _make_wrapper(self, email_address):
     self.email_address = email_address
     return StubSimpleBuzzWrapper()
 
+class WrapperPoolTest(BuzzChatBotFunctionalTestCase):
+  def setUp(self):
+    self.build_wrapper = oauth_handlers._build_wrapper
+    oauth_handlers._build_wrapper = lambda user_token: StubSimpleBuzzWrapper()
+
+  def tearDown(self):
+    oauth_handlers._build_wrapper = self.build_wrapper
+    oauth_handlers.WRAPPER_POOL.clear()
+
+  def test_wrappers_are_reused_until_invalidated(self):
+    oauth_handlers.WRAPPER_POOL.put('1@example.com', StubSimpleBuzzWrapper())
+    wrapper = oauth_handlers.make_wrapper('1@example.com')
+
+    self.assertTrue(wrapper is oauth_handlers.make_wrapper('1@example.com'))
+
+    oauth_handlers.invalidate_wrapper('1@example.com')
+    self.assertFalse('1@example.com' in oauth_handlers.WRAPPER_POOL)
+
+  def test_wrappers_with_an_access_token_are_pooled(self):
+    user_token = oauth_handlers.UserToken(email_address='1@example.com')
+    user_token.access_token_string = 'some thing that looks like an access token from a distance'
+    user_token.put()
+
+    wrapper = oauth_handlers.make_wrapper('1@example.com')
+
+    self.assertTrue(wrapper is oauth_handlers.make_wrapper('1@example.com'))
+
+  def test_wrappers_without_an_access_token_are_not_pooled(self):
+    oauth_handlers.UserToken(email_address='2@example.com', access_token_string='').put()
+
+    for email_address in ['1@example.com', '2@example.com']:
+      wrapper = oauth_handlers.make_wrapper(email_address)
+
+      self.assertFalse(email_address in oauth_handlers.WRAPPER_POOL)
+      self.assertFalse(wrapper is oauth_handlers.make_wrapper(email_address))
+
 class XmppHandlerTest(BuzzChatBotFunctionalTestCase):
   def __init__(self, methodName='runTest'):
     BuzzChatBotFunctionalTestCase.__init__(self, methodName)
@@ -212,6 +317,56 @@ class XmppHandlerTest(BuzzChatBotFunctionalTestCase):
     self.assertTrue(len(message.message_to_send) > 0)
     self.assertTrue(expected_item in message.message_to_send, message.message_to_send)
 
+  def test_list_command_shows_subscriptions_a_page_at_a_time(self):
+    sender = '1@example.com'
+    subscriptions = [self._setup_subscription(sender=sender, search_term='search%s' % i) for i in range(3)]
+    page_size = settings.LIST_PAGE_SIZE
+    settings.LIST_PAGE_SIZE = 2
+    try:
+      first_page = StubMessage(sender=sender, body=XmppHandler.LIST_CMD)
+      self.handler.message_received(message=first_page)
+      second_page = StubMessage(sender=sender, body='%s %s' % (XmppHandler.LIST_CMD, XmppHandler.LIST_MORE_ARG))
+      self.handler.message_received(message=second_page)
+      no_more = StubMessage(sender=sender, body='%s %s' % (XmppHandler.LIST_CMD, XmppHandler.LIST_MORE_ARG))
+      self.handler.message_received(message=no_more)
+    finally:
+      settings.LIST_PAGE_SIZE = page_size
+
+    for subscription in subscriptions[:2]:
+      expected_item = 'Search term: %s with id: %s' % (subscription.search_term, subscription.id())
+      self.assertTrue(expected_item in first_page.message_to_send, first_page.message_to_send)
+    self.assertTrue('Showing 1 to 2 of 3' in first_page.message_to_send, first_page.message_to_send)
+    expected_item = 'Search term: %s with id: %s' % (subscriptions[2].search_term, subscriptions[2].id())
+    self.assertEquals(expected_item, second_page.message_to_send)
+    self.assertEquals(XmppHandler.LIST_NO_MORE_MSG % XmppHandler.LIST_CMD, no_more.message_to_send)
+
+  def test_list_command_shows_subscriptions_beyond_the_first_fetch(self):
+    sender = '1@example.com'
+    subscriptions = [self._setup_subscription(sender=sender, search_term='search%s' % i) for i in range(5)]
+    max_fetch = settings.MAX_FETCH
+    settings.MAX_FETCH = 2
+    try:
+      message = StubMessage(sender=sender, body=XmppHandler.LIST_CMD)
+      self.handler.message_received(message=message)
+    finally:
+      settings.MAX_FETCH = max_fetch
+
+    for subscription in subscriptions:
+      expected_item = 'Search term: %s with id: %s' % (subscription.search_term, subscription.id())
+      self.assertTrue(expected_item in message.message_to_send, message.message_to_send)
+
+  def test_list_command_shows_subscriptions_made_since_the_last_list(self):
+    sender = '1@example.com'
+    self._setup_subscription(sender=sender, search_term='searchA')
+    self.handler.message_received(message=StubMessage(sender=sender, body=XmppHandler.LIST_CMD))
+    subscription = self._setup_subscription(sender=sender, search_term='searchB')
+    message = StubMessage(sender=sender, body=XmppHandler.LIST_CMD)
+
+    self.handler.message_received(message=message)
+
+    expected_item = 'Search term: %s with id: %s' % (subscription.search_term, subscription.id())
+    self.assertTrue(expected_item in message.message_to_send, message.message_to_send)
+
   def test_about_command_says_what_bot_is_running(self):
     sender = '1@example.com'
     message = StubMessage(sender=sender, body='%s'  % XmppHandler.ABOUT_CMD)
@@ -365,6 +520,40 @@ class XmppHandlerTest(BuzzChatBotFunctionalTestCase):
     expected_item = 'Posted: %s' % self.handler.buzz_wrapper.url
     self.assertEquals(expected_item, message.message_to_send)
 
+  def test_abbreviated_track_gets_treated_as_track_command(self):
+    message = StubMessage(body='tr some phrase')
+
+    self.handler.message_received(message=message)
+
+    self.assertTrue(message.message_to_send.startswith('Tracking: some phrase with id: '), message.message_to_send)
+
+  def test_abbreviated_post_is_not_treated_as_post_command(self):
+    message = StubMessage(sender='1@example.com', body='pos some message')
+
+    self.handler.message_received(message=message)
+
+    self.assertTrue(message.message_to_send.startswith(XmppHandler.UNKNOWN_COMMAND_MSG % 'pos'),
+                    message.message_to_send)
+    self.assertFalse(hasattr(self.handler, 'email_address'))
+
+  def test_commands_dispatch_to_methods_overridden_by_subclasses(self):
+    class AboutOverridingHandler(StubXmppHandler):
+      def about_command(self, message):
+        message.reply('overridden')
+    message = StubMessage(sender='1@example.com', body=XmppHandler.ABOUT_CMD)
+
+    AboutOverridingHandler(hub_subscriber=self.stub_hub_subscriber).message_received(message=message)
+
+    self.assertEquals('overridden', message.message_to_send)
+
+  def test_help_command_does_not_make_a_buzz_wrapper(self):
+    handler = StubXmppHandler(hub_subscriber=self.stub_hub_subscriber)
+    message = StubMessage(sender='1@example.com', body='%s' % XmppHandler.HELP_CMD)
+
+    handler.message_received(message=message)
+
+    self.assertFalse(hasattr(handler, 'email_address'))
+
   def test_help_command_lists_available_commands(self):
     sender = '1@example.com'
     message = StubMessage(sender=sender, body='%s' % XmppHandler.HELP_CMD)
@@ -0,0 +1,152 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import BaseHTTPServer
+import httplib2
+import threading
+import unittest
+
+
+class StubMemcacheClient(object):
+  """A local stand-in for a memcache server"""
+  def __init__(self):
+    self.values = {}
+
+  def get(self, key):
+    return self.values.get(key)
+
+  def set(self, key, value, time=0):
+    if len(key) > 250 or ' ' in key:
+      raise ValueError('Invalid memcache key: %s' % key)
+    self.values[key] = value
+    return True
+
+  def delete(self, key):
+    self.values.pop(key, None)
+    return 1
+
+
+class MemoryCacheTest(unittest.TestCase):
+  def test_stores_and_deletes_values(self):
+    cache = httplib2.MemoryCache()
+    cache.set('http://example.com/', 'response')
+
+    self.assertEquals('response', cache.get('http://example.com/'))
+    cache.delete('http://example.com/')
+    self.assertEquals(None, cache.get('http://example.com/'))
+
+  def test_evicts_least_recently_used_values_to_stay_under_size(self):
+    cache = httplib2.MemoryCache(max_bytes=20)
+    cache.set('a', '123456789')
+    cache.set('b', '123456789')
+    cache.get('a')
+
+    cache.set('c', '123456789')
+
+    self.assertEquals('123456789', cache.get('a'))
+    self.assertEquals(None, cache.get('b'))
+    self.assertEquals('123456789', cache.get('c'))
+    self.assertEquals(20, cache.size)
+
+  def test_replacing_a_value_updates_size(self):
+    cache = httplib2.MemoryCache()
+    cache.set('a', '1234')
+    cache.set('a', '12')
+
+    self.assertEquals(3, cache.size)
+    self.assertEquals(1, len(cache))
+
+  def test_does_not_store_values_bigger_than_the_cache(self):
+    cache = httplib2.MemoryCache(max_bytes=4)
+    cache.set('a', '12345')
+
+    self.assertEquals(None, cache.get('a'))
+    self.assertEquals(0, cache.size)
+
+  def test_counts_hits_and_misses(self):
+    cache = httplib2.MemoryCache()
+    cache.set('a', '1')
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+
+    self.assertEquals(2, cache.hits)
+    self.assertEquals(1, cache.misses)
+    self.assertAlmostEquals(2 / 3.0, cache.hit_ratio())
+
+
+class MemcacheCacheTest(unittest.TestCase):
+  def test_stores_values_under_safe_keys(self):
+    client = StubMemcacheClient()
+    cache = httplib2.MemcacheCache(client)
+    key = 'http://example.com/a path that is far too long ' + 'x' * 300
+
+    cache.set(key, 'response')
+
+    self.assertEquals('response', cache.get(key))
+    self.assertEquals(1, len(client.values))
+
+  def test_deletes_values(self):
+    cache = httplib2.MemcacheCache(StubMemcacheClient())
+    cache.set('http://example.com/', 'response')
+
+    cache.delete('http://example.com/')
+
+    self.assertEquals(None, cache.get('http://example.com/'))
+
+  def test_counts_hits_and_misses(self):
+    cache = httplib2.MemcacheCache(StubMemcacheClient())
+    cache.set('a', '1')
+    cache.get('a')
+    cache.get('b')
+
+    self.assertEquals(0.5, cache.hit_ratio())
+
+
+class CacheableHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def do_GET(self):
+    body = 'hello'
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/plain')
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('Cache-Control', 'max-age=300')
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class CachedHttpTest(unittest.TestCase):
+  def setUp(self):
+    self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), CacheableHandler)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.setDaemon(True)
+    self.thread.start()
+    self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+  def test_fresh_responses_are_served_from_a_shared_memory_cache(self):
+    cache = httplib2.MemoryCache()
+
+    httplib2.Http(cache=cache).request(self.url)
+    response, content = httplib2.Http(cache=cache).request(self.url)
+
+    self.assertTrue(response.fromcache)
+    self.assertEquals('hello', content)
+    self.assertEquals(1, cache.hits)
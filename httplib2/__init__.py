@@ -52,6 +52,14 @@ except ImportError:
 import hmac
 from gettext import gettext as _
 import socket
+import threading
+
+# App Engine's sandbox has no select. Pooled connections are then only
+# checked for age.
+try:
+    import select
+except ImportError:
+    select = None
 
 try:
     import socks
@@ -79,7 +87,8 @@ def has_timeout(timeout): # python 2.6
         return (timeout is not None and timeout is not socket._GLOBAL_DEFAULT_TIMEOUT)
     return (timeout is not None)
 
-__all__ = ['Http', 'Response', 'ProxyInfo', 'HttpLib2Error',
+__all__ = ['Http', 'Response', 'ProxyInfo', 'HttpLib2Error', 'ConnectionPool',
+  'FileCache', 'MemoryCache', 'MemcacheCache',
   'RedirectMissingLocation', 'RedirectLimit', 'FailedToDecompressContent', 
   'UnimplementedDigestAuthOptionError', 'UnimplementedHmacDigestAuthOptionError',
   'debuglevel']
@@ -124,6 +133,7 @@ class UnimplementedHmacDigestAuthOptionError(HttpLib2ErrorWithResponse): pass
 
 class RelativeURIError(HttpLib2Error): pass
 class ServerNotFoundError(HttpLib2Error): pass
+class ConnectionPoolTimeout(HttpLib2Error): pass
 
 # Open Items:
 # -----------
@@ -670,6 +680,132 @@ class FileCache(object):
         if os.path.exists(cacheFullPath):
             os.remove(cacheFullPath)
 
+class MemoryCache(object):
+    """A bounded, in-process cache that evicts the least recently used
+responses once they take up more than 'max_bytes' bytes. Keys are used
+as they are so, unlike FileCache, there's no filename munging.
+
+Safe to share between threads. 'hits' and 'misses' count lookups."""
+    def __init__(self, max_bytes=10 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Map key to a [previous, next, key, value] node in a circular
+        # list that runs from most to least recently used
+        self._map = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+
+    def _unlink(self, node):
+        node[0][1] = node[1]
+        node[1][0] = node[0]
+
+    def _link_first(self, node):
+        first = self._root[1]
+        node[0] = self._root
+        node[1] = first
+        first[0] = node
+        self._root[1] = node
+
+    def _remove(self, node):
+        self._unlink(node)
+        del self._map[node[2]]
+        self.size -= len(node[2]) + len(node[3])
+
+    def get(self, key):
+        self._lock.acquire()
+        try:
+            node = self._map.get(key)
+            if node is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._unlink(node)
+            self._link_first(node)
+            return node[3]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value):
+        self._lock.acquire()
+        try:
+            node = self._map.get(key)
+            if node is not None:
+                self._remove(node)
+            entry_size = len(key) + len(value)
+            if entry_size > self.max_bytes:
+                return
+            node = [None, None, key, value]
+            self._link_first(node)
+            self._map[key] = node
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                self._remove(self._root[0])
+        finally:
+            self._lock.release()
+
+    def delete(self, key):
+        self._lock.acquire()
+        try:
+            node = self._map.get(key)
+            if node is not None:
+                self._remove(node)
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._map)
+
+    def __nonzero__(self):
+        # Http tests "if self.cache:" so an empty cache must still be true
+        return True
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
+
+class MemcacheCache(object):
+    """Stores responses using a memcache client: anything with get(key),
+set(key, value, time) and delete(key) such as the AppEngine memcache
+module or a python-memcached Client.
+
+Memcache keys can't be longer than 250 bytes or contain whitespace so
+the md5 of the key is used, after 'prefix'. Entries expire after 'time'
+seconds, or never if it is 0. 'hits' and 'misses' count lookups."""
+    def __init__(self, client, prefix='httplib2:', time=0):
+        self.client = client
+        self.prefix = prefix
+        self.time = time
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return self.prefix + _md5(key).hexdigest()
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.client.set(self._key(key), value, self.time)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
+
 class Credentials(object):
     def __init__(self):
         self.credentials = []
@@ -775,6 +911,126 @@ class HTTPSConnectionWithTimeout(httplib.HTTPSConnection):
 
 
 
+class ConnectionPool(object):
+    """A thread-safe pool of keep-alive connections that can be shared
+by many Http instances.
+
+At most 'max_per_host' connections to any one host are handed out at
+a time. Further checkouts wait up to 'wait_timeout' seconds (forever
+if it is None) for one to be returned and then raise
+ConnectionPoolTimeout. A thread that already holds a connection to a
+host never waits for another one, so following a redirect back to the
+same host can't deadlock.
+
+Idle connections are closed once they have been unused for
+'idle_timeout' seconds. Connections are also checked on checkout: if
+the server has closed the socket, or sent something unexpected, it is
+closed so that the next request reconnects.
+
+The 'stats' dictionary counts hits (an idle connection was reused),
+misses (a new connection was made), waits (a checkout had to wait),
+stale (an idle connection failed its health check or timed out) and
+discarded (a connection was returned after an error)."""
+
+    def __init__(self, max_per_host=4, idle_timeout=30, wait_timeout=None):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._condition = threading.Condition()
+        # Map pool key to a list of (connection, time it was returned)
+        self._idle = {}
+        # Map pool key to a list of the threads holding its connections
+        self._holders = {}
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0, 'stale': 0, 'discarded': 0}
+
+    def _healthy(self, conn, returned_at, now):
+        if self.idle_timeout is not None and now - returned_at > self.idle_timeout:
+            return False
+        sock = getattr(conn, 'sock', None)
+        if sock is None or select is None:
+            # Not connected, in which case httplib will connect on the next
+            # request, or there's no way to look at the socket.
+            return True
+        try:
+            readable = select.select([sock], [], [], 0)[0]
+        except (select.error, socket.error, TypeError, ValueError):
+            return False
+        # An idle keep-alive connection should have nothing to read. If it
+        # does then the server has closed it or it's out of step.
+        return not readable
+
+    def checkout(self, key, factory):
+        """Return a connection for 'key', calling 'factory' to make one if
+no healthy idle connection is available."""
+        me = threading.currentThread()
+        deadline = None
+        if self.wait_timeout is not None:
+            deadline = time.time() + self.wait_timeout
+        self._condition.acquire()
+        try:
+            waited = False
+            while True:
+                idle = self._idle.get(key, [])
+                now = time.time()
+                while idle:
+                    conn, returned_at = idle.pop()
+                    if self._healthy(conn, returned_at, now):
+                        self._holders.setdefault(key, []).append(me)
+                        self.stats['hits'] += 1
+                        return conn
+                    self.stats['stale'] += 1
+                    conn.close()
+                holders = self._holders.setdefault(key, [])
+                if len(holders) < self.max_per_host or me in holders:
+                    holders.append(me)
+                    self.stats['misses'] += 1
+                    break
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise ConnectionPoolTimeout("Timed out waiting for a connection to %s" % (key,))
+                    self._condition.wait(remaining)
+        finally:
+            self._condition.release()
+        # Connections are made outside the lock. They don't touch the network until they are used.
+        return factory()
+
+    def checkin(self, key, conn, reusable=True):
+        """Return a connection obtained from checkout. Connections which
+aren't reusable, for example because a request failed part way
+through, are closed instead of being kept."""
+        me = threading.currentThread()
+        self._condition.acquire()
+        try:
+            holders = self._holders.get(key, [])
+            if me in holders:
+                holders.remove(me)
+            if reusable:
+                self._idle.setdefault(key, []).append((conn, time.time()))
+            else:
+                self.stats['discarded'] += 1
+                conn.close()
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def clear(self):
+        """Close every idle connection"""
+        self._condition.acquire()
+        try:
+            for idle in self._idle.values():
+                for conn, returned_at in idle:
+                    conn.close()
+            self._idle = {}
+        finally:
+            self._condition.release()
+
+
 class Http(object):
     """An HTTP client that handles:
 - all methods
@@ -788,15 +1044,22 @@ class Http(object):
 
 and more.
     """
-    def __init__(self, cache=None, timeout=None, proxy_info=None):
+    def __init__(self, cache=None, timeout=None, proxy_info=None, pool=None):
         """The value of proxy_info is a ProxyInfo instance.
 
 If 'cache' is a string then it is used as a directory name
 for a disk cache. Otherwise it must be an object that supports
-the same interface as FileCache."""
+the same interface as FileCache.
+
+If 'pool' is a ConnectionPool then connections are checked out of it
+for each request and returned afterwards, so they can be shared with
+other Http instances using the same pool. Otherwise this instance
+keeps one connection per host to itself."""
         self.proxy_info = proxy_info
         # Map domain name to an httplib connection
         self.connections = {}
+        self.pool = pool
+        self._local = threading.local()
         # The location of the cache, for now a directory
         # where cached responses are held.
         if cache and isinstance(cache, str):
@@ -963,6 +1226,44 @@ the same interface as FileCache."""
 # including all socket.* and httplib.* exceptions.
 
 
+    def _new_connection(self, scheme, authority, connection_type=None):
+        if not connection_type:
+            connection_type = (scheme == 'https') and HTTPSConnectionWithTimeout or HTTPConnectionWithTimeout
+        certs = list(self.certificates.iter(authority))
+        if scheme == 'https' and certs:
+            conn = connection_type(authority, key_file=certs[0][0],
+                cert_file=certs[0][1], timeout=self.timeout, proxy_info=self.proxy_info)
+        else:
+            conn = connection_type(authority, timeout=self.timeout, proxy_info=self.proxy_info)
+        conn.set_debuglevel(debuglevel)
+        return conn
+
+    def _pooled_request(self, conn_key, scheme, authority, uri, method, body, headers, redirections, connection_type):
+        # Connections made with different settings can't be shared
+        proxy = self.proxy_info and self.proxy_info.astuple()
+        certs = tuple(self.certificates.iter(authority))
+        pool_key = (conn_key, self.timeout, proxy, certs, connection_type)
+        conn = self.pool.checkout(pool_key, lambda: self._new_connection(scheme, authority, connection_type))
+        checked_out = self._checked_out_connections()
+        checked_out[conn_key] = conn
+        reusable = False
+        try:
+            # Not self.request: wrappers such as oauth_wrap replace it and would sign the request a second time
+            result = Http.request(self, uri, method, body, headers, redirections, connection_type)
+            reusable = True
+            return result
+        finally:
+            del checked_out[conn_key]
+            self.pool.checkin(pool_key, conn, reusable)
+
+    def _checked_out_connections(self):
+        """Map conn_key to the pooled connections held by the current thread"""
+        try:
+            return self._local.connections
+        except AttributeError:
+            self._local.connections = {}
+            return self._local.connections
+
     def request(self, uri, method="GET", body=None, headers=None, redirections=DEFAULT_MAX_REDIRECTS, connection_type=None):
         """ Performs a single HTTP request.
 The 'uri' is the URI of the HTTP resource and can begin 
@@ -1002,18 +1303,16 @@ a string that contains the response entity body.
                 authority = domain_port[0]
 
             conn_key = scheme+":"+authority
-            if conn_key in self.connections:
+            if self.pool is not None:
+                checked_out = self._checked_out_connections()
+                if conn_key not in checked_out:
+                    return self._pooled_request(conn_key, scheme, authority, uri, method, body, headers, redirections, connection_type)
+                # Redirects and retries reuse the connection this thread already has
+                conn = checked_out[conn_key]
+            elif conn_key in self.connections:
                 conn = self.connections[conn_key]
             else:
-                if not connection_type:
-                    connection_type = (scheme == 'https') and HTTPSConnectionWithTimeout or HTTPConnectionWithTimeout
-                certs = list(self.certificates.iter(authority))
-                if scheme == 'https' and certs:
-                    conn = self.connections[conn_key] = connection_type(authority, key_file=certs[0][0],
-                        cert_file=certs[0][1], timeout=self.timeout, proxy_info=self.proxy_info)
-                else:
-                    conn = self.connections[conn_key] = connection_type(authority, timeout=self.timeout, proxy_info=self.proxy_info)
-                conn.set_debuglevel(debuglevel)
+                conn = self.connections[conn_key] = self._new_connection(scheme, authority, connection_type)
 
             if method in ["GET", "HEAD"] and 'range' not in headers and 'accept-encoding' not in headers:
                 headers['accept-encoding'] = 'gzip, deflate'
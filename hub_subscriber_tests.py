@@ -0,0 +1,146 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from google.appengine.api import urlfetch
+from google.appengine.ext import db
+from executors import LocalTaskQueue
+from pshb import HubOperation, HubSubscriber, dispatchHubOperations
+
+import datetime
+import settings
+import unittest
+
+HUB = 'http://pubsubhubbub.appspot.com/'
+TOPIC = 'https://www.googleapis.com/buzz/v1/activities/track?q=somestring'
+CALLBACK = 'http://buzzchatbot.appspot.com/posts?term=somestring'
+
+
+class StubResponse(object):
+  def __init__(self, status_code):
+    self.status_code = status_code
+
+
+class StubRpc(object):
+  def __init__(self, status_code):
+    self.status_code = status_code
+
+  def get_result(self):
+    if self.status_code is None:
+      raise urlfetch.DownloadError('Deadline exceeded')
+    return StubResponse(self.status_code)
+
+
+class StubHub(object):
+  """Records the operations it's sent and responds to them with each of the statuses in turn"""
+  def __init__(self, *statuses):
+    self.statuses = list(statuses)
+    self.requests = []
+
+  def __call__(self, operation):
+    self.requests.append((operation.mode, operation.url, operation.callbackUrl))
+    return StubRpc(self.statuses.pop(0))
+
+
+class HubSubscriberTest(unittest.TestCase):
+  def setUp(self):
+    self.queue = LocalTaskQueue()
+
+  def tearDown(self):
+    db.delete(HubOperation.all(keys_only=True).fetch(1000))
+
+  def test_subscribing_does_not_talk_to_the_hub(self):
+    hub = StubHub(202)
+    HubSubscriber(self.queue, hub).subscribe(TOPIC, HUB, CALLBACK)
+
+    self.assertEquals([], hub.requests)
+    self.assertEquals(1, len(self.queue))
+
+  def test_queued_operations_are_sent_to_the_hub(self):
+    hub = StubHub(202)
+    HubSubscriber(self.queue, hub).subscribe(TOPIC, HUB, CALLBACK)
+
+    self.queue.run_next()
+
+    self.assertEquals([('subscribe', TOPIC, CALLBACK)], hub.requests)
+    self.assertEquals(0, HubOperation.all().count())
+    self.assertEquals(0, len(self.queue))
+
+  def test_identical_pending_operations_are_sent_once(self):
+    hub = StubHub(202)
+    subscriber = HubSubscriber(self.queue, hub)
+    subscriber.subscribe(TOPIC, HUB, CALLBACK)
+    subscriber.subscribe(TOPIC, HUB, CALLBACK)
+
+    while self.queue.run_next():
+      pass
+
+    self.assertEquals([('subscribe', TOPIC, CALLBACK)], hub.requests)
+
+  def test_opposite_pending_operation_replaces_the_first(self):
+    hub = StubHub(202)
+    subscriber = HubSubscriber(self.queue, hub)
+    subscriber.subscribe(TOPIC, HUB, CALLBACK)
+    subscriber.unsubscribe(TOPIC, HUB, CALLBACK)
+
+    while self.queue.run_next():
+      pass
+
+    self.assertEquals([('unsubscribe', TOPIC, CALLBACK)], hub.requests)
+
+  def test_operations_are_sent_in_batches(self):
+    hub = StubHub(*[202] * 3)
+    subscriber = HubSubscriber(self.queue, hub)
+    for i in range(3):
+      subscriber.subscribe(TOPIC + str(i), HUB, CALLBACK + str(i))
+
+    self.queue.run_next()
+
+    self.assertEquals(3, len(hub.requests))
+    self.assertEquals(0, HubOperation.all().count())
+
+  def test_failed_operations_are_retried_with_backoff(self):
+    hub = StubHub(500, None, 202)
+    HubSubscriber(self.queue, hub).subscribe(TOPIC, HUB, CALLBACK)
+    now = datetime.datetime.utcnow()
+
+    dispatchHubOperations(self.queue, hub, now=now)
+    operation = HubOperation.all().get()
+    self.assertEquals(1, operation.attempts)
+    self.assertEquals(now + datetime.timedelta(seconds=settings.HUB_RETRY_BASE_DELAY), operation.due)
+
+    # Not due yet
+    dispatchHubOperations(self.queue, hub, now=now)
+    self.assertEquals(1, len(hub.requests))
+
+    now = operation.due
+    dispatchHubOperations(self.queue, hub, now=now)
+    operation = HubOperation.all().get()
+    self.assertEquals(2, operation.attempts)
+    self.assertEquals(now + datetime.timedelta(seconds=settings.HUB_RETRY_BASE_DELAY * 2), operation.due)
+
+    self.assertEquals(1, dispatchHubOperations(self.queue, hub, now=operation.due))
+    self.assertEquals(0, HubOperation.all().count())
+
+  def test_operations_are_given_up_after_max_task_retries(self):
+    hub = StubHub(*[500] * settings.MAX_TASK_RETRIES)
+    HubSubscriber(self.queue, hub).subscribe(TOPIC, HUB, CALLBACK)
+    now = datetime.datetime.utcnow()
+
+    for i in range(settings.MAX_TASK_RETRIES):
+      dispatchHubOperations(self.queue, hub, now=now)
+      operation = HubOperation.all().get()
+      if operation:
+        now = operation.due
+
+    self.assertEquals(settings.MAX_TASK_RETRIES, len(hub.requests))
+    self.assertEquals(0, HubOperation.all().count())
@@ -0,0 +1,214 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures how fast the hub callback, /posts, processes a notification.
+
+Synthetic track feeds from benchmark_feeds are replayed through main.application with webtest, then each stage of
+the ingest path is timed on its own: feedparser, ContentParser.extractPosts, the subscriber lookup and the XMPP send.
+End to end is timed twice. Every iteration of "end to end" posts entries nobody has seen, so they are all delivered,
+while "end to end, seen" posts the same notification again and again so that SeenEntries drops every entry.
+Messages go to a StubSender so nothing leaves the machine, and the datastore is an in-memory stub.
+
+The App Engine SDK has to be importable. Run it like this:
+PYTHONPATH=$APPENGINE_SDK:$APPENGINE_SDK/lib/webob python ingest_benchmark.py [iterations] [subscribers]
+"""
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import datastore_file_stub
+from google.appengine.api.memcache import memcache_stub
+
+import benchmark_feeds
+import executors
+import fanout
+import feedparser
+import itertools
+import main
+import os
+import pshb
+import resource
+import settings
+import stubs
+import sys
+import time
+import urllib
+import webtest
+import xmpp
+
+FEED_SIZES = [1, 10, 100, 1000]
+SEARCH_TERM = 'somestring'
+# Numbers the fresh notifications. Each one's entries get a block of ids of their own, above those of the feeds
+# make_track_feed makes by default, so none of them has been seen before.
+FRESH_NOTIFICATIONS = itertools.count(1)
+
+APP = webtest.TestApp(main.application)
+
+
+def setup_stubs():
+  """Registers in-memory versions of the services the ingest path uses"""
+  os.environ.setdefault('APPLICATION_ID', settings.APP_NAME)
+  os.environ.setdefault('AUTH_DOMAIN', 'gmail.com')
+  os.environ.setdefault('SERVER_NAME', 'localhost')
+  os.environ.setdefault('SERVER_PORT', '8080')
+  apiproxy_stub_map.apiproxy = apiproxy_stub_map.APIProxyStubMap()
+  apiproxy_stub_map.apiproxy.RegisterStub('datastore_v3',
+    datastore_file_stub.DatastoreFileStub(os.environ['APPLICATION_ID'], None, None))
+  apiproxy_stub_map.apiproxy.RegisterStub('memcache', memcache_stub.MemcacheService())
+
+
+def setup_subscribers(count, term=SEARCH_TERM):
+  tracker = xmpp.Tracker(hub_subscriber=stubs.StubHubSubscriber())
+  for i in range(count):
+    tracker.track('user%d@example.com' % i, term)
+
+
+def make_fan_out():
+  """Delivers in the calling thread so that sending is part of the measurement"""
+  return fanout.FanOut(stubs.StubSender(), executors.InlineExecutor())
+
+
+class Notification(object):
+  """A feed the hub might push, along with the intermediate results each stage starts from"""
+  def __init__(self, count, html, term=SEARCH_TERM):
+    self.count = count
+    self.html = html
+    self.term = term
+    self.body = benchmark_feeds.make_track_feed(count, term=term, html=html)
+    self.parser = pshb.ContentParser(self.body, settings.DEFAULT_HUB, settings.ALWAYS_USE_DEFAULT_HUB)
+    self.posts = self.parser.extractPosts()
+    self.subscribers = xmpp.SearchTerm.get_by_term(term).unique_subscribers()
+    self.fresh_body = None
+    self.delivered = False
+
+
+def _feedparser(notification):
+  feedparser.parse(notification.body)
+
+def _extract_posts(notification):
+  notification.parser.extractPosts()
+
+def _subscriber_lookup(notification):
+  xmpp.SearchTerm.get_by_term(notification.term).unique_subscribers()
+
+def _xmpp_send(notification):
+  xmpp.send_posts(notification.posts, notification.subscribers, notification.term, fan_out=make_fan_out(),
+                  delivery_throttle=stubs.StubDeliveryThrottle())
+
+def _post(notification, body):
+  response = APP.post('/posts?term=%s' % urllib.quote(notification.term), body, content_type='application/atom+xml')
+  assert response.status_int == 200, response.status
+
+def _make_fresh_body(notification):
+  first_id = FRESH_NOTIFICATIONS.next() * max(FEED_SIZES)
+  notification.fresh_body = benchmark_feeds.make_track_feed(notification.count, term=notification.term,
+                                                            html=notification.html, first_id=first_id)
+
+def _end_to_end(notification):
+  _post(notification, notification.fresh_body)
+
+def _deliver_once(notification):
+  if not notification.delivered:
+    _post(notification, notification.body)
+    notification.delivered = True
+
+def _end_to_end_seen(notification):
+  _post(notification, notification.body)
+
+# Each stage is a name, the function being timed and a function, or None, that sets up each call outside the timing
+STAGES = [
+  ('feedparser', _feedparser, None),
+  ('extractPosts', _extract_posts, None),
+  ('subscriber lookup', _subscriber_lookup, None),
+  ('xmpp send', _xmpp_send, None),
+  ('end to end', _end_to_end, _make_fresh_body),
+  ('end to end, seen', _end_to_end_seen, _deliver_once),
+]
+
+
+def percentile(sorted_values, fraction):
+  """Nearest rank percentile of an already sorted list"""
+  index = int(round(fraction * (len(sorted_values) - 1)))
+  return sorted_values[index]
+
+
+def time_stage(fn, notification, iterations, prepare=None):
+  """Returns the latency, in seconds, of each of iterations calls"""
+  latencies = []
+  for i in range(iterations):
+    if prepare is not None:
+      prepare(notification)
+    start = time.time()
+    fn(notification)
+    latencies.append(time.time() - start)
+  latencies.sort()
+  return latencies
+
+
+def peak_memory_kb(fn, notification, prepare=None):
+  """Returns how far one call pushes the peak resident set size above where it started.
+
+  The call is made in a forked child, which starts out with a copy of everything the stage needs, so earlier
+  stages can't hide a later stage's peak. Returns None where fork isn't available."""
+  if not hasattr(os, 'fork'):
+    return None
+  if prepare is not None:
+    prepare(notification)
+  read_end, write_end = os.pipe()
+  pid = os.fork()
+  if pid == 0:
+    try:
+      before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      fn(notification)
+      after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      os.write(write_end, str(after - before))
+    finally:
+      os._exit(0)
+  os.close(write_end)
+  result = os.read(read_end, 64)
+  os.close(read_end)
+  os.waitpid(pid, 0)
+  if not result:
+    return None
+  # ru_maxrss is in kilobytes on Linux but in bytes on Mac OS X
+  if sys.platform == 'darwin':
+    return int(result) // 1024
+  return int(result)
+
+
+def run(iterations=20, subscriber_count=50):
+  setup_stubs()
+  setup_subscribers(subscriber_count)
+  xmpp.FAN_OUT = make_fan_out()
+  # Repeating the same notification would soon divert everything into digests
+  xmpp.DELIVERY_THROTTLE = stubs.StubDeliveryThrottle()
+
+  for html in (False, True):
+    for count in FEED_SIZES:
+      notification = Notification(count, html)
+      streaming = len(notification.body) > settings.STREAMING_PARSE_THRESHOLD
+      print '%d entries, %d bytes, html content: %s, %d subscribers%s' % (
+        count, len(notification.body), html, subscriber_count, streaming and ', streaming parse' or '')
+      print '%-18s %12s %12s %12s %14s' % ('stage', 'entries/s', 'p50 ms', 'p99 ms', 'peak mem KB')
+      for name, fn, prepare in STAGES:
+        latencies = time_stage(fn, notification, iterations, prepare)
+        throughput = count * len(latencies) / (sum(latencies) or 1e-9)
+        memory = peak_memory_kb(fn, notification, prepare)
+        if memory is None:
+          memory = 'n/a'
+        print '%-18s %12.0f %12.2f %12.2f %14s' % (
+          name, throughput, percentile(latencies, 0.5) * 1e3, percentile(latencies, 0.99) * 1e3, memory)
+      print
+
+
+if __name__ == '__main__':
+  args = [int(arg) for arg in sys.argv[1:]]
+  run(*args)
@@ -0,0 +1,91 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from apiclient import json
+
+import simplejson
+import unittest
+
+DOCUMENT = '{"data": {"items": [{"id": "tag:google.com,2010:buzz:z12", "title": "caf\\u00e9", "count": 3}]}}'
+
+
+class FakeJsonModule(object):
+  def __init__(self, name, speedups):
+    self.__name__ = name
+    self.speedups = speedups
+
+  def speedups_enabled(self):
+    return self.speedups
+
+
+class SimplejsonSpeedupsTest(unittest.TestCase):
+  def tearDown(self):
+    simplejson._toggle_speedups(True)
+    simplejson._verify_speedups()
+
+  def test_decodes_the_same_with_and_without_speedups(self):
+    with_speedups = simplejson.loads(DOCUMENT)
+    simplejson._toggle_speedups(False)
+
+    self.assertFalse(simplejson.speedups_enabled())
+    self.assertEquals(with_speedups, simplejson.loads(DOCUMENT))
+    self.assertEquals(u'caf\u00e9', simplejson.loads(DOCUMENT)['data']['items'][0]['title'])
+
+  def test_broken_speedups_are_turned_off(self):
+    if not simplejson.speedups_enabled():
+      return
+    dumps = simplejson.dumps
+    simplejson.dumps = lambda *args, **kwargs: '{}'
+    try:
+      self.assertFalse(simplejson._verify_speedups())
+    finally:
+      simplejson.dumps = dumps
+
+    self.assertFalse(simplejson.speedups_enabled())
+
+
+class ChooseBackendTest(unittest.TestCase):
+  def setUp(self):
+    self.candidates = json.CANDIDATES
+    self.original_import = json._import
+
+  def tearDown(self):
+    json.CANDIDATES = self.candidates
+    json._import = self.original_import
+
+  def use_modules(self, modules):
+    json.CANDIDATES = [module.__name__ for module in modules]
+    json._import = dict([(module.__name__, module) for module in modules]).get
+
+  def test_prefers_a_module_with_speedups(self):
+    self.use_modules([FakeJsonModule('slow', False), FakeJsonModule('fast', True)])
+
+    self.assertEquals('fast', json._choose().__name__)
+
+  def test_falls_back_to_the_first_module_that_can_be_imported(self):
+    self.use_modules([FakeJsonModule('first', False), FakeJsonModule('second', False)])
+
+    self.assertEquals('first', json._choose().__name__)
+
+  def test_complains_if_there_is_no_module(self):
+    self.use_modules([])
+    json.CANDIDATES = ['missing']
+
+    self.assertRaises(ImportError, json._choose)
+
+  def test_describes_the_backend(self):
+    self.assertTrue(json.backend().startswith(json.simplejson.__name__))
+
+
+if __name__ == '__main__':
+  unittest.main()
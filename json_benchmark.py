@@ -0,0 +1,96 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how fast JsonModel.response decodes Buzz activities responses with each JSON backend.
+
+The vendored simplejson is timed with its C speedups, when they've been compiled with build_speedups.py, and in pure
+Python. The standard library's json module is timed too where there is one. Each backend decodes the whole response
+and then, as SimpleBuzzWrapper.search does, just the fields of each item that the search command uses.
+
+Run it like this:
+python build_speedups.py
+python json_benchmark.py [iterations]
+"""
+
+from apiclient import discovery
+
+import benchmark_feeds
+import simple_buzz_wrapper
+import simplejson
+import sys
+import time
+
+RESPONSE_SIZES = [1, 20, 100]
+
+
+class Response(dict):
+  """Just enough of an httplib2 response for JsonModel"""
+  status = 200
+  reason = 'OK'
+
+
+def backends():
+  """Yields (name, module) for each backend there is, switching the vendored simplejson's speedups as it goes"""
+  if simplejson.speedups_enabled():
+    yield 'simplejson C', simplejson
+  simplejson._toggle_speedups(False)
+  try:
+    yield 'simplejson Python', simplejson
+  finally:
+    simplejson._toggle_speedups(True)
+    simplejson._verify_speedups()
+  try:
+    import json
+  except ImportError:
+    return
+  yield 'json (%s)' % (json.scanner.c_make_scanner and 'C' or 'Python'), json
+
+
+def time_response(model, content, iterations):
+  """Returns the fastest time, in seconds, that JsonModel took to decode the content"""
+  response = Response()
+  best = None
+  for i in range(iterations):
+    start = time.time()
+    model.response(response, content)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+
+MODELS = [
+  ('whole', discovery.JsonModel()),
+  ('search fields', simple_buzz_wrapper.SEARCH_RESULTS_MODEL),
+]
+
+
+def run(iterations=20):
+  original = discovery.simplejson
+  contents = [(count, benchmark_feeds.make_activities_json(count, html=True)) for count in RESPONSE_SIZES]
+  print '%-20s %-14s %8s %8s %10s %10s' % ('backend', 'decoding', 'items', 'KB', 'ms', 'MB/s')
+  try:
+    for name, module in backends():
+      discovery.simplejson = module
+      for model_name, model in MODELS:
+        for count, content in contents:
+          elapsed = time_response(model, content, iterations)
+          print '%-20s %-14s %8d %8.1f %10.3f %10.1f' % (
+            name, model_name, count, len(content) / 1024.0, elapsed * 1e3, len(content) / (elapsed or 1e-9) / 1e6)
+  finally:
+    discovery.simplejson = original
+
+
+if __name__ == '__main__':
+  args = [int(arg) for arg in sys.argv[1:]]
+  run(*args)
@@ -0,0 +1,110 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from google.appengine.ext import db
+from stubs import StubHubSubscriber
+from xmpp import LeaseRenewer, SearchTerm, Subscription, Tracker
+
+import datetime
+import settings
+import unittest
+
+
+class LeaseRenewerTest(unittest.TestCase):
+  def setUp(self):
+    self.hub_subscriber = StubHubSubscriber()
+    self.renewer = LeaseRenewer(hub_subscriber=self.hub_subscriber)
+    self.tracker = Tracker(hub_subscriber=StubHubSubscriber())
+
+  def tearDown(self):
+    db.delete(Subscription.all(keys_only=True).fetch(1000))
+    db.delete(SearchTerm.all(keys_only=True).fetch(1000))
+
+  def _after_renewal_window(self, term):
+    search_term = SearchTerm.get_by_term(term)
+    return search_term.lease_expires - datetime.timedelta(seconds=settings.LEASE_RENEWAL_WINDOW - 1)
+
+  def test_new_search_terms_are_given_a_lease(self):
+    self.tracker.track('foo@example.com', 'somestring')
+
+    search_term = SearchTerm.get_by_term('somestring')
+    self.assertTrue(search_term.lease_expires > datetime.datetime.utcnow())
+    self.assertTrue(search_term.renew_at < search_term.lease_expires)
+
+  def test_leases_are_not_renewed_until_they_are_about_to_expire(self):
+    self.tracker.track('foo@example.com', 'somestring')
+
+    self.assertEquals((0, 0), self.renewer.renew())
+    self.assertEquals([], self.hub_subscriber.subscribed)
+
+  def test_expiring_leases_are_renewed(self):
+    self.tracker.track('foo@example.com', 'somestring')
+    now = self._after_renewal_window('somestring')
+
+    self.assertEquals((1, 0), self.renewer.renew(now=now))
+    self.assertEquals([self.tracker._build_term_callback_url('somestring')], self.hub_subscriber.subscribed)
+
+  def test_renewals_are_retried_until_the_hub_verifies_them(self):
+    self.tracker.track('foo@example.com', 'somestring')
+    now = self._after_renewal_window('somestring')
+    self.renewer.renew(now=now)
+
+    # Nothing happens until the retry is due
+    self.assertEquals((0, 0), self.renewer.renew(now=now))
+    later = now + datetime.timedelta(seconds=settings.LEASE_RENEWAL_RETRY)
+    self.assertEquals((1, 0), self.renewer.renew(now=later))
+
+    lease_seconds = settings.LEASE_RENEWAL_WINDOW * 2
+    LeaseRenewer.record_lease(SearchTerm.get_by_term('somestring'), lease_seconds, now=later)
+    self.assertEquals((0, 0), self.renewer.renew(now=later))
+    search_term = SearchTerm.get_by_term('somestring')
+    self.assertEquals(later + datetime.timedelta(seconds=lease_seconds), search_term.lease_expires)
+
+  def test_renewals_are_rate_limited_per_hub(self):
+    limit = settings.LEASE_RENEWALS_PER_HUB
+    settings.LEASE_RENEWALS_PER_HUB = 2
+    try:
+      for term in ['a', 'b', 'c']:
+        self.tracker.track('foo@example.com', term)
+      now = self._after_renewal_window('c')
+
+      self.assertEquals((2, 1), self.renewer.renew(now=now))
+      self.assertEquals(1, LeaseRenewer.backlog())
+      self.assertEquals((1, 0), self.renewer.renew(now=now))
+    finally:
+      settings.LEASE_RENEWALS_PER_HUB = limit
+
+  def test_subscriptions_made_before_search_terms_were_shared_are_renewed(self):
+    subscription = Subscription(url='http://example.com/feed', search_term='old', subscriber='foo@example.com')
+    subscription.put()
+    LeaseRenewer.record_lease(subscription)
+    now = subscription.renew_at
+
+    self.assertEquals((1, 0), self.renewer.renew(now=now))
+    self.assertEquals([self.tracker._build_callback_url(subscription)], self.hub_subscriber.subscribed)
+
+  def test_recording_a_lease_keeps_subscribers_added_since_the_term_was_read(self):
+    self.tracker.track('foo@example.com', 'somestring')
+    search_term = SearchTerm.get_by_term('somestring')
+    self.tracker.track('bar@example.com', 'somestring')
+
+    LeaseRenewer.record_lease(search_term)
+    self.assertEquals(['foo@example.com', 'bar@example.com'], SearchTerm.get_by_term('somestring').subscribers)
+
+  def test_recording_a_lease_does_not_recreate_an_untracked_term(self):
+    subscription = self.tracker.track('foo@example.com', 'somestring')
+    search_term = SearchTerm.get_by_term('somestring')
+    self.tracker.untrack('foo@example.com', str(subscription.id()))
+
+    LeaseRenewer.record_lease(search_term)
+    self.assertEquals(None, SearchTerm.get_by_term('somestring'))
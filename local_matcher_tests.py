@@ -0,0 +1,96 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from google.appengine.ext import db
+from stubs import StubHubSubscriber
+from xmpp import LocalMatcher, SearchTerm, Subscription, Tracker
+
+import pshb
+import unittest
+import xmpp
+
+
+def make_post(title, content=''):
+  return pshb.Post(url='http://www.google.com/buzz/1', feedUrl='http://feed', title=title, content=content)
+
+
+class LocalMatcherTest(unittest.TestCase):
+  def setUp(self):
+    self.local_matcher = xmpp.LOCAL_MATCHER = LocalMatcher()
+    self.tracker = Tracker(hub_subscriber=StubHubSubscriber())
+
+  def tearDown(self):
+    db.delete(Subscription.all(keys_only=True).fetch(1000))
+    db.delete(SearchTerm.all(keys_only=True).fetch(1000))
+
+  def test_matches_posts_against_each_tracked_term(self):
+    self.tracker.track('foo@example.com', 'Buzz  users')
+    self.tracker.track('bar@example.com', 'chat  bot')
+    self.tracker.track('baz@example.com', 'somewhere else')
+
+    post = make_post('A chat bot for Buzz users', '<p>hello</p>')
+
+    self.assertEquals([post], self.local_matcher.filter_posts([post], 'buzz users'))
+    self.assertEquals([post], self.local_matcher.filter_posts([post], 'chat bot'))
+    self.assertEquals([], self.local_matcher.filter_posts([post], 'somewhere else'))
+
+  def test_each_term_is_compiled_once(self):
+    self.local_matcher.filter_posts([make_post('a chat bot')], 'chat bot')
+    phrases = self.local_matcher.phrases.get('chat bot')
+
+    self.assertEquals([], self.local_matcher.filter_posts([make_post('a bot to chat to')], 'chat bot'))
+    self.assertTrue(self.local_matcher.phrases.get('chat bot') is phrases)
+
+  def test_posts_are_only_matched_against_their_own_term(self):
+    self.local_matcher.filter_posts([make_post('buzz users')], 'buzz users')
+
+    self.assertEquals([], self.local_matcher.filter_posts([make_post('Buzz users')], 'chat bot'))
+    self.assertEquals(1, len(self.local_matcher.phrases.get('chat bot')))
+
+  def test_matches_terms_tracked_by_another_instance(self):
+    xmpp.LOCAL_MATCHER = LocalMatcher()
+    self.tracker.track('foo@example.com', 'chat bot')
+
+    self.assertEquals([], self.local_matcher.filter_posts([make_post('a bot to chat to')], 'chat bot'))
+
+  def test_least_recently_used_terms_are_dropped(self):
+    local_matcher = LocalMatcher(cache_size=1)
+    local_matcher.filter_posts([make_post('buzz users')], 'buzz users')
+    local_matcher.filter_posts([make_post('chat bot')], 'chat bot')
+
+    self.assertFalse('buzz users' in local_matcher.phrases)
+    self.assertEquals([], local_matcher.filter_posts([make_post('users of buzz')], 'buzz users'))
+
+  def test_content_is_matched_without_its_markup(self):
+    self.tracker.track('foo@example.com', 'fish & chips')
+
+    post = make_post('Dinner', '<b>fish</b> &amp; <i>chips</i>')
+
+    self.assertEquals([post], self.local_matcher.filter_posts([post], 'fish & chips'))
+
+  def test_drops_posts_without_the_phrase(self):
+    self.tracker.track('foo@example.com', 'chat bot')
+    with_phrase = make_post('A chat bot')
+    without_phrase = make_post('A bot you can chat to')
+
+    self.assertEquals([with_phrase], self.local_matcher.filter_posts([with_phrase, without_phrase], 'chat bot'))
+
+  def test_keeps_every_post_for_single_word_terms(self):
+    self.tracker.track('foo@example.com', 'buzz')
+    posts = [make_post('nothing to see')]
+
+    self.assertEquals(posts, self.local_matcher.filter_posts(posts, 'buzz'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,99 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A bounded, in-process, least recently used cache"""
+
+import time
+
+# Indexes into the list that represents a node of the recency list
+PREVIOUS, NEXT, KEY, VALUE, CREATED = 0, 1, 2, 3, 4
+
+
+class LRUCache(object):
+  """Maps keys to values, evicting the least recently used key once there are more than max_size of them.
+
+  If max_age is given then values older than max_age seconds are treated as missing. The entries are kept in a
+  circular doubly linked list, most recently used first, so every operation takes constant time."""
+
+  def __init__(self, max_size, max_age=None, clock=time.time):
+    if max_size < 1:
+      raise ValueError('max_size must be at least 1')
+    self.max_size = max_size
+    self.max_age = max_age
+    self.clock = clock
+    self.hits = 0
+    self.misses = 0
+    self.clear()
+
+  def clear(self):
+    self.map = {}
+    self.root = []
+    self.root[:] = [self.root, self.root, None, None, None]
+
+  def __len__(self):
+    return len(self.map)
+
+  def __contains__(self, key):
+    node = self.map.get(key)
+    return node is not None and not self._expired(node)
+
+  def _unlink(self, node):
+    node[PREVIOUS][NEXT] = node[NEXT]
+    node[NEXT][PREVIOUS] = node[PREVIOUS]
+
+  def _link_first(self, node):
+    first = self.root[NEXT]
+    node[PREVIOUS] = self.root
+    node[NEXT] = first
+    first[PREVIOUS] = node
+    self.root[NEXT] = node
+
+  def _expired(self, node):
+    return self.max_age is not None and self.clock() - node[CREATED] > self.max_age
+
+  def get(self, key, default=None):
+    node = self.map.get(key)
+    if node is None or self._expired(node):
+      if node is not None:
+        self.pop(key)
+      self.misses += 1
+      return default
+    self._unlink(node)
+    self._link_first(node)
+    self.hits += 1
+    return node[VALUE]
+
+  def put(self, key, value):
+    node = self.map.get(key)
+    if node is not None:
+      self._unlink(node)
+    node = [None, None, key, value, self.clock()]
+    self._link_first(node)
+    self.map[key] = node
+    if len(self.map) > self.max_size:
+      oldest = self.root[PREVIOUS]
+      self._unlink(oldest)
+      del self.map[oldest[KEY]]
+
+  def pop(self, key, default=None):
+    node = self.map.pop(key, None)
+    if node is None:
+      return default
+    self._unlink(node)
+    return node[VALUE]
+
+  def hit_ratio(self):
+    lookups = self.hits + self.misses
+    if not lookups:
+      return 0.0
+    return float(self.hits) / lookups
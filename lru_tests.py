@@ -0,0 +1,83 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from lru import LRUCache
+
+import unittest
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class LRUCacheTest(unittest.TestCase):
+  def test_returns_stored_values(self):
+    cache = LRUCache(2)
+    cache.put('a', 1)
+
+    self.assertEquals(1, cache.get('a'))
+    self.assertEquals(None, cache.get('b'))
+    self.assertEquals('default', cache.get('b', 'default'))
+
+  def test_evicts_least_recently_used_key(self):
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+
+    cache.put('c', 3)
+
+    self.assertTrue('a' in cache)
+    self.assertFalse('b' in cache)
+    self.assertTrue('c' in cache)
+    self.assertEquals(2, len(cache))
+
+  def test_replacing_a_value_does_not_grow_the_cache(self):
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('a', 2)
+
+    self.assertEquals(2, cache.get('a'))
+    self.assertEquals(1, len(cache))
+
+  def test_pop_removes_values(self):
+    cache = LRUCache(2)
+    cache.put('a', 1)
+
+    self.assertEquals(1, cache.pop('a'))
+    self.assertEquals(None, cache.pop('a'))
+    self.assertFalse('a' in cache)
+
+  def test_values_expire(self):
+    clock = FakeClock()
+    cache = LRUCache(2, max_age=60, clock=clock)
+    cache.put('a', 1)
+
+    clock.now += 61
+
+    self.assertEquals(None, cache.get('a'))
+    self.assertEquals(0, len(cache))
+
+  def test_counts_hits_and_misses(self):
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+
+    self.assertEquals(1, cache.hits)
+    self.assertEquals(1, cache.misses)
+    self.assertEquals(0.5, cache.hit_ratio())
@@ -17,11 +17,13 @@ from google.appengine.ext.webapp import template
 from google.appengine.ext.webapp.util import login_required
 from google.appengine.ext.webapp.util import run_wsgi_app
 
+import executors
 import logging
 import oauth_handlers
 import os
 import settings
 import xmpp
+import xml.sax
 import pshb
 import simple_buzz_wrapper
 
@@ -53,29 +55,42 @@ class FrontPageHandler(webapp.RequestHandler):
     self.response.out.write(template.render(path, template_values))
 
 class PostsHandler(webapp.RequestHandler):
-  def _get_subscription(self):
-    logging.info("Headers were: %s" % str(self.request.headers))
-    logging.info('Request: %s' % str(self.request))
-    id = self.request.get('id')
-    subscription = xmpp.Subscription.get_by_id(int(id))
-    return subscription
+  def _get_target(self):
+    """Returns the SearchTerm this callback is for or, for callbacks registered before search terms were shared,
+    the Subscription. Both of them provide a search_term and unique_subscribers()."""
+    term = self.request.get('term')
+    if term:
+      return xmpp.SearchTerm.get_by_term(term)
+    id = xmpp.Tracker.extract_number(self.request.get('id'))
+    if id is None:
+      return None
+    return xmpp.Subscription.get_by_id(id)
+
+  def _get_lease_seconds(self):
+    """The hub says how long the subscription will last when it verifies it, or None if it didn't say"""
+    try:
+      return int(self.request.get('hub.lease_seconds'))
+    except ValueError:
+      return None
 
   def get(self):
     """Show all the resources in this collection"""
     logging.info("Headers were: %s" % str(self.request.headers))
     logging.info('Request: %s' % str(self.request))
-    id = self.request.get('id')
-    logging.debug("Request id = '%s'", id)
 
     # If this is a hub challenge
     if self.request.get('hub.challenge'):
     # If this subscription exists
       mode = self.request.get('hub.mode')
       topic = self.request.get('hub.topic')
-      if mode == "subscribe" and xmpp.Subscription.get_by_id(int(id)):
+      target = self._get_target()
+      if mode == "subscribe" and target:
         self.response.out.write(self.request.get('hub.challenge'))
+        # A Subscription that shares its SearchTerm's hub subscription has no lease of its own
+        if target.has_own_hub_subscription():
+          xmpp.LeaseRenewer.record_lease(target, self._get_lease_seconds())
         logging.info("Successfully accepted %s challenge for feed: %s" % (mode, topic))
-      elif mode == "unsubscribe" and not xmpp.Subscription.get_by_id(int(id)):
+      elif mode == "unsubscribe" and not target:
         self.response.out.write(self.request.get('hub.challenge'))
         logging.info("Successfully accepted %s challenge for feed: %s" % (mode, topic))
       else:
@@ -88,30 +103,107 @@ class PostsHandler(webapp.RequestHandler):
   def post(self):
     """Create a new resource in this collection"""
     logging.info("Headers were: %s" % str(self.request.headers))
-    id = self.request.get('id')
-    logging.debug("Request id = '%s'", id)
 
-    subscription = xmpp.Subscription.get_by_id(int(id))
-    if not subscription:
+    target = self._get_target()
+    if not target:
       self.response.set_status(404)
       self.response.out.write("No such subscription")
-      logging.warning('No subscription for %s' % id)
+      logging.warning('No subscription for term: %s id: %s' % (self.request.get('term'), self.request.get('id')))
       return
 
-    subscriber = subscription.subscriber
-    search_term = subscription.search_term
+    # The notification is parsed once and then delivered to everyone tracking the term
+    if len(self.request.body) > settings.STREAMING_PARSE_THRESHOLD:
+      if not self._deliver_streaming(target):
+        return
+    else:
+      posts, url = self._parse()
+      if posts is None:
+        return
+      self._deliver(target, posts, url)
+    self.response.set_status(200)
+
+  def _deliver(self, target, posts, url):
+    if settings.MATCH_PHRASES_LOCALLY and isinstance(target, xmpp.SearchTerm):
+      matched = xmpp.LOCAL_MATCHER.filter_posts(posts, target.search_term)
+      if len(matched) < len(posts):
+        logging.info('Dropped %s posts which do not contain the phrase: %s' %
+                     (len(posts) - len(matched), target.search_term))
+      posts = matched
+
+    # Hubs re-push entries when they retry and polling hubs send overlapping windows
+    posts, suppressed = pshb.SeenEntries.filterUnseen(target.seen_key, posts)
+    subscribers = target.unique_subscribers()
+    logging.info("Successfully received %s new posts and suppressed %s duplicates for %s subscribers of: %s" %
+                 (len(posts), suppressed, len(subscribers), url))
+    xmpp.send_posts(posts, subscribers, target.search_term)
+    pshb.SeenEntries.markSeen(target.seen_key, posts)
+
+  def _parse(self):
+    """Returns the posts and feed url from the notification or (None, None) if it was invalid"""
     parser = pshb.ContentParser(self.request.body, settings.DEFAULT_HUB, settings.ALWAYS_USE_DEFAULT_HUB)
     url = parser.extractFeedUrl()
 
     if not parser.dataValid():
       parser.logErrors()
       self.response.out.write("Bad entries: %s" % parser.data)
-      return
-    else:
-      posts = parser.extractPosts()
-      logging.info("Successfully received %s posts for subscription: %s" % (len(posts), url))
-      xmpp.send_posts(posts, subscriber, search_term)
-      self.response.set_status(200)
+      return None, None
+    return parser.extractPosts(), url
+
+  def _deliver_streaming(self, target):
+    """Parses and delivers the notification settings.STREAMING_BATCH_SIZE posts at a time so that only one batch of
+    the feed's posts is ever held in memory. If the feed turns out to be malformed the posts before the error are
+    still delivered, since earlier batches may already have gone out, and False is returned."""
+    parser = pshb.StreamingContentParser(self.request.body)
+    posts = parser.iterPosts()
+    batch = []
+    while True:
+      try:
+        batch.append(posts.next())
+      except StopIteration:
+        break
+      except xml.sax.SAXException, e:
+        logging.error('Bad feed data. %s: %r', e.__class__.__name__, e)
+        self.response.out.write("Bad entries: %s" % e)
+        if batch:
+          self._deliver(target, batch, parser.extractFeedUrl())
+        return False
+      if len(batch) >= settings.STREAMING_BATCH_SIZE:
+        self._deliver(target, batch, parser.extractFeedUrl())
+        batch = []
+    if batch:
+      self._deliver(target, batch, parser.extractFeedUrl())
+    return True
+
+class SeenEntriesPurgingHandler(webapp.RequestHandler):
+  """Run by cron to delete the records of entries that were delivered too long ago to be pushed again"""
+  def get(self):
+    deleted = pshb.SeenEntry.deleteExpired()
+    logging.info('Deleted %s expired seen entries' % deleted)
+    self.response.out.write('Deleted %s' % deleted)
+
+class HubOperationDispatchingHandler(webapp.RequestHandler):
+  """Run by cron in case the task that sends pending hub operations was lost"""
+  def get(self):
+    sent = pshb.dispatchHubOperations(executors.DeferredExecutor())
+    self.response.out.write('Sent %s' % sent)
+
+class LeaseRenewingHandler(webapp.RequestHandler):
+  """Run by cron to renew hub subscriptions whose leases are about to expire"""
+  def get(self):
+    renewed, waiting = xmpp.LeaseRenewer().renew()
+    self.response.out.write('Renewed %s. Backlog %s' % (renewed, waiting))
+
+class DigestSendingHandler(webapp.RequestHandler):
+  """Run by cron to send the posts that were held back from subscribers who had been sent too many, as digests"""
+  def get(self):
+    sent = xmpp.send_digests()
+    self.response.out.write('Sent %s' % sent)
+
+class LeaseBackfillingHandler(webapp.RequestHandler):
+  """Run once, by an admin, to start tracking the leases of hub subscriptions made before leases were tracked"""
+  def get(self):
+    executors.DeferredExecutor().submit(xmpp.backfill_leases)
+    self.response.out.write('Started')
 
 application = webapp.WSGIApplication([
                                          (settings.FRONT_PAGE_HANDLER_URL, FrontPageHandler),
@@ -120,6 +212,11 @@ application = webapp.WSGIApplication([
                                          ('/finish_dance', oauth_handlers.DanceFinishingHandler),
                                          ('/delete_tokens', oauth_handlers.TokenDeletionHandler),
                                          ('/posts', PostsHandler),
+                                         ('/tasks/purge_seen_entries', SeenEntriesPurgingHandler),
+                                         ('/tasks/dispatch_hub_operations', HubOperationDispatchingHandler),
+                                         ('/tasks/renew_leases', LeaseRenewingHandler),
+                                         ('/tasks/backfill_leases', LeaseBackfillingHandler),
+                                         ('/tasks/send_digests', DigestSendingHandler),
                                          ('/_ah/xmpp/message/chat/', xmpp.XmppHandler), ],
                                      debug=True)
 
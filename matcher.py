@@ -0,0 +1,174 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Finds which of many phrases appear in a piece of text by reading the text once"""
+
+import collections
+import re
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+# The root of the automaton
+ROOT = 0
+
+
+def tokenize(text, stopwords=()):
+  """Splits text into lower case words, leaving out any stopwords"""
+  if isinstance(text, str):
+    text = text.decode('utf-8', 'replace')
+  return [word for word in WORD.findall(text.lower()) if word not in stopwords]
+
+
+class PhraseMatcher(object):
+  """An Aho-Corasick automaton whose alphabet is words rather than characters.
+
+  A phrase matches text which contains its words, in the same order, with nothing else in between. Case is ignored
+  and so is everything that isn't part of a word, so 'Foo-bar' matches the phrase 'foo bar' but 'foobar' doesn't.
+  Each phrase has a set of values, and match returns the values of every phrase found.
+
+  Adding or removing a phrase only changes the trie nodes along its path. The failure links, which let match read
+  each word of the text once no matter how many phrases there are, are worked out again before the next match."""
+
+  def __init__(self, stopwords=()):
+    self.stopwords = frozenset(stopwords)
+    # Indexed by node: the node reached by each word, the node it was reached from and the values of the phrase
+    # that ends there
+    self._goto = [{}]
+    self._parent = [None]
+    self._values = [None]
+    self._free = []
+    self._phrases = 0
+    self._fail = None
+    self._output = None
+
+  def _words(self, phrase):
+    return tuple(tokenize(phrase, self.stopwords))
+
+  def _new_node(self, parent):
+    if self._free:
+      node = self._free.pop()
+      self._goto[node] = {}
+      self._parent[node] = parent
+      self._values[node] = None
+    else:
+      node = len(self._goto)
+      self._goto.append({})
+      self._parent.append(parent)
+      self._values.append(None)
+    return node
+
+  def _find(self, words):
+    node = ROOT
+    for word in words:
+      node = self._goto[node].get(word)
+      if node is None:
+        return None
+    return node
+
+  def add(self, phrase, value):
+    """Returns False if the phrase has no words that can be matched"""
+    words = self._words(phrase)
+    if not words:
+      return False
+    node = ROOT
+    for word in words:
+      child = self._goto[node].get(word)
+      if child is None:
+        child = self._new_node((node, word))
+        self._goto[node][word] = child
+        self._fail = None
+      node = child
+    if self._values[node] is None:
+      self._values[node] = set()
+      self._phrases += 1
+      self._fail = None
+    self._values[node].add(value)
+    return True
+
+  def remove(self, phrase, value):
+    """Returns False if the phrase didn't have the value"""
+    node = self._find(self._words(phrase))
+    if node is None or node == ROOT or not self._values[node] or value not in self._values[node]:
+      return False
+    self._values[node].discard(value)
+    if self._values[node]:
+      return True
+    self._values[node] = None
+    self._phrases -= 1
+    self._fail = None
+    # Prune the nodes that no other phrase needs
+    while node != ROOT and not self._goto[node] and self._values[node] is None:
+      parent, word = self._parent[node]
+      del self._goto[parent][word]
+      self._parent[node] = None
+      self._free.append(node)
+      node = parent
+    return True
+
+  def __len__(self):
+    return self._phrases
+
+  def __contains__(self, phrase):
+    node = self._find(self._words(phrase))
+    return node is not None and node != ROOT and self._values[node] is not None
+
+  def _build(self):
+    """Works out each node's failure link, the node for the longest proper suffix of its words that's also in the
+    trie, and its output link, the nearest node along the failure links where a phrase ends"""
+    goto = self._goto
+    values = self._values
+    fail = [ROOT] * len(goto)
+    output = [ROOT] * len(goto)
+    queue = collections.deque(goto[ROOT].values())
+    while queue:
+      node = queue.popleft()
+      for word, child in goto[node].iteritems():
+        suffix = fail[node]
+        while suffix != ROOT and word not in goto[suffix]:
+          suffix = fail[suffix]
+        suffix = goto[suffix].get(word, ROOT)
+        if suffix == child:
+          suffix = ROOT
+        fail[child] = suffix
+        if values[suffix] is not None:
+          output[child] = suffix
+        else:
+          output[child] = output[suffix]
+        queue.append(child)
+    self._fail = fail
+    self._output = output
+
+  def match(self, *texts):
+    """Returns the union of the values of every phrase that appears in any of the texts"""
+    if self._fail is None:
+      self._build()
+    goto = self._goto
+    fail = self._fail
+    output = self._output
+    values = self._values
+    found = set()
+    for text in texts:
+      if not text:
+        continue
+      node = ROOT
+      for word in tokenize(text, self.stopwords):
+        while node != ROOT and word not in goto[node]:
+          node = fail[node]
+        node = goto[node].get(word, ROOT)
+        if values[node] is not None:
+          found.update(values[node])
+        match = output[node]
+        while match != ROOT:
+          found.update(values[match])
+          match = output[match]
+    return found
@@ -0,0 +1,104 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how many posts per second can be matched against every tracked term by matcher.PhraseMatcher and by
+searching each post for each term in turn, and how long it takes to add a term to a PhraseMatcher.
+
+Run it like this:
+python matcher_benchmark.py [number of posts]
+"""
+
+import matcher
+import random
+import re
+import sys
+import time
+
+TERM_COUNTS = [10, 100, 1000, 10000]
+
+# Deterministic text so that runs can be compared with each other
+RANDOM = random.Random(42)
+VOCABULARY = ['word%d' % i for i in range(5000)]
+
+
+def make_terms(count):
+  terms = set()
+  while len(terms) < count:
+    terms.add(' '.join(RANDOM.sample(VOCABULARY, RANDOM.choice([1, 1, 2, 3]))))
+  return sorted(terms)
+
+
+def make_posts(count, terms):
+  posts = []
+  for i in range(count):
+    words = RANDOM.sample(VOCABULARY, 40)
+    # Roughly one post in four mentions a term being tracked
+    if i % 4 == 0:
+      words[RANDOM.randrange(len(words))] = RANDOM.choice(terms)
+    posts.append(('Post %d' % i, ' '.join(words)))
+  return posts
+
+
+def naive_matcher(terms):
+  patterns = [(term, re.compile(r'\b%s\b' % r'\W+'.join(term.split()), re.UNICODE)) for term in terms]
+  def match(title, content):
+    texts = [title.lower(), content.lower()]
+    return set([term for term, pattern in patterns if pattern.search(texts[0]) or pattern.search(texts[1])])
+  return match
+
+
+def phrase_matcher(terms):
+  phrases = matcher.PhraseMatcher()
+  for term in terms:
+    phrases.add(term, term)
+  return phrases.match
+
+
+def posts_per_second(match, posts):
+  start = time.time()
+  for title, content in posts:
+    match(title, content)
+  return len(posts) / (time.time() - start)
+
+
+def seconds_to_add(terms):
+  """Returns how long it takes to add one more term and match once, which rebuilds the failure links"""
+  phrases = matcher.PhraseMatcher()
+  for term in terms:
+    phrases.add(term, term)
+  phrases.match('warm up')
+  start = time.time()
+  phrases.add('one more term', 'one more term')
+  phrases.match('one more term')
+  return time.time() - start
+
+
+def run(post_count=1000):
+  print '%10s %16s %16s %10s %14s' % ('terms', 'naive posts/s', 'automaton /s', 'speed up', 'add term ms')
+  for count in TERM_COUNTS:
+    terms = make_terms(count)
+    posts = make_posts(post_count, terms)
+    # The naive matcher is too slow to run every post against lots of terms
+    naive_posts = posts[:max(10, post_count * 10 // count)]
+    for title, content in naive_posts:
+      assert naive_matcher(terms)(title, content) == phrase_matcher(terms)(title, content)
+    before = posts_per_second(naive_matcher(terms), naive_posts)
+    after = posts_per_second(phrase_matcher(terms), posts)
+    print '%10d %16.0f %16.0f %9.1fx %14.2f' % (count, before, after, after / before, seconds_to_add(terms) * 1e3)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
@@ -0,0 +1,86 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from matcher import PhraseMatcher, tokenize
+
+import unittest
+
+
+class TokenizeTest(unittest.TestCase):
+  def test_splits_into_lower_case_words(self):
+    self.assertEquals(['foo', 'bar', 'baz'], tokenize('Foo-BAR, baz!'))
+
+  def test_leaves_out_stopwords(self):
+    self.assertEquals(['state', 'art'], tokenize('State of the art', stopwords=['of', 'the']))
+
+  def test_decodes_utf8(self):
+    self.assertEquals([u'caf\u00e9'], tokenize(u'Caf\u00e9'.encode('utf-8')))
+
+
+class PhraseMatcherTest(unittest.TestCase):
+  def setUp(self):
+    self.matcher = PhraseMatcher()
+    for phrase in ['foo bar', 'bar', 'bar baz qux', 'a b c', 'b c d', 'c']:
+      self.matcher.add(phrase, phrase)
+
+  def test_finds_every_phrase_in_the_text(self):
+    self.assertEquals(set(['foo bar', 'bar']), self.matcher.match('Some FOO-bar here'))
+    self.assertEquals(set(['a b c', 'b c d', 'c']), self.matcher.match('a b c d'))
+
+  def test_only_matches_whole_words_in_order(self):
+    self.assertEquals(set(), self.matcher.match('foobar'))
+    self.assertEquals(set(['bar']), self.matcher.match('bar foo'))
+    self.assertEquals(set(['bar']), self.matcher.match('bar baz and qux'))
+
+  def test_matches_across_several_texts(self):
+    self.assertEquals(set(['foo bar', 'bar', 'c']), self.matcher.match('foo bar', None, 'c'))
+
+  def test_phrases_can_share_a_value_and_have_several(self):
+    self.matcher.add('FOO  bar', 'another')
+
+    self.assertEquals(set(['foo bar', 'another', 'bar']), self.matcher.match('foo bar'))
+
+  def test_removing_a_phrase_keeps_the_others(self):
+    self.assertTrue(self.matcher.remove('bar', 'bar'))
+    self.assertTrue(self.matcher.remove('b c d', 'b c d'))
+
+    self.assertEquals(set(['foo bar', 'a b c', 'c']), self.matcher.match('foo bar a b c d'))
+    self.assertFalse('bar' in self.matcher)
+    self.assertEquals(4, len(self.matcher))
+
+  def test_removing_prunes_nodes_no_phrase_needs(self):
+    nodes = len(self.matcher._goto) - len(self.matcher._free)
+    self.matcher.add('one two three', 1)
+    self.matcher.remove('one two three', 1)
+
+    self.assertEquals(nodes, len(self.matcher._goto) - len(self.matcher._free))
+    self.assertFalse('one' in self.matcher._goto[0])
+
+  def test_removing_a_missing_phrase_does_nothing(self):
+    self.assertFalse(self.matcher.remove('missing', 'missing'))
+    self.assertFalse(self.matcher.remove('foo bar', 'wrong value'))
+    self.assertFalse(self.matcher.remove('foo', 'foo'))
+
+  def test_phrases_without_words_are_not_added(self):
+    self.assertFalse(self.matcher.add('!!!', 'nothing'))
+    self.assertEquals(6, len(self.matcher))
+
+  def test_stopwords_are_ignored(self):
+    matcher = PhraseMatcher(stopwords=['of', 'the'])
+    matcher.add('state of the art', 1)
+
+    self.assertEquals(set([1]), matcher.match('The state of art'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -35,6 +35,11 @@ try:
 except ImportError:
     from cgi import parse_qs, parse_qsl
 
+try:
+    from hashlib import sha1 as sha
+except ImportError:
+    import sha # Deprecated
+
 
 VERSION = '1.0'  # Hi Blaine!
 HTTP_METHOD = 'GET'
@@ -718,6 +723,89 @@ class SignatureMethod_HMAC_SHA1(SignatureMethod):
         return binascii.b2a_base64(hashed.digest())[:-1]
 
 
+def _encode_parameter(key, value):
+    """Encodes one parameter the way urllib.urlencode does."""
+    return urllib.quote_plus(str(key)) + '=' + urllib.quote_plus(str(value))
+
+
+class BoundSignatureMethod_HMAC_SHA1(SignatureMethod_HMAC_SHA1):
+    """HMAC-SHA1 signing for one consumer and token.
+
+    The key is worked out once and every signature starts from a copy of an
+    hmac object that already has the key. The parameters in the query string
+    of each URL are parsed and encoded once and reused whenever that URL is
+    signed again. Requests for any other consumer or token are signed as
+    SignatureMethod_HMAC_SHA1 signs them.
+
+    """
+
+    max_cached_urls = 100
+
+    def __init__(self, consumer, token=None):
+        self.consumer = consumer
+        self.token = token
+        self.key = '%s&' % escape(consumer.secret)
+        if token:
+            self.key += escape(token.secret)
+        self._hmac = hmac.new(self.key, digestmod=sha)
+        self._urls = {}
+
+    def _is_bound(self, consumer, token):
+        return consumer is self.consumer and token is self.token
+
+    def _url_parts(self, request):
+        """Returns the escaped normalized URL and the (key, value, encoded
+        parameter) of each parameter in the query string."""
+        parts = self._urls.get(request.url)
+        if parts is None:
+            if request.normalized_url is None:
+                raise ValueError("Base URL for request is not set.")
+            query = urlparse.urlparse(request.url)[4]
+            parameters = request._split_url_string(query).items()
+            parts = (escape(request.normalized_url),
+                [(k, v, _encode_parameter(k, v)) for k, v in parameters])
+            if len(self._urls) >= self.max_cached_urls:
+                self._urls.clear()
+            self._urls[request.url] = parts
+        return parts
+
+    def _normalized_parameters(self, request, query_items):
+        """The same string as request.get_normalized_parameters()."""
+        items = list(query_items)
+        for key, value in request.iteritems():
+            if key == 'oauth_signature':
+                continue
+            if hasattr(value, '__iter__'):
+                items.extend([(key, item, _encode_parameter(key, item))
+                    for item in value])
+            else:
+                items.append((key, value, _encode_parameter(key, value)))
+        items.sort()
+        encoded_str = '&'.join([encoded for key, value, encoded in items])
+        return encoded_str.replace('+', '%20')
+
+    def signing_base(self, request, consumer, token):
+        if not self._is_bound(consumer, token):
+            return SignatureMethod_HMAC_SHA1.signing_base(self, request,
+                consumer, token)
+        escaped_url, query_items = self._url_parts(request)
+        sig = (
+            escape(request.method),
+            escaped_url,
+            escape(self._normalized_parameters(request, query_items)),
+        )
+        return self.key, '&'.join(sig)
+
+    def sign(self, request, consumer, token):
+        if not self._is_bound(consumer, token):
+            return SignatureMethod_HMAC_SHA1.sign(self, request, consumer,
+                token)
+        key, raw = self.signing_base(request, consumer, token)
+        hashed = self._hmac.copy()
+        hashed.update(raw)
+        return binascii.b2a_base64(hashed.digest())[:-1]
+
+
 class SignatureMethod_PLAINTEXT(SignatureMethod):
 
     name = 'PLAINTEXT'
@@ -21,6 +21,7 @@ from google.appengine.ext.webapp.util import login_required
 
 import buzz_gae_client
 import logging
+import lru
 import os
 import settings
 import simple_buzz_wrapper
@@ -111,6 +112,7 @@ class TokenDeletionHandler(webapp.RequestHandler):
   def post(self):
     user_token = UserToken.get_current_user_token()
     UserToken.delete(user_token)
+    invalidate_wrapper(user_token.email_address)
     self.redirect(settings.FRONT_PAGE_HANDLER_URL)
 
 
@@ -129,6 +131,7 @@ class DanceFinishingHandler(webapp.RequestHandler):
 
     user_token.set_access_token(access_token)
     UserToken.put(user_token)
+    invalidate_wrapper(user_token.email_address)
     logging.debug('Access token was: %s' % user_token.access_token_string)
 
     # Send an XMPP invitation
@@ -139,8 +142,27 @@ class DanceFinishingHandler(webapp.RequestHandler):
 
     self.redirect(settings.PROFILE_HANDLER_URL)
 
+# Ready to use SimpleBuzzWrappers keyed by email address. Other instances of the application can't invalidate
+# this one's wrappers so they also expire.
+WRAPPER_POOL = lru.LRUCache(settings.WRAPPER_POOL_SIZE, max_age=settings.WRAPPER_POOL_MAX_AGE)
+
 def make_wrapper(email_address):
-  user_token = UserToken.find_by_email_address(email_address)
+  """Returns a SimpleBuzzWrapper for the user, reusing one from the pool if possible"""
+  wrapper = WRAPPER_POOL.get(email_address)
+  if wrapper is None:
+    user_token = UserToken.find_by_email_address(email_address)
+    wrapper = _build_wrapper(user_token)
+    # Anonymous wrappers aren't pooled. The user may finish the OAuth dance on another instance, which can't
+    # invalidate this one's pool, and their next wrapper has to use the new token.
+    if user_token and user_token.access_token_string:
+      WRAPPER_POOL.put(email_address, wrapper)
+  return wrapper
+
+def invalidate_wrapper(email_address):
+  """Must be called whenever a user's token changes so that their next wrapper uses the new token"""
+  WRAPPER_POOL.pop(email_address)
+
+def _build_wrapper(user_token):
   if user_token:
     oauth_params_dict = user_token.get_access_token()
     return simple_buzz_wrapper.SimpleBuzzWrapper(api_key=settings.API_KEY, consumer_key=oauth_params_dict['consumer_key'],
@@ -0,0 +1,80 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import oauth2 as oauth
+import unittest
+
+URLS = [
+  'https://www.googleapis.com/buzz/v1/activities/@me/@self?alt=json',
+  'https://www.googleapis.com/buzz/v1/activities/search?q=hello+world&max-results=10&alt=json&pp=1',
+  'https://www.googleapis.com/buzz/v1/activities/search?q=caf%C3%A9%20%2B%26&alt=json',
+  'http://www.googleapis.com:80/buzz/v1/people/@me/@self',
+]
+
+
+def make_request(consumer, token, url, method='GET'):
+  request = oauth.Request.from_consumer_and_token(consumer, token, http_method=method, http_url=url)
+  # Fix the parameters that change on every request so that signatures can be compared
+  request['oauth_nonce'] = '12345678'
+  request['oauth_timestamp'] = '1287316800'
+  return request
+
+
+class BoundSignatureMethodTest(unittest.TestCase):
+  def setUp(self):
+    self.consumer = oauth.Consumer('anonymous', 'anonymous')
+    self.token = oauth.Token('token key', 'token secret/with+escapes')
+    self.signer = oauth.BoundSignatureMethod_HMAC_SHA1(self.consumer, self.token)
+
+  def test_signs_exactly_as_hmac_sha1_does(self):
+    unbound = oauth.SignatureMethod_HMAC_SHA1()
+    for method in ['GET', 'POST']:
+      for url in URLS:
+        request = make_request(self.consumer, self.token, url, method)
+        expected = unbound.signing_base(request, self.consumer, self.token)
+
+        self.assertEquals(expected, self.signer.signing_base(request, self.consumer, self.token))
+        self.assertEquals(unbound.sign(request, self.consumer, self.token),
+                          self.signer.sign(request, self.consumer, self.token))
+
+  def test_signing_the_same_url_again_gives_the_same_signature(self):
+    first = self.signer.sign(make_request(self.consumer, self.token, URLS[1]), self.consumer, self.token)
+    second = self.signer.sign(make_request(self.consumer, self.token, URLS[1]), self.consumer, self.token)
+
+    self.assertEquals(first, second)
+
+  def test_signs_for_other_consumers_and_tokens_like_hmac_sha1(self):
+    consumer = oauth.Consumer('other', 'other secret')
+    request = make_request(consumer, None, URLS[0])
+
+    self.assertEquals(oauth.SignatureMethod_HMAC_SHA1().sign(request, consumer, None),
+                      self.signer.sign(request, consumer, None))
+
+  def test_requests_can_be_signed_with_it(self):
+    request = make_request(self.consumer, self.token, URLS[0])
+    request.sign_request(self.signer, self.consumer, self.token)
+
+    self.assertEquals('HMAC-SHA1', request['oauth_signature_method'])
+    self.assertTrue(oauth.SignatureMethod_HMAC_SHA1().check(request, self.consumer, self.token,
+                                                            request['oauth_signature']))
+
+  def test_keeps_a_bounded_number_of_urls(self):
+    for i in range(self.signer.max_cached_urls + 1):
+      url = 'https://www.googleapis.com/buzz/v1/activities/search?q=%d' % i
+      self.signer.sign(make_request(self.consumer, self.token, url), self.consumer, self.token)
+
+    self.assertTrue(len(self.signer._urls) <= self.signer.max_cached_urls)
+
+
+if __name__ == '__main__':
+  unittest.main()
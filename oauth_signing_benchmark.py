@@ -0,0 +1,77 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how many Buzz API requests per second can be signed with SignatureMethod_HMAC_SHA1 and with a
+BoundSignatureMethod_HMAC_SHA1 that's bound to the consumer and token.
+
+Signing alone is timed, and so is everything oauth_wrap does per request: building the Request, signing it and
+making the Authorization header.
+
+Run it like this:
+python oauth_signing_benchmark.py [number of signatures]
+"""
+
+import oauth2 as oauth
+import sys
+import time
+
+URLS = [
+  'https://www.googleapis.com/buzz/v1/activities/@me/@consumption?alt=json&pp=1',
+  'https://www.googleapis.com/buzz/v1/activities/search?q=buzz&max-results=10&alt=json&pp=1',
+  'https://www.googleapis.com/buzz/v1/activities/@me/@self?alt=json&pp=1',
+  'https://www.googleapis.com/buzz/v1/people/@me/@self?alt=json&pp=1',
+]
+
+CONSUMER = oauth.Consumer('anonymous', 'anonymous')
+TOKEN = oauth.Token('1/abcdefghijklmnopqrstuvwxyz0123456789', 'secret/with+some=escapes')
+
+
+def sign_only(signer, requests):
+  for request in requests:
+    signer.sign(request, CONSUMER, TOKEN)
+
+
+def wrap(signer, requests):
+  for request in requests:
+    request = oauth.Request.from_consumer_and_token(CONSUMER, TOKEN, http_method=request.method,
+                                                    http_url=request.url)
+    request.sign_request(signer, CONSUMER, TOKEN)
+    request.to_header()
+
+
+def signatures_per_second(fn, signer, count, repeat=3):
+  urls = (URLS * (count // len(URLS) + 1))[:count]
+  requests = [oauth.Request.from_consumer_and_token(CONSUMER, TOKEN, http_url=url) for url in urls]
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    fn(signer, requests)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return count / best
+
+
+def run(count=20000):
+  print '%-16s %16s %16s %10s' % ('', 'unbound sig/s', 'bound sig/s', 'speed up')
+  for name, fn in [('sign', sign_only), ('oauth_wrap', wrap)]:
+    before = signatures_per_second(fn, oauth.SignatureMethod_HMAC_SHA1(), count)
+    after = signatures_per_second(fn, oauth.BoundSignatureMethod_HMAC_SHA1(CONSUMER, TOKEN), count)
+    print '%-16s %16.0f %16.0f %9.2fx' % (name, before, after, after / before)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
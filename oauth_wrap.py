@@ -16,6 +16,9 @@ import httplib2
 import oauth2 as oauth
 import simplejson
 
+# Shared by every Http made here so that connections to the Buzz API outlive the clients that made them
+CONNECTION_POOL = httplib2.ConnectionPool(max_per_host=8, idle_timeout=60)
+
 
 def oauth_wrap(consumer, token, http):
     """
@@ -40,7 +43,7 @@ def oauth_wrap(consumer, token, http):
     of 'request().
     """
     request_orig = http.request
-    signer = oauth.SignatureMethod_HMAC_SHA1()
+    signer = oauth.BoundSignatureMethod_HMAC_SHA1(consumer, token)
 
     def new_request(uri, method='GET', body=None, headers=None,
         redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
@@ -68,7 +71,7 @@ def get_authorised_http(oauth_params):
   # Create a simple monkeypatch for httplib2.Http.request
   # just adds in the oauth authorization header and then calls
   # the original request().
-  http = httplib2.Http()
+  http = httplib2.Http(pool=CONNECTION_POOL)
   return oauth_wrap(consumer, token, http)
 
 def get_wrapped_http(filename='oauth_token.dat'):
@@ -0,0 +1,53 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares what each of feedparser's postprocess settings costs per entry when parsing track feeds with plain text
+and with HTML content.
+
+Run it like this:
+python postprocess_benchmark.py [number of entries]
+"""
+
+import benchmark_feeds
+import feedparser
+import sys
+import time
+
+
+def seconds_per_entry(feed, count, postprocess, repeat=3):
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    feedparser.parse(feed, postprocess=postprocess)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best / count
+
+
+def run(count=200):
+  print '%-10s %-10s %14s %10s' % ('content', 'setting', 'us/entry', 'vs full')
+  for html in (False, True):
+    feed = benchmark_feeds.make_track_feed(count, html=html)
+    costs = [(postprocess, seconds_per_entry(feed, count, postprocess))
+             for postprocess in feedparser.POSTPROCESS_STAGES]
+    full = dict(costs)[feedparser.POSTPROCESS_FULL]
+    for postprocess, cost in costs:
+      print '%-10s %-10s %14.1f %9.2fx' % (html and 'html' or 'text', postprocess, cost * 1e6, full / cost)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
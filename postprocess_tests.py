@@ -0,0 +1,73 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from pshb import ContentParser
+
+import benchmark_feeds
+import feedparser
+import unittest
+
+
+def parse_content(postprocess, feed=None):
+  if feed is None:
+    feed = benchmark_feeds.make_track_feed(1, html=True).replace('<feed ', '<feed xml:base="http://example.org/" ', 1)
+  return feedparser.parse(feed, postprocess=postprocess).entries[0].content[0].value
+
+
+class PostprocessTest(unittest.TestCase):
+  def test_full_resolves_relative_links_and_sanitizes(self):
+    content = parse_content(feedparser.POSTPROCESS_FULL)
+
+    self.assertTrue('href="http://example.org/relative/0"' in content)
+    self.assertFalse('<script>' in content)
+    self.assertFalse('onclick' in content)
+
+  def test_full_is_the_default(self):
+    feed = benchmark_feeds.make_track_feed(1, html=True)
+    default = feedparser.parse(feed).entries[0].content[0].value
+
+    self.assertEquals(parse_content(feedparser.POSTPROCESS_FULL, feed), default)
+
+  def test_sanitize_leaves_relative_links_alone(self):
+    content = parse_content(feedparser.POSTPROCESS_SANITIZE)
+
+    self.assertTrue('href="/relative/0"' in content)
+    self.assertFalse('<script>' in content)
+    self.assertFalse('onclick' in content)
+
+  def test_none_leaves_the_html_as_the_feed_sent_it(self):
+    content = parse_content(feedparser.POSTPROCESS_NONE)
+
+    self.assertTrue('href="/relative/0"' in content)
+    self.assertTrue('<script>alert(1)</script>' in content)
+    self.assertTrue('onclick="evil()"' in content)
+
+  def test_the_rest_of_the_entry_is_the_same(self):
+    feed = benchmark_feeds.make_track_feed(3)
+    full = feedparser.parse(feed, postprocess=feedparser.POSTPROCESS_FULL)
+    none = feedparser.parse(feed, postprocess=feedparser.POSTPROCESS_NONE)
+
+    self.assertEquals(full.entries, none.entries)
+    self.assertEquals(full.feed, none.feed)
+
+  def test_rejects_unknown_settings(self):
+    self.assertRaises(ValueError, feedparser.parse, benchmark_feeds.make_track_feed(1), postprocess='some')
+
+  def test_content_parser_leaves_the_html_alone(self):
+    parser = ContentParser(benchmark_feeds.make_track_feed(1, html=True))
+
+    self.assertTrue('<script>alert(1)</script>' in parser.extractPosts()[0].content)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -21,12 +21,21 @@ feedparser.py to parse feeds
 from google.appengine.ext import db
 from google.appengine.api import urlfetch
 
+import bloom
+import calendar
 import datetime
+import entry_codec
+import executors
 import feedparser
+import hashlib
 import logging
 import pprint
 import settings
+import StringIO
+import time
 import urllib
+import xml.sax
+import xml.sax.handler
 
 class PostFactory(object):
   """A factory for Posts.
@@ -51,10 +60,10 @@ class PostFactory(object):
     uniqueId = PostFactory.__extractUniqueId(entry)
 
     logging.debug("Unique id is: %s for entry: %s" % (uniqueId, pprint.pformat(entry)))
-    entryString = repr(entry)
+    entryBlob = db.Blob(entry_codec.encode(entry))
 
     return Post(key_name=uniqueId, url=url, feedUrl=feedUrl, title=title, content=content, datePublished=datePublished,
-                author=author, entryString=entryString)
+                author=author, entryBlob=entryBlob)
 
 class Post(db.Model):
   """An atom:entry or RSS item."""
@@ -64,11 +73,29 @@ class Post(db.Model):
   content = db.TextProperty()
   datePublished = db.DateTimeProperty()
   author = db.StringProperty()
+  # The entry encoded by the entry_codec module
+  entryBlob = db.BlobProperty()
+  # Posts written by older versions stored repr(entry) here instead. See migrateEntry.
   entryString = db.TextProperty()
 
   def getFeedParserEntry(self):
-    entry = eval(self.entryString)
-    return entry
+    if self.entryBlob:
+      return entry_codec.decode(self.entryBlob)
+    if self.entryString:
+      return entry_codec.decode_legacy(self.entryString)
+    return None
+
+  def migrateEntry(self):
+    """Re-encode an entry stored in the old repr format. Returns True if the post changed and needs to be put."""
+    if self.entryBlob or not self.entryString:
+      return False
+    self.entryBlob = db.Blob(entry_codec.encode(entry_codec.decode_legacy(self.entryString)))
+    self.entryString = None
+    return True
+
+  @property
+  def uniqueId(self):
+    return self.key().name()
 
   @property
   def day(self):
@@ -80,6 +107,100 @@ class Post(db.Model):
     for postKey in postsQuery.fetch(settings.MAX_FETCH):
       db.delete(postKey)
 
+class SeenEntry(db.Model):
+  """Records that an entry was delivered. Its parent is the SeenEntries it belongs to and its key name is a hash of
+  the entry's unique id."""
+  seen = db.DateTimeProperty(required=True)
+
+  @staticmethod
+  def keyFor(parent, uniqueId):
+    if isinstance(uniqueId, unicode):
+      uniqueId = uniqueId.encode('utf-8')
+    return db.Key.from_path('SeenEntry', hashlib.md5(uniqueId).hexdigest(), parent=parent)
+
+  @staticmethod
+  def deleteExpired(now=None):
+    """Delete up to MAX_FETCH entries that are too old to matter. Returns how many were deleted."""
+    if now is None:
+      now = datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(seconds=settings.SEEN_ENTRY_TTL)
+    keys = SeenEntry.all(keys_only=True).filter('seen <', cutoff).fetch(settings.MAX_FETCH)
+    db.delete(keys)
+    return len(keys)
+
+class SeenEntries(db.Model):
+  """The entries that have already been delivered for a search term so that ones the hub pushes again can be dropped.
+
+  The key name says whose entries these are. Hubs re-push entries when a delivery is retried and polling hubs send
+  overlapping windows, so most of the entries in a notification are either brand new or were seen recently.
+  A bloom filter of the unique ids says which entries are definitely new without any further reads. Because it can
+  give false positives, the entries it thinks were seen are confirmed by fetching their SeenEntry children.
+  Entries expire after settings.SEEN_ENTRY_TTL: the filter has two generations and every half TTL the current one
+  becomes the previous one and the previous one is thrown away. Expired SeenEntry children are deleted by a cron job.
+  Updates aren't transactional. A lost update can only cause a duplicate delivery, never a missed one."""
+  current = db.BlobProperty()
+  currentCount = db.IntegerProperty(default=0)
+  previous = db.BlobProperty()
+  rotated = db.DateTimeProperty()
+
+  @staticmethod
+  def _filter(bits):
+    return bloom.BloomFilter(settings.SEEN_ENTRIES_CAPACITY, settings.SEEN_ENTRIES_ERROR_RATE, bits=bits or None)
+
+  def _filters(self):
+    return [SeenEntries._filter(bits) for bits in (self.current, self.previous) if bits]
+
+  def _rotateIfNeeded(self, now):
+    age = now - (self.rotated or now)
+    full = self.currentCount >= settings.SEEN_ENTRIES_CAPACITY
+    if self.rotated is None or full or age > datetime.timedelta(seconds=settings.SEEN_ENTRY_TTL / 2):
+      self.previous = self.current
+      self.current = None
+      self.currentCount = 0
+      self.rotated = now
+
+  @staticmethod
+  def filterUnseen(seenKey, posts, now=None):
+    """Returns the posts that haven't been delivered before, in their original order, and how many were dropped"""
+    if now is None:
+      now = datetime.datetime.utcnow()
+    unseen = []
+    uniqueIds = set()
+    for post in posts:
+      if post.uniqueId not in uniqueIds:
+        uniqueIds.add(post.uniqueId)
+        unseen.append(post)
+
+    seenEntries = SeenEntries.get_by_key_name(seenKey)
+    if seenEntries is not None:
+      filters = seenEntries._filters()
+      candidates = [post for post in unseen if [f for f in filters if post.uniqueId in f]]
+      if candidates:
+        cutoff = now - datetime.timedelta(seconds=settings.SEEN_ENTRY_TTL)
+        records = db.get([SeenEntry.keyFor(seenEntries.key(), post.uniqueId) for post in candidates])
+        seen = set([post.uniqueId for post, record in zip(candidates, records) if record and record.seen > cutoff])
+        unseen = [post for post in unseen if post.uniqueId not in seen]
+    return unseen, len(posts) - len(unseen)
+
+  @staticmethod
+  def markSeen(seenKey, posts, now=None):
+    """Remember that the posts have been delivered"""
+    if not posts:
+      return
+    if now is None:
+      now = datetime.datetime.utcnow()
+    seenEntries = SeenEntries.get_by_key_name(seenKey)
+    if seenEntries is None:
+      seenEntries = SeenEntries(key_name=seenKey)
+    seenEntries._rotateIfNeeded(now)
+    current = SeenEntries._filter(seenEntries.current)
+    for post in posts:
+      current.add(post.uniqueId)
+    seenEntries.current = db.Blob(current.tostring())
+    seenEntries.currentCount += len(posts)
+    records = [SeenEntry(key=SeenEntry.keyFor(seenEntries.key(), post.uniqueId), seen=now) for post in posts]
+    db.put([seenEntries] + records)
+
 class UrlError(Exception):
   def __init__(self, url, status_code, response_string):
     self.url = url
@@ -94,14 +215,23 @@ class ContentParser(object):
 
   It uses the FeedParser library to parse the feeds, extracts information about the PSHB hub being used and creates valid Streamer Posts."""
 
-  def __init__(self, content, defaultHub='https://pubsubhubbub.appspot.com/', alwaysUseDefaultHub=False, urlToFetch=""):
+  # Posts only reach people as a title and a url in a chat message and their content is only searched for words, so
+  # the HTML in them is neither sanitized nor has its links resolved, just like StreamingContentParser.
+  POSTPROCESS = feedparser.POSTPROCESS_NONE
+
+  # The entry keys that extractPosts reads. Every other element of an entry is skipped while parsing.
+  ENTRY_FIELDS = ('id', 'link', 'links', 'title', 'content', 'summary', 'description', 'updated_parsed', 'author',
+                  'author_detail')
+
+  def __init__(self, content, defaultHub='https://pubsubhubbub.appspot.com/', alwaysUseDefaultHub=False, urlToFetch="",
+               postprocess=POSTPROCESS, fields=ENTRY_FIELDS, compact=True):
     if urlToFetch:
       response = urlfetch.fetch(urlToFetch)
       logging.info("Status was: [%s]" % response.status_code)
       if response.status_code == 404 or response.status_code == 400:
         raise UrlError(urlToFetch, response.status_code, str(response))
       content = response.content
-    self.data = feedparser.parse(content)
+    self.data = feedparser.parse(content, postprocess=postprocess, fields=fields, compact=compact)
     self.defaultHub = defaultHub
     self.alwaysUseDefaultHub = alwaysUseDefaultHub
 
@@ -208,25 +338,324 @@ class ContentParser(object):
     return sourceUrl
 
 
-class HubSubscriber(object):
-  def subscribe(self, url, hub, callback_url):
-    self._talk_to_hub('subscribe', url, hub, callback_url)
+ATOM_NS = 'http://www.w3.org/2005/Atom'
 
-  def unsubscribe(self, url, hub, callback_url):
-    self._talk_to_hub('unsubscribe', url, hub, callback_url)
+class PostRecord(object):
+  """A lightweight, read-only stand in for a Post which is produced by the StreamingContentParser"""
+  __slots__ = ('uniqueId', 'url', 'feedUrl', 'title', 'content', 'datePublished', 'author')
+
+  def __init__(self, uniqueId, url, feedUrl, title, content, datePublished, author):
+    self.uniqueId = uniqueId
+    self.url = url
+    self.feedUrl = feedUrl
+    self.title = title
+    self.content = content
+    self.datePublished = datePublished
+    self.author = author
+
+
+class _AtomEntryHandler(xml.sax.handler.ContentHandler):
+  """Collects the handful of Atom elements that a PostRecord needs. Everything else is ignored.
+
+  Only the entry currently being parsed is held in memory. Completed entries are turned into PostRecords and
+  queued in self.records until the StreamingContentParser takes them."""
+  ENTRY_TEXT_ELEMENTS = ('id', 'title', 'content', 'summary', 'updated', 'published')
+
+  def __init__(self):
+    xml.sax.handler.ContentHandler.__init__(self)
+    self.records = []
+    self.feedLinks = []
+    self.feedUrl = None
+    self.entry = None
+    self.entryDepth = 0
+    self.text = None
+    self.textElement = None
+    self.textDepth = 0
+    self.depth = 0
+    self.inAuthor = False
+
+  def startElementNS(self, name, qname, attrs):
+    uri, localName = name
+    self.depth += 1
+    if uri != ATOM_NS:
+      return
+    if localName == 'entry':
+      self.entry = {'links': []}
+      self.entryDepth = self.depth
+    elif localName == 'link':
+      link = {'rel': attrs.get((None, 'rel'), 'alternate'), 'href': attrs.get((None, 'href'), '')}
+      if self.entry is None:
+        self.feedLinks.append(link)
+      elif self.depth == self.entryDepth + 1:
+        self.entry['links'].append(link)
+    elif self.entry is not None and self.text is None:
+      if self.depth == self.entryDepth + 1 and localName == 'author':
+        self.inAuthor = True
+      elif self.depth == self.entryDepth + 1 and localName in self.ENTRY_TEXT_ELEMENTS:
+        self._startText(localName)
+      elif self.inAuthor and self.depth == self.entryDepth + 2 and localName == 'name':
+        self._startText('author')
+
+  def _startText(self, element):
+    self.text = []
+    self.textElement = element
+    self.textDepth = self.depth
+
+  def characters(self, content):
+    if self.text is not None:
+      self.text.append(content)
+
+  def endElementNS(self, name, qname):
+    if self.entry is not None:
+      if self.text is not None and self.depth == self.textDepth:
+        self.entry[self.textElement] = ''.join(self.text)
+        self.text = None
+      elif self.depth == self.entryDepth + 1:
+        self.inAuthor = False
+      elif self.depth == self.entryDepth:
+        self.records.append(self._createRecord(self.entry))
+        self.entry = None
+    self.depth -= 1
+
+  def _extractFeedUrl(self):
+    if self.feedUrl is None:
+      alternate = ''
+      for link in self.feedLinks:
+        if link['rel'] == 'http://schemas.google.com/g/2005#feed' or link['rel'] == 'self':
+          self.feedUrl = link['href']
+          return self.feedUrl
+        if link['rel'] == 'alternate' and not alternate:
+          alternate = link['href']
+      self.feedUrl = alternate + "rss"
+    return self.feedUrl
+
+  def _createRecord(self, entry):
+    url = entry.get('id', '')
+    for link in entry['links']:
+      if link['rel'] == 'alternate':
+        url = str(link['href'])
+        break
+    uniqueId = entry.get('id') or url
+    if not uniqueId:
+      raise ValueError("Entry with no unique identifier: %s" % pprint.pformat(entry))
+
+    content = entry.get('content') or entry.get('summary', '')
+    dateParsed = feedparser._parse_date(entry.get('updated') or entry.get('published') or '')
+    if dateParsed:
+      datePublished = datetime.datetime(*(dateParsed[0:6]))
+    else:
+      datePublished = datetime.datetime.utcnow()
+    return PostRecord(uniqueId=uniqueId, url=url, feedUrl=self._extractFeedUrl(), title=entry.get('title', ''),
+                      content=content, datePublished=datePublished, author=entry.get('author', ''))
+
+
+class StreamingContentParser(object):
+  """A parser for Atom PSHB notifications which yields PostRecords one at a time as each entry is completed.
+
+  Unlike the ContentParser it never builds a tree for the whole document so peak memory is bounded by the size
+  of a single entry rather than the size of the notification. Malformed documents cause iterPosts to raise
+  xml.sax.SAXException, possibly after some records have already been yielded."""
+  CHUNK_SIZE = 16 * 1024
+
+  def __init__(self, content, chunkSize=CHUNK_SIZE):
+    if isinstance(content, basestring):
+      content = StringIO.StringIO(content)
+    self.stream = content
+    self.chunkSize = chunkSize
+    self.handler = _AtomEntryHandler()
+
+  def _createSaxParser(self):
+    parser = xml.sax.make_parser()
+    parser.setFeature(xml.sax.handler.feature_namespaces, True)
+    parser.setFeature(xml.sax.handler.feature_external_ges, False)
+    parser.setContentHandler(self.handler)
+    return parser
+
+  def iterPosts(self):
+    parser = self._createSaxParser()
+    records = self.handler.records
+    error = None
+    while error is None:
+      chunk = self.stream.read(self.chunkSize)
+      try:
+        if chunk:
+          parser.feed(chunk)
+        else:
+          parser.close()
+      except xml.sax.SAXException, e:
+        error = e
+      # Entries completed before an error in the same chunk are still yielded
+      while records:
+        yield records.pop(0)
+      if not chunk:
+        break
+    if error is not None:
+      raise error
+
+  def extractFeedUrl(self):
+    """Only meaningful once iterPosts has started yielding records"""
+    return self.handler._extractFeedUrl()
+
+
+class HubOperation(db.Model):
+  """A subscribe or unsubscribe that still has to be sent to a hub.
+
+  The key name is made from the hub, topic and callback so there is at most one pending operation per hub
+  subscription. Asking for the operation that is already pending does nothing and asking for the opposite one
+  replaces it, so the hub only ever hears about the latest thing that was asked for."""
+  mode = db.StringProperty(required=True)
+  url = db.StringProperty(required=True)
+  hub = db.StringProperty(required=True)
+  callbackUrl = db.StringProperty(required=True)
+  # When the operation was asked for. It tells a dispatcher whether the operation was replaced while it was being sent.
+  created = db.DateTimeProperty(required=True)
+  due = db.DateTimeProperty(required=True)
+  attempts = db.IntegerProperty(default=0)
+  # How long a subscription should last before it has to be renewed
+  leaseSeconds = db.IntegerProperty()
+
+  @staticmethod
+  def keyNameFor(url, hub, callbackUrl):
+    return hashlib.md5('\n'.join([url, hub, callbackUrl]).encode('utf-8')).hexdigest()
 
-  def _talk_to_hub(self, mode, url, hub, callback_url):
-    parameters = {"hub.callback": callback_url,
-                  "hub.mode": mode,
-                  "hub.topic": url,
+  @staticmethod
+  def schedule(mode, url, hub, callbackUrl, leaseSeconds=None, now=None):
+    """Record the operation. Returns False if an identical one was already pending."""
+    if now is None:
+      now = datetime.datetime.utcnow()
+    keyName = HubOperation.keyNameFor(url, hub, callbackUrl)
+    def txn():
+      operation = HubOperation.get_by_key_name(keyName)
+      if operation is not None and operation.mode == mode:
+        return False
+      HubOperation(key_name=keyName, mode=mode, url=url, hub=hub, callbackUrl=callbackUrl, created=now, due=now,
+                   leaseSeconds=leaseSeconds).put()
+      return True
+    return db.run_in_transaction(txn)
+
+  def payload(self):
+    parameters = {"hub.callback": self.callbackUrl,
+                  "hub.mode": self.mode,
+                  "hub.topic": self.url,
                   "hub.verify": "async", # We don't want un/subscriptions to block until verification happens
                   "hub.verify_token": settings.SECRET_TOKEN, #TODO Must generate a token based on some secret value
     }
-    payload = urllib.urlencode(parameters)
-    response = urlfetch.fetch(hub,
-                              payload=payload,
-                              method=urlfetch.POST,
-                              headers={'Content-Type': 'application/x-www-form-urlencoded'})
-    logging.info("Status of %s for feed: %s at hub: %s is: %d" % (mode, url, hub, response.status_code))
-    if response.status_code != 202:
-      logging.info(response.content)
+    if self.leaseSeconds:
+      parameters["hub.lease_seconds"] = self.leaseSeconds
+    return urllib.urlencode(parameters)
+
+  def finish(self):
+    """Delete the operation unless it was replaced while it was being sent"""
+    created = self.created
+    def txn():
+      operation = HubOperation.get(self.key())
+      if operation is not None and operation.created == created:
+        operation.delete()
+    db.run_in_transaction(txn)
+
+  def retryLater(self, now):
+    """Back off exponentially. Returns False once the operation has been tried MAX_TASK_RETRIES times and was given up."""
+    attempts = self.attempts + 1
+    created = self.created
+    def txn():
+      operation = HubOperation.get(self.key())
+      if operation is None or operation.created != created:
+        return True
+      if attempts >= settings.MAX_TASK_RETRIES:
+        operation.delete()
+        return False
+      delay = min(settings.HUB_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.HUB_RETRY_MAX_DELAY)
+      operation.attempts = attempts
+      operation.due = now + datetime.timedelta(seconds=delay)
+      operation.put()
+      return True
+    return db.run_in_transaction(txn)
+
+
+def startHubRequest(operation):
+  """Start sending the operation to its hub. Returns an RPC whose get_result() returns the response."""
+  rpc = urlfetch.create_rpc(deadline=settings.HUB_REQUEST_DEADLINE)
+  urlfetch.make_fetch_call(rpc, operation.hub,
+                           payload=operation.payload(),
+                           method=urlfetch.POST,
+                           headers={'Content-Type': 'application/x-www-form-urlencoded'})
+  return rpc
+
+def _dispatchTaskOptions(due):
+  """Name the dispatch task after the slot of HUB_DISPATCH_DELAY seconds that due falls into and run it at the end of
+  that slot. Everything that becomes due during a slot is then sent by a single task."""
+  slot = int(calendar.timegm(due.utctimetuple()) // settings.HUB_DISPATCH_DELAY) + 1
+  countdown = max(0, slot * settings.HUB_DISPATCH_DELAY - calendar.timegm(time.gmtime()))
+  return {'_name': 'hub-dispatch-%d' % slot, '_countdown': int(countdown)}
+
+def scheduleDispatch(executor, startRequest=startHubRequest, due=None):
+  if due is None:
+    due = datetime.datetime.utcnow()
+  executor.submit(dispatchHubOperations, executor, startRequest, **_dispatchTaskOptions(due))
+
+def dispatchHubOperations(executor, startRequest=startHubRequest, now=None):
+  """Send every operation that is due, up to HUB_BATCH_SIZE of them, to their hubs at the same time.
+
+  Failed operations are retried with exponential backoff. Module level so that it can be pickled by the deferred
+  library. Returns the number of operations that were sent successfully."""
+  if now is None:
+    now = datetime.datetime.utcnow()
+  operations = HubOperation.all().filter('due <=', now).fetch(settings.HUB_BATCH_SIZE)
+  rpcs = []
+  for operation in operations:
+    try:
+      rpcs.append((operation, startRequest(operation)))
+    except urlfetch.Error, e:
+      logging.warning('Could not start %s for feed: %s at hub: %s. %r' % (operation.mode, operation.url, operation.hub, e))
+      rpcs.append((operation, None))
+
+  succeeded = 0
+  for operation, rpc in rpcs:
+    status = None
+    try:
+      if rpc is not None:
+        status = rpc.get_result().status_code
+    except urlfetch.Error, e:
+      logging.warning('%s for feed: %s at hub: %s failed. %r' % (operation.mode, operation.url, operation.hub, e))
+    logging.info("Status of %s for feed: %s at hub: %s is: %s" % (operation.mode, operation.url, operation.hub, status))
+    # 202 means the hub will verify later and 204 means it already has
+    if status in (202, 204):
+      operation.finish()
+      succeeded += 1
+    elif not operation.retryLater(now):
+      logging.error('Gave up on %s for feed: %s at hub: %s after %s attempts' %
+                    (operation.mode, operation.url, operation.hub, settings.MAX_TASK_RETRIES))
+
+  # Whatever is left is either a retry or didn't fit in this batch
+  remaining = HubOperation.all().order('due').fetch(1)
+  if remaining:
+    scheduleDispatch(executor, startRequest, max(remaining[0].due, now))
+  return succeeded
+
+
+class HubSubscriber(object):
+  """Asks hubs to subscribe and unsubscribe without waiting for them.
+
+  Operations are recorded as HubOperations and sent in batches by dispatchHubOperations which runs on the executor.
+  By default that's the task queue so a chat command returns straight away no matter how slow the hub is. The
+  executor has to honour the _name and _countdown task options, so tests use an executors.LocalTaskQueue along with a
+  startRequest that doesn't touch the network."""
+  def __init__(self, executor=None, startRequest=startHubRequest):
+    if executor is None:
+      executor = executors.DeferredExecutor()
+    self.executor = executor
+    self.startRequest = startRequest
+
+  def subscribe(self, url, hub, callback_url, lease_seconds=None):
+    if lease_seconds is None:
+      lease_seconds = settings.HUB_LEASE_SECONDS
+    self._talk_to_hub('subscribe', url, hub, callback_url, lease_seconds)
+
+  def unsubscribe(self, url, hub, callback_url):
+    self._talk_to_hub('unsubscribe', url, hub, callback_url)
+
+  def _talk_to_hub(self, mode, url, hub, callback_url, lease_seconds=None):
+    if HubOperation.schedule(mode, url, hub, callback_url, lease_seconds):
+      scheduleDispatch(self.executor, self.startRequest)
+    else:
+      logging.info("%s for feed: %s at hub: %s is already pending" % (mode, url, hub))
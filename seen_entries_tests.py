@@ -0,0 +1,91 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from google.appengine.ext import db
+from pshb import PostRecord, SeenEntries, SeenEntry
+
+import datetime
+import settings
+import unittest
+
+
+def make_post(id):
+  return PostRecord('tag:google.com,2010:buzz:%s' % id, 'http://example.com/%s' % id, 'http://example.com/feed',
+                    'Post %s' % id, 'content', None, 'someone')
+
+def ids(posts):
+  return [post.uniqueId for post in posts]
+
+
+class SeenEntriesTest(unittest.TestCase):
+  def setUp(self):
+    self.now = datetime.datetime(2010, 10, 17, 12, 0, 0)
+
+  def tearDown(self):
+    db.delete(SeenEntry.all(keys_only=True).fetch(1000))
+    db.delete(SeenEntries.all(keys_only=True).fetch(1000))
+
+  def test_new_posts_are_not_suppressed(self):
+    posts = [make_post(1), make_post(2)]
+
+    unseen, suppressed = SeenEntries.filterUnseen('term:foo', posts, now=self.now)
+
+    self.assertEquals(ids(posts), ids(unseen))
+    self.assertEquals(0, suppressed)
+
+  def test_posts_that_were_delivered_are_suppressed(self):
+    SeenEntries.markSeen('term:foo', [make_post(1), make_post(2)], now=self.now)
+
+    unseen, suppressed = SeenEntries.filterUnseen('term:foo', [make_post(2), make_post(3), make_post(1)], now=self.now)
+
+    self.assertEquals(ids([make_post(3)]), ids(unseen))
+    self.assertEquals(2, suppressed)
+
+  def test_duplicates_within_a_notification_are_suppressed(self):
+    unseen, suppressed = SeenEntries.filterUnseen('term:foo', [make_post(1), make_post(1)], now=self.now)
+
+    self.assertEquals(ids([make_post(1)]), ids(unseen))
+    self.assertEquals(1, suppressed)
+
+  def test_each_key_remembers_its_own_posts(self):
+    SeenEntries.markSeen('term:foo', [make_post(1)], now=self.now)
+
+    unseen, suppressed = SeenEntries.filterUnseen('term:bar', [make_post(1)], now=self.now)
+
+    self.assertEquals(0, suppressed)
+
+  def test_posts_are_forgotten_after_they_expire(self):
+    SeenEntries.markSeen('term:foo', [make_post(1)], now=self.now)
+    later = self.now + datetime.timedelta(seconds=settings.SEEN_ENTRY_TTL + 1)
+
+    unseen, suppressed = SeenEntries.filterUnseen('term:foo', [make_post(1)], now=later)
+
+    self.assertEquals(0, suppressed)
+
+  def test_posts_are_remembered_after_the_filter_rotates(self):
+    SeenEntries.markSeen('term:foo', [make_post(1)], now=self.now)
+    later = self.now + datetime.timedelta(seconds=settings.SEEN_ENTRY_TTL * 3 / 4)
+    SeenEntries.markSeen('term:foo', [make_post(2)], now=later)
+
+    unseen, suppressed = SeenEntries.filterUnseen('term:foo', [make_post(1), make_post(2)], now=later)
+
+    self.assertEquals(2, suppressed)
+
+  def test_expired_records_are_deleted(self):
+    SeenEntries.markSeen('term:foo', [make_post(1)], now=self.now)
+    SeenEntries.markSeen('term:foo', [make_post(2)], now=self.now + datetime.timedelta(seconds=10))
+
+    deleted = SeenEntry.deleteExpired(now=self.now + datetime.timedelta(seconds=settings.SEEN_ENTRY_TTL + 5))
+
+    self.assertEquals(1, deleted)
+    self.assertEquals(1, SeenEntry.all().count())
@@ -41,9 +41,61 @@ OPEN_ACCESS = False
 # How often should a task, such as registering a subscription, be retried before we give up
 MAX_TASK_RETRIES = 10
 
+# Hub subscribe and unsubscribe requests are sent in batches of up to HUB_BATCH_SIZE by a task which runs every
+# HUB_DISPATCH_DELAY seconds while there's work to do. A failed request is retried after HUB_RETRY_BASE_DELAY
+# seconds, doubling each time up to HUB_RETRY_MAX_DELAY, until it has been tried MAX_TASK_RETRIES times.
+HUB_DISPATCH_DELAY = 5
+HUB_BATCH_SIZE = 20
+HUB_REQUEST_DEADLINE = 10
+HUB_RETRY_BASE_DELAY = 30
+HUB_RETRY_MAX_DELAY = 60 * 60
+
+# How many seconds hub subscriptions are asked to last. Leases that expire within LEASE_RENEWAL_WINDOW seconds are
+# renewed, up to LEASE_RENEWAL_BATCH_SIZE per run and LEASE_RENEWALS_PER_HUB per hub per run. A renewal that the hub
+# hasn't verified after LEASE_RENEWAL_RETRY seconds is tried again.
+HUB_LEASE_SECONDS = 7 * 24 * 60 * 60
+LEASE_RENEWAL_WINDOW = 24 * 60 * 60
+LEASE_RENEWAL_BATCH_SIZE = 200
+LEASE_RENEWALS_PER_HUB = 50
+LEASE_RENEWAL_RETRY = 60 * 60
+
 # Maximum number of items to be fetched for any part of the system that wants everything of a given data model type
 MAX_FETCH = 500
 
+# How many subscriptions the list command shows at a time and for how many seconds each user's summary of their
+# subscriptions is cached
+LIST_PAGE_SIZE = 20
+SUBSCRIPTION_SUMMARY_TTL = 60 * 60
+
+# Entries that were delivered less than this many seconds ago are dropped if a hub pushes them again. Each search
+# term remembers up to SEEN_ENTRIES_CAPACITY entries per half of that time before its filter gets less accurate.
+SEEN_ENTRY_TTL = 2 * 24 * 60 * 60
+SEEN_ENTRIES_CAPACITY = 10000
+SEEN_ENTRIES_ERROR_RATE = 0.001
+
+# Notifications larger than this many bytes are parsed one entry at a time instead of building a tree for the whole
+# feed. This bounds the memory used by large pushes from the hub.
+STREAMING_PARSE_THRESHOLD = 256 * 1024
+# Posts from a notification parsed that way are delivered in batches of this many as they are parsed
+STREAMING_BATCH_SIZE = 100
+
+# Buzz matches a term of several words wherever its words appear. When this is True a post pushed for such a term is
+# only delivered if it contains the words together and in order. Words in STOPWORDS are ignored when matching.
+MATCH_PHRASES_LOCALLY = False
+STOPWORDS = []
+# How many terms' compiled phrases each instance keeps for local matching
+LOCAL_MATCHER_CACHE_SIZE = 1000
+
+# Each subscription can be sent DELIVERY_BURST posts at once and, on average, DELIVERY_RATE posts an hour. Posts
+# beyond that are collected into a digest, as are all the posts for a term made only of STOPWORDS or for a term that
+# was pushed more than POPULAR_TERM_THRESHOLD posts in the last POPULARITY_WINDOW seconds. Cron sends the digests.
+# A digest lists at most DIGEST_MAX_LINES posts and counts the rest.
+DELIVERY_RATE = 60
+DELIVERY_BURST = 20
+POPULARITY_WINDOW = 60 * 60
+POPULAR_TERM_THRESHOLD = 500
+DIGEST_MAX_LINES = 50
+
 # Should Streamer check that posts it receives from a putative hub are for feeds it's actually subscribed to
 SHOULD_VERIFY_INCOMING_POSTS = False
 
@@ -57,6 +109,10 @@ SHOULD_VERIFY_INCOMING_POSTS = False
 CONSUMER_KEY = 'anonymous'
 CONSUMER_SECRET = 'anonymous'
 
+# How many users' Buzz API clients are kept ready for reuse and for how many seconds
+WRAPPER_POOL_SIZE = 200
+WRAPPER_POOL_MAX_AGE = 10 * 60
+
 PROFILE_HANDLER_URL = '/profile'
 FRONT_PAGE_HANDLER_URL = '/'
 # Installation specific config ends.
@@ -11,9 +11,14 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from apiclient.discovery import JsonModel
+
 import buzz_gae_client
 import logging
 
+# Search results are decoded straight into the fields the search command shows
+SEARCH_RESULTS_MODEL = JsonModel(items=('data', 'items'), fields=['title', 'links.alternate.href'])
+
 class SimpleBuzzWrapper(object):
   "Simple client that exposes the bare minimum set of common Buzz operations"
 
@@ -31,16 +36,16 @@ class SimpleBuzzWrapper(object):
       self.api_client = self.builder.build_api_client(oauth_params=oauth_params_dict)
     else:
       logging.info('Using api_client that doesn\'t have authorisation')
+      oauth_params_dict = None
       self.api_client = self.builder.build_api_client()
+    # The discovery document was fetched by the first build so this one only makes another client instance
+    self.search_client = self.builder.build_api_client(oauth_params=oauth_params_dict, model=SEARCH_RESULTS_MODEL)
 
   def search(self, query, user_token=None, max_results=10):
     if query is None or query.strip() is '':
       return None
 
-    json = self.api_client.activities().search(q=query, max_results=max_results).execute()
-    if json.has_key('items'):
-      return json['items']
-    return []
+    return self.search_client.activities().search(q=query, max_results=max_results).execute()
 
   def post(self, sender, message_body):
     if message_body is None or message_body.strip() is '':
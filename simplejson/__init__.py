@@ -101,7 +101,7 @@ __version__ = '2.1.1'
 __all__ = [
     'dump', 'dumps', 'load', 'loads',
     'JSONDecoder', 'JSONDecodeError', 'JSONEncoder',
-    'OrderedDict',
+    'OrderedDict', 'iterarray',
 ]
 
 __author__ = 'Bob Ippolito <bob@redivi.com>'
@@ -110,6 +110,7 @@ from decimal import Decimal
 
 from decoder import JSONDecoder, JSONDecodeError
 from encoder import JSONEncoder
+from stream import iterarray
 def _import_OrderedDict():
     import collections
     try:
@@ -435,3 +436,34 @@ def _toggle_speedups(enabled):
        encoding='utf-8',
        default=None,
    )
+
+
+def speedups_enabled():
+    """Return True if the C speedups are compiled, working and in use."""
+    import simplejson.decoder as dec
+    import simplejson.encoder as enc
+    return (dec.c_scanstring is not None and dec.scanstring is dec.c_scanstring
+            and enc.c_make_encoder is not None)
+
+
+def _verify_speedups():
+    """Turn the C speedups off unless they round trip a sample document.
+
+    An extension compiled against a different interpreter can import but
+    still misbehave, in which case the pure Python implementation is used.
+
+    """
+    if not speedups_enabled():
+        return False
+    sample = {u'a': [1, -2.5, u'\u1234 "quoted"\n', None, True, False],
+              u'b': {u'c': 10 ** 20}}
+    try:
+        working = (loads(dumps(sample)) == sample and
+                   loads(dumps(sample, sort_keys=True)) == sample)
+    except Exception:
+        working = False
+    if not working:
+        _toggle_speedups(False)
+    return working
+
+_verify_speedups()
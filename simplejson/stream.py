@@ -0,0 +1,219 @@
+"""Iterative decoding of one array in a JSON document
+"""
+import re
+
+from simplejson.decoder import JSONDecoder, JSONDecodeError, WHITESPACE
+from simplejson.scanner import c_make_scanner
+
+__all__ = ['iterarray']
+
+STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# Everything up to and including the next bracket that isn't in a string
+STRUCTURE = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*([\[\]{}])',
+                       re.DOTALL)
+
+
+def _field_tree(fields):
+    """Turn dotted paths such as ``'links.alternate.href'`` into nested dicts
+    in which ``None`` means that the whole value is wanted.
+
+    """
+    if fields is None:
+        return None
+    tree = {}
+    for field in fields:
+        node = tree
+        keys = field.split('.')
+        for key in keys[:-1]:
+            child = node.get(key, {})
+            if child is None:
+                break
+            node = node.setdefault(key, child)
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def _select(value, tree):
+    """Return the parts of an already decoded value that tree asks for"""
+    if tree is None:
+        return value
+    if isinstance(value, dict):
+        result = {}
+        for key, subtree in tree.iteritems():
+            if key in value:
+                result[key] = _select(value[key], subtree)
+        return result
+    if isinstance(value, list):
+        return [_select(element, tree) for element in value]
+    return value
+
+
+class _Found(Exception):
+    def __init__(self, idx):
+        Exception.__init__(self, idx)
+        self.idx = idx
+
+
+class _Reader(object):
+    def __init__(self, s, decoder):
+        self.s = s
+        self.scan_once = decoder.scan_once
+        self.parse_string = decoder.parse_string
+        self.encoding = decoder.encoding
+        self.strict = decoder.strict
+        # The C scanner decodes faster than values can be skipped in Python
+        self.c_scanner = (c_make_scanner is not None and
+                          isinstance(self.scan_once, c_make_scanner))
+
+    def whitespace(self, idx, _w=WHITESPACE.match):
+        return _w(self.s, idx).end()
+
+    def decode(self, idx):
+        """Return the value starting at idx and the index just after it"""
+        try:
+            return self.scan_once(self.s, idx)
+        except StopIteration:
+            raise JSONDecodeError("Expecting object", self.s, idx)
+
+    def skip(self, idx, _structure=STRUCTURE.match, _string=STRING.match):
+        """Return the index just after the value starting at idx without
+        decoding it. Only the brackets and strings that an object or array
+        contains are checked.
+
+        """
+        s = self.s
+        nextchar = s[idx:idx + 1]
+        if nextchar == '"':
+            m = _string(s, idx)
+            if m is None:
+                raise JSONDecodeError("Unterminated string", s, idx)
+            return m.end()
+        if self.c_scanner or (nextchar != '{' and nextchar != '['):
+            return self.decode(idx)[1]
+        start = idx
+        depth = 0
+        while True:
+            m = _structure(s, idx)
+            if m is None:
+                raise JSONDecodeError("Unterminated object or array", s, start)
+            if m.group(1) in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return m.end()
+            idx = m.end()
+
+    def members(self, idx, handle):
+        """Call handle(key, idx) for each member of the object starting at
+        idx, where handle returns the index just after the member's value.
+        Return the index just after the object.
+
+        """
+        s = self.s
+        idx = self.whitespace(idx + 1)
+        if s[idx:idx + 1] == '}':
+            return idx + 1
+        while True:
+            if s[idx:idx + 1] != '"':
+                raise JSONDecodeError("Expecting property name", s, idx)
+            key, idx = self.parse_string(s, idx + 1, self.encoding,
+                                         self.strict)
+            idx = self.whitespace(idx)
+            if s[idx:idx + 1] != ':':
+                raise JSONDecodeError("Expecting : delimiter", s, idx)
+            idx = self.whitespace(handle(key, self.whitespace(idx + 1)))
+            nextchar = s[idx:idx + 1]
+            if nextchar == '}':
+                return idx + 1
+            if nextchar != ',':
+                raise JSONDecodeError("Expecting , delimiter", s, idx)
+            idx = self.whitespace(idx + 1)
+
+    def project(self, idx, tree):
+        """Return the parts of the value starting at idx that tree asks for,
+        and the index just after the value.
+
+        """
+        if tree is None:
+            return self.decode(idx)
+        if self.c_scanner:
+            value, idx = self.decode(idx)
+            return _select(value, tree), idx
+        nextchar = self.s[idx:idx + 1]
+        if nextchar == '{':
+            result = {}
+            def handle(key, idx):
+                if key not in tree:
+                    return self.skip(idx)
+                result[key], idx = self.project(idx, tree[key])
+                return idx
+            return result, self.members(idx, handle)
+        if nextchar == '[':
+            result = list(self.iterate(idx, tree))
+            return result, self.end
+        return self.decode(idx)
+
+    def iterate(self, idx, tree):
+        """Yield the parts of each element of the array starting at idx that
+        tree asks for. Afterwards self.end is the index just after the array.
+
+        """
+        s = self.s
+        idx = self.whitespace(idx + 1)
+        if s[idx:idx + 1] == ']':
+            self.end = idx + 1
+            return
+        while True:
+            element, idx = self.project(idx, tree)
+            yield element
+            idx = self.whitespace(idx)
+            nextchar = s[idx:idx + 1]
+            if nextchar == ']':
+                self.end = idx + 1
+                return
+            if nextchar != ',':
+                raise JSONDecodeError("Expecting , delimiter", s, idx)
+            idx = self.whitespace(idx + 1)
+
+    def find(self, idx, path):
+        """Return the index of the value reached by following path, a
+        sequence of object keys, from idx, or None if it isn't there.
+
+        """
+        for key in path:
+            if self.s[idx:idx + 1] != '{':
+                return None
+            def handle(member, idx):
+                if member == key:
+                    raise _Found(idx)
+                return self.skip(idx)
+            try:
+                self.members(idx, handle)
+                return None
+            except _Found, found:
+                idx = found.idx
+        return idx
+
+
+def iterarray(s, path, fields=None, encoding=None, strict=True):
+    """Decode the elements of one array in the JSON document ``s`` one at a
+    time, without building the rest of the document.
+
+    *path* is the sequence of object keys that leads from the top of the
+    document to the array, e.g. ``('data', 'items')``. Nothing is yielded if
+    there isn't an array there.
+
+    If *fields* is given, each element is reduced to just those fields. They
+    are dotted paths of object keys such as ``'links.alternate.href'``, and
+    a key that meets an array applies to every element of the array. The
+    values that are left out are skipped over rather than decoded.
+
+    """
+    reader = _Reader(s, JSONDecoder(encoding=encoding, strict=strict))
+    idx = reader.find(reader.whitespace(0), path)
+    if idx is None or s[idx:idx + 1] != '[':
+        return
+    for element in reader.iterate(idx, _field_tree(fields)):
+        yield element
@@ -14,23 +14,26 @@
 import unittest
 from xmpp import SlashlessCommandMessage, XmppHandler
 
+COMMANDS = [XmppHandler.ABOUT_CMD, XmppHandler.HELP_CMD, XmppHandler.ALTERNATIVE_HELP_CMD, XmppHandler.LIST_CMD,
+            XmppHandler.POST_CMD, XmppHandler.TRACK_CMD, XmppHandler.UNTRACK_CMD, XmppHandler.SEARCH_CMD]
+
 
 class SlashlessCommandMessageTest(unittest.TestCase):
   def test_extracts_symbol_as_command_given_symbol(self):
     self.assertEquals('?', SlashlessCommandMessage.extract_command_and_arg_from_string('?')[0])
 
   def test_extracts_all_commands(self):
-    for command in XmppHandler.PERMITTED_COMMANDS:
+    for command in COMMANDS:
       self.assertEquals(command, SlashlessCommandMessage.extract_command_and_arg_from_string(command)[0])
 
   def test_extracts_all_commands_prefixed_with_space(self):
-    for command in XmppHandler.PERMITTED_COMMANDS:
+    for command in COMMANDS:
       self.assertEquals(command, SlashlessCommandMessage.extract_command_and_arg_from_string(' ' + command)[0])
 
   def test_extracts_all_commands_suffixed_with_space(self):
-    for command in XmppHandler.PERMITTED_COMMANDS:
+    for command in COMMANDS:
       self.assertEquals(command, SlashlessCommandMessage.extract_command_and_arg_from_string(command + ' ')[0])
 
   def test_extracts_all_commands_surrounded_with_space(self):
-    for command in XmppHandler.PERMITTED_COMMANDS:
+    for command in COMMANDS:
       self.assertEquals(command, SlashlessCommandMessage.extract_command_and_arg_from_string(' ' + command + ' ')[0])
\ No newline at end of file
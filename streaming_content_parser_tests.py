@@ -0,0 +1,89 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from pshb import StreamingContentParser
+
+import datetime
+import unittest
+import xml.sax
+
+FEED = '''<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <link rel="self" href="https://www.googleapis.com/buzz/v1/activities/track?q=somestring"/>
+  <title>Track feed</title>
+  %s
+</feed>'''
+
+ENTRY = '''<entry>
+    <id>tag:google.com,2010:buzz:%(id)s</id>
+    <title>Title %(id)s</title>
+    <link rel="alternate" type="text/html" href="http://www.google.com/buzz/%(id)s"/>
+    <author><name>Author %(id)s</name></author>
+    <updated>2010-05-01T10:11:12.000Z</updated>
+    <content type="html">&lt;b&gt;Content %(id)s&lt;/b&gt;</content>
+    <source><title>Not the entry title</title><author><name>Not the entry author</name></author></source>
+  </entry>'''
+
+def make_feed(count):
+  return FEED % ''.join([ENTRY % {'id': id} for id in range(count)])
+
+class StreamingContentParserTest(unittest.TestCase):
+  def test_yields_one_record_per_entry(self):
+    parser = StreamingContentParser(make_feed(3))
+
+    records = list(parser.iterPosts())
+
+    self.assertEquals(['Title 0', 'Title 1', 'Title 2'], [record.title for record in records])
+
+  def test_extracts_the_fields_used_for_posts(self):
+    parser = StreamingContentParser(make_feed(1))
+
+    record = list(parser.iterPosts())[0]
+
+    self.assertEquals('tag:google.com,2010:buzz:0', record.uniqueId)
+    self.assertEquals('http://www.google.com/buzz/0', record.url)
+    self.assertEquals('https://www.googleapis.com/buzz/v1/activities/track?q=somestring', record.feedUrl)
+    self.assertEquals('<b>Content 0</b>', record.content)
+    self.assertEquals('Author 0', record.author)
+    self.assertEquals(datetime.datetime(2010, 5, 1, 10, 11, 12), record.datePublished)
+
+  def test_yields_records_before_the_whole_document_has_been_read(self):
+    parser = StreamingContentParser(make_feed(100), chunkSize=512)
+
+    first = parser.iterPosts().next()
+
+    self.assertEquals('Title 0', first.title)
+    self.assertTrue(len(parser.handler.records) < 100)
+
+  def test_handles_feeds_with_no_entries(self):
+    parser = StreamingContentParser(make_feed(0))
+
+    self.assertEquals([], list(parser.iterPosts()))
+
+  def test_raises_exception_for_malformed_feed(self):
+    parser = StreamingContentParser(make_feed(2).replace('</feed>', ''))
+
+    self.assertRaises(xml.sax.SAXException, list, parser.iterPosts())
+
+  def test_yields_the_entries_before_an_error(self):
+    parser = StreamingContentParser(make_feed(2) + '<entry>')
+    titles = []
+
+    try:
+      for record in parser.iterPosts():
+        titles.append(record.title)
+      self.fail('A malformed feed should raise SAXException')
+    except xml.sax.SAXException:
+      pass
+    self.assertEquals(['Title 0', 'Title 1'], titles)
+
@@ -0,0 +1,85 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from apiclient.discovery import JsonModel
+from simplejson import iterarray
+
+import benchmark_feeds
+import simplejson
+import unittest
+
+
+class Response(dict):
+  def __init__(self, status):
+    self.status = status
+    self.reason = 'OK'
+
+
+class IterarrayTest(unittest.TestCase):
+  def test_decodes_the_same_items_as_loads(self):
+    document = benchmark_feeds.make_activities_json(5, html=True)
+
+    self.assertEquals(simplejson.loads(document)['data']['items'], list(iterarray(document, ('data', 'items'))))
+
+  def test_reduces_items_to_the_fields_asked_for(self):
+    document = benchmark_feeds.make_activities_json(2)
+
+    items = list(iterarray(document, ('data', 'items'), fields=['title', 'links.alternate.href']))
+
+    self.assertEquals([{'title': 'Post 0 about somestring',
+                        'links': {'alternate': [{'href': 'http://www.google.com/buzz/user0/0/Post'}]}},
+                       {'title': 'Post 1 about somestring',
+                        'links': {'alternate': [{'href': 'http://www.google.com/buzz/user1/1/Post'}]}}], items)
+
+  def test_a_field_asks_for_everything_below_it(self):
+    document = '{"a": [{"x": {"y": 1, "z": [1, {"q": 2}]}, "w": 3}]}'
+
+    self.assertEquals([{'x': {'z': [1, {'q': 2}]}}], list(iterarray(document, ['a'], fields=['x.z.q', 'x.z'])))
+
+  def test_skips_strings_containing_brackets_and_quotes(self):
+    document = ' { "skipped" : {"s": "}]\\"{"} , "a" : [ 1 , {"b": [ ], "c": "x\\"]"} , [ ] ] } '
+
+    self.assertEquals([1, {'b': [], 'c': 'x"]'}, []], list(iterarray(document, ['a'])))
+
+  def test_yields_nothing_when_the_path_is_missing(self):
+    self.assertEquals([], list(iterarray('{"data": {}}', ('data', 'items'))))
+    self.assertEquals([], list(iterarray('{"data": []}', ('data', 'items'))))
+    self.assertEquals([], list(iterarray('{"data": {"items": "none"}}', ('data', 'items'))))
+
+  def test_yields_items_one_at_a_time(self):
+    items = iterarray('{"items": [1, 2, oops]}', ['items'])
+
+    self.assertEquals(1, items.next())
+    self.assertEquals(2, items.next())
+    self.assertRaises(ValueError, items.next)
+
+
+class JsonModelItemsTest(unittest.TestCase):
+  def test_decodes_only_the_items(self):
+    model = JsonModel(items=('data', 'items'), fields=['title'])
+    content = benchmark_feeds.make_activities_json(2)
+
+    self.assertEquals([{'title': 'Post 0 about somestring'}, {'title': 'Post 1 about somestring'}],
+                      model.response(Response(200), content))
+
+  def test_no_content_means_no_items(self):
+    self.assertEquals([], JsonModel(items=('data', 'items')).response(Response(204), ''))
+
+  def test_without_items_decodes_the_whole_document(self):
+    content = benchmark_feeds.make_activities_json(1)
+
+    self.assertEquals(simplejson.loads(content)['data'], JsonModel().response(Response(200), content))
+
+
+if __name__ == '__main__':
+  unittest.main()
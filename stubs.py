@@ -17,11 +17,31 @@ import pshb
 import simple_buzz_wrapper
 
 class StubHubSubscriber(pshb.HubSubscriber):
-  def subscribe(self, url, hub, callback_url):
+  def __init__(self):
+    self.callback_url = None
+    self.subscribed = []
+    self.unsubscribed = []
+
+  def subscribe(self, url, hub, callback_url, lease_seconds=None):
     self.callback_url = callback_url
+    self.subscribed.append(callback_url)
 
   def unsubscribe(self, url, hub, callback_url):
     self.callback_url = callback_url
+    self.unsubscribed.append(callback_url)
+
+class StubSender(object):
+  """Records what would have been sent instead of sending it"""
+  def __init__(self):
+    self.sent = []
+
+  def send(self, recipients, body):
+    self.sent.append((recipients, body))
+
+class StubDeliveryThrottle(object):
+  """Lets every subscriber be sent everything at once"""
+  def split(self, term, subscribers, count):
+    return list(subscribers), []
 
 class StubMessage(object):
   def __init__(self, sender='foo@example.com', body=''):
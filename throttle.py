@@ -0,0 +1,143 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Rate limits and popularity estimates for deciding how quickly to deliver posts"""
+
+import array
+import hashlib
+import math
+import struct
+import time
+
+
+class TokenBucket(object):
+  """Allows bursts of up to capacity and, on average, rate per second.
+
+  The state is just the number of tokens and when they were counted, so that a bucket can be kept anywhere
+  between requests. Pass the result of state() back in to get the same bucket."""
+
+  def __init__(self, rate, capacity, tokens=None, updated=None):
+    if rate <= 0 or capacity <= 0:
+      raise ValueError('rate and capacity must be positive')
+    self.rate = rate
+    self.capacity = capacity
+    if tokens is None:
+      tokens = capacity
+    self.tokens = tokens
+    self.updated = updated
+
+  def _refill(self, now):
+    if self.updated is not None and now > self.updated:
+      self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+    self.updated = now
+
+  def take(self, count=1, now=None):
+    """Takes count tokens and returns True if there are enough of them, otherwise takes none and returns False"""
+    if now is None:
+      now = time.time()
+    self._refill(now)
+    if self.tokens < count:
+      return False
+    self.tokens -= count
+    return True
+
+  def state(self):
+    return self.tokens, self.updated
+
+
+class CountMinSketch(object):
+  """Estimates how many times each of an unbounded number of keys has been counted, using a fixed amount of memory.
+
+  An estimate is never too low. It's too high by more than error times the total of all counts with a probability
+  of at most failure. Pass the result of tostring() as counts to get the same sketch back."""
+
+  def __init__(self, error=0.001, failure=0.01, counts=None):
+    if not 0 < error < 1 or not 0 < failure < 1:
+      raise ValueError('error and failure must be between 0 and 1')
+    self.width = int(math.ceil(math.e / error))
+    self.depth = int(math.ceil(math.log(1 / failure)))
+    if counts is None:
+      self.counts = array.array('L', [0]) * (self.width * self.depth)
+    else:
+      self.counts = array.array('L', counts)
+      if len(self.counts) != self.width * self.depth:
+        raise ValueError('Expected %d counts but got %d' % (self.width * self.depth, len(self.counts)))
+    self.total = 0
+
+  def _positions(self, key):
+    if isinstance(key, unicode):
+      key = key.encode('utf-8')
+    # Double hashing, as bloom.BloomFilter does, gives each row its own hash
+    h1, h2 = struct.unpack('<QQ', hashlib.md5(key).digest())
+    width = self.width
+    return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+  def add(self, key, count=1):
+    counts = self.counts
+    for position in self._positions(key):
+      counts[position] += count
+    self.total += count
+
+  def estimate(self, key):
+    counts = self.counts
+    return min([counts[position] for position in self._positions(key)])
+
+  def tostring(self):
+    return self.counts.tostring()
+
+
+class PopularityEstimator(object):
+  """Estimates how many times each key was counted in roughly the last window seconds.
+
+  Counts go into the sketch for the current window. The previous window's sketch is kept, and its estimate is
+  weighted by how much of it still overlaps the last window seconds, so estimates don't drop to nothing the moment
+  a window ends."""
+
+  def __init__(self, window, error=0.001, failure=0.01, clock=time.time):
+    self.window = window
+    self.error = error
+    self.failure = failure
+    self.clock = clock
+    self.current = CountMinSketch(error, failure)
+    self.previous = None
+    self.started = self._window_start(clock())
+
+  def _window_start(self, now):
+    return now - now % self.window
+
+  def _rotate(self, now):
+    start = self._window_start(now)
+    if start == self.started:
+      return
+    if start - self.started == self.window:
+      self.previous = self.current
+    else:
+      self.previous = None
+    self.current = CountMinSketch(self.error, self.failure)
+    self.started = start
+
+  def add(self, key, count=1, now=None):
+    if now is None:
+      now = self.clock()
+    self._rotate(now)
+    self.current.add(key, count)
+
+  def estimate(self, key, now=None):
+    if now is None:
+      now = self.clock()
+    self._rotate(now)
+    estimate = self.current.estimate(key)
+    if self.previous is not None:
+      overlap = 1 - float(now - self.started) / self.window
+      estimate += int(self.previous.estimate(key) * overlap)
+    return estimate
@@ -0,0 +1,115 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from throttle import CountMinSketch, PopularityEstimator, TokenBucket
+
+import unittest
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 3600.0
+
+  def __call__(self):
+    return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+  def test_allows_a_burst_up_to_capacity(self):
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    self.assertTrue(bucket.take(2, now=0))
+    self.assertTrue(bucket.take(1, now=0))
+    self.assertFalse(bucket.take(1, now=0))
+
+  def test_refills_at_the_rate_up_to_capacity(self):
+    bucket = TokenBucket(rate=0.5, capacity=3)
+    bucket.take(3, now=0)
+
+    self.assertFalse(bucket.take(2, now=3))
+    self.assertTrue(bucket.take(1, now=3))
+    self.assertTrue(bucket.take(3, now=100))
+    self.assertFalse(bucket.take(1, now=100))
+
+  def test_failing_to_take_takes_nothing(self):
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    self.assertFalse(bucket.take(4, now=0))
+    self.assertTrue(bucket.take(3, now=0))
+
+  def test_can_be_restored_from_its_state(self):
+    bucket = TokenBucket(rate=1, capacity=3)
+    bucket.take(3, now=10)
+
+    restored = TokenBucket(1, 3, *bucket.state())
+
+    self.assertFalse(restored.take(1, now=10))
+    self.assertTrue(restored.take(1, now=11))
+
+
+class CountMinSketchTest(unittest.TestCase):
+  def test_estimates_are_never_too_low(self):
+    sketch = CountMinSketch(error=0.01, failure=0.01)
+    for i in range(1000):
+      sketch.add('term%d' % (i % 100), i % 7 + 1)
+
+    for i in range(100):
+      exact = sum([j % 7 + 1 for j in range(1000) if j % 100 == i])
+      estimate = sketch.estimate('term%d' % i)
+      self.assertTrue(exact <= estimate <= exact + 0.01 * sketch.total * 2, (exact, estimate))
+
+  def test_unicode_keys(self):
+    sketch = CountMinSketch()
+    sketch.add(u'caf\u00e9', 3)
+
+    self.assertEquals(3, sketch.estimate(u'caf\u00e9'))
+
+  def test_can_be_restored_from_a_string(self):
+    sketch = CountMinSketch()
+    sketch.add('popular', 42)
+
+    self.assertEquals(42, CountMinSketch(counts=sketch.tostring()).estimate('popular'))
+    self.assertRaises(ValueError, CountMinSketch, 0.01, 0.01, sketch.tostring())
+
+
+class PopularityEstimatorTest(unittest.TestCase):
+  def setUp(self):
+    self.clock = FakeClock()
+    self.estimator = PopularityEstimator(window=100, clock=self.clock)
+
+  def test_counts_within_the_window(self):
+    self.estimator.add('popular', 10)
+    self.estimator.add('popular', 5)
+
+    self.assertEquals(15, self.estimator.estimate('popular'))
+    self.assertEquals(0, self.estimator.estimate('unknown'))
+
+  def test_counts_from_the_previous_window_fade_away(self):
+    self.estimator.add('popular', 100)
+
+    self.clock.now += 125
+    self.assertEquals(75, self.estimator.estimate('popular'))
+    self.clock.now += 100
+    self.assertEquals(0, self.estimator.estimate('popular'))
+
+  def test_forgets_everything_after_a_quiet_window(self):
+    self.estimator.add('popular', 100)
+    self.clock.now += 250
+
+    self.estimator.add('other', 1)
+
+    self.assertEquals(0, self.estimator.estimate('popular'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from stubs import StubHubSubscriber
-from xmpp import Subscription, Tracker
+from xmpp import SearchTerm, Subscription, Tracker
 import settings
 import unittest
 
@@ -84,6 +84,8 @@ class TrackerTest(unittest.TestCase):
   def _delete_all_subscriptions(self):
     for subscription in Subscription.all().fetch(100):
       subscription.delete()
+    for search_term in SearchTerm.all().fetch(100):
+      search_term.delete()
 
   def test_tracker_saves_subscription(self):
     self._delete_all_subscriptions()
@@ -98,7 +100,8 @@ class TrackerTest(unittest.TestCase):
     self.assertEquals(1, len(Subscription.all().fetch(100)))
     self.assertEquals(subscription, Subscription.all().fetch(1)[0])
 
-  def test_tracker_subscribes_with_callback_url_that_identifies_subscriber_and_query(self):
+  def test_tracker_subscribes_with_callback_url_that_identifies_search_term(self):
+    self._delete_all_subscriptions()
     sender = 'foo@example.com'
     search_term='somestring'
     hub_subscriber = StubHubSubscriber()
@@ -106,10 +109,11 @@ class TrackerTest(unittest.TestCase):
     tracker = Tracker(hub_subscriber=hub_subscriber)
 
     subscription = tracker.track(sender, search_term)
-    expected_callback_url = '%s/posts?id=%s' % (settings.APP_URL, subscription.id())
+    expected_callback_url = '%s/posts?term=%s' % (settings.APP_URL, search_term)
     self.assertEquals(expected_callback_url, hub_subscriber.callback_url)
 
   def test_tracker_subscribes_with_urlencoded_callback_url(self):
+    self._delete_all_subscriptions()
     sender = 'foo@example.com'
     search_term='some string'
     hub_subscriber = StubHubSubscriber()
@@ -117,10 +121,11 @@ class TrackerTest(unittest.TestCase):
     tracker = Tracker(hub_subscriber=hub_subscriber)
 
     subscription = tracker.track(sender, search_term)
-    expected_callback_url = '%s/posts?id=%s' % (settings.APP_URL, subscription.id())
+    expected_callback_url = '%s/posts?term=%s' % (settings.APP_URL, 'some%20string')
     self.assertEquals(expected_callback_url, hub_subscriber.callback_url)
 
-  def test_tracker_subscribes_with_callback_url_that_identifies_subscriber_and_query_without_xmpp_client_identifier(self):
+  def test_tracker_subscribes_with_callback_url_that_identifies_search_term_without_xmpp_client_identifier(self):
+    self._delete_all_subscriptions()
     sender = 'foo@example.com/Adium380DADCD'
     search_term='somestring'
 
@@ -128,9 +133,56 @@ class TrackerTest(unittest.TestCase):
     tracker = Tracker(hub_subscriber=hub_subscriber)
 
     subscription = tracker.track(sender, search_term)
-    expected_callback_url = '%s/posts?id=%s' % (settings.APP_URL, subscription.id())
+    expected_callback_url = '%s/posts?term=%s' % (settings.APP_URL, search_term)
     self.assertEquals(expected_callback_url, hub_subscriber.callback_url)
 
+  def test_tracker_canonicalises_search_terms(self):
+    self.assertEquals('some string', SearchTerm.canonicalise('  Some   STRING '))
+
+  def test_tracker_only_subscribes_to_hub_once_per_search_term(self):
+    self._delete_all_subscriptions()
+    hub_subscriber = StubHubSubscriber()
+    tracker = Tracker(hub_subscriber=hub_subscriber)
+
+    tracker.track('foo@example.com', 'somestring')
+    tracker.track('bar@example.com', 'SomeString')
+
+    self.assertEquals(1, len(hub_subscriber.subscribed))
+    self.assertEquals(2, len(Subscription.all().fetch(100)))
+    search_term = SearchTerm.get_by_term('somestring')
+    self.assertEquals(['foo@example.com', 'bar@example.com'], search_term.unique_subscribers())
+
+  def test_tracker_keeps_hub_subscription_while_search_term_has_subscribers(self):
+    self._delete_all_subscriptions()
+    hub_subscriber = StubHubSubscriber()
+    tracker = Tracker(hub_subscriber=hub_subscriber)
+    foo_subscription = tracker.track('foo@example.com', 'somestring')
+    bar_subscription = tracker.track('bar@example.com', 'somestring')
+
+    tracker.untrack('foo@example.com', foo_subscription.id())
+    self.assertEquals(0, len(hub_subscriber.unsubscribed))
+    self.assertEquals(['bar@example.com'], SearchTerm.get_by_term('somestring').unique_subscribers())
+
+    tracker.untrack('bar@example.com', bar_subscription.id())
+    self.assertEquals(1, len(hub_subscriber.unsubscribed))
+    self.assertEquals(None, SearchTerm.get_by_term('somestring'))
+
+  def test_terms_that_cannot_be_key_names_can_be_tracked(self):
+    self._delete_all_subscriptions()
+    tracker = Tracker(hub_subscriber=StubHubSubscriber())
+
+    # Key names of the form __foo__ are reserved and none can be longer than 500 bytes
+    for term in ['__x__', 'word ' * 120]:
+      subscription = tracker.track('foo@example.com', term)
+
+      canonical_term = SearchTerm.canonicalise(term)
+      self.assertEquals(canonical_term, subscription.canonical_term)
+      search_term = SearchTerm.get_by_term(canonical_term)
+      self.assertEquals(canonical_term, search_term.search_term)
+      self.assertEquals(['foo@example.com'], search_term.unique_subscribers())
+      self.assertTrue(len(search_term.key().name()) < 500)
+      self.assertFalse(search_term.key().name().startswith('__'))
+
   def test_tracker_rejects_invalid_id_for_untracking(self):
     self._delete_all_subscriptions()
     sender = 'foo@example.com/Adium380DADCD'
@@ -153,4 +205,4 @@ class TrackerTest(unittest.TestCase):
 
     self.assertEquals(track_subscription, untrack_subscription)
     self.assertFalse(Subscription.exists(track_subscription.id()))
-    self.assertEquals('%s/posts?id=%s' % (settings.APP_URL, track_subscription.id()), hub_subscriber.callback_url)
+    self.assertEquals('%s/posts?term=%s' % (settings.APP_URL, search_term), hub_subscriber.callback_url)
@@ -1,5 +1,6 @@
 # Early, and incomplete implementation of -04.
 # http://code.google.com/p/uri-templates
+import lru
 import re
 import urllib
 
@@ -9,6 +10,8 @@ EXPLODE = "*+"
 MODIFIER = ":^"
 TEMPLATE = re.compile(r"{(?P<operator>[\+\./;\?|!@])?(?P<varlist>[^}]+)}", re.UNICODE)
 VAR = re.compile(r"^(?P<varname>[^=\+\*:\^]+)((?P<explode>[\+\*])|(?P<partial>[:\^]-?[0-9]+))?(=(?P<default>.*))?$", re.UNICODE)
+# How many of the most recently used templates are kept compiled
+COMPILED_TEMPLATE_CACHE_SIZE = 100
 
 
 def _tostring(varname, value, explode, operator, safe=""):
@@ -98,42 +101,40 @@ TOSTRING = {
     }
 
 
-def expand(template, vars):
-  def _sub(match):
-    groupdict = match.groupdict()
-    operator = groupdict.get('operator')
-    if operator is None:
-      operator = ''
-    varlist = groupdict.get('varlist')
-
-    safe = ""
+class _Expression(object):
+  """One {...} expression of a template, parsed into everything needed to expand it"""
+
+  def __init__(self, operator, varlist):
+    self.operator = operator
+    self.tostring = TOSTRING[operator]
+    self.safe = ""
     if operator == '+':
-      safe = RESERVED
-    varspecs = varlist.split(",")
-    varnames = []
-    defaults = {}
-    for varspec in varspecs:
+      self.safe = RESERVED
+    self.varnames = []
+    self.defaults = {}
+    for varspec in varlist.split(","):
       m = VAR.search(varspec)
       groupdict = m.groupdict()
       varname = groupdict.get('varname')
-      explode = groupdict.get('explode')
-      partial = groupdict.get('partial')
       default = groupdict.get('default')
       if default:
-        defaults[varname] = default
-      varnames.append((varname, explode, partial))
+        self.defaults[varname] = default
+      self.varnames.append((varname, groupdict.get('explode'), groupdict.get('partial')))
 
-    retval = []
-    joiner = operator
-    prefix = operator
+    self.joiner = operator
+    self.prefix = operator
     if operator == "+":
-      prefix = ""
-      joiner = ","
+      self.prefix = ""
+      self.joiner = ","
     if operator == "?":
-      joiner = "&"
+      self.joiner = "&"
     if operator == "":
-      joiner = ","
-    for varname, explode, partial in varnames:
+      self.joiner = ","
+
+  def expand(self, vars):
+    defaults = self.defaults
+    retval = []
+    for varname, explode, partial in self.varnames:
       if varname in vars:
         value = vars[varname]
         #if not value and (type(value) == type({}) or type(value) == type([])) and varname in defaults:
@@ -143,10 +144,48 @@ def expand(template, vars):
         value = defaults[varname]
       else:
         continue
-      retval.append(TOSTRING[operator](varname, value, explode, operator, safe=safe))
+      retval.append(self.tostring(varname, value, explode, self.operator, safe=self.safe))
     if "".join(retval):
-      return prefix + joiner.join(retval)
+      return self.prefix + self.joiner.join(retval)
     else:
       return ""
 
-  return TEMPLATE.sub(_sub, template)
+
+class CompiledTemplate(object):
+  """A template that has been parsed once into the literal text and expressions it's made of, so that expanding it
+  doesn't have to scan the template with regular expressions again."""
+
+  def __init__(self, template):
+    self.template = template
+    # Pairs of the literal text before an expression and the expression. The last pair's expression is None.
+    self.parts = []
+    position = 0
+    for match in TEMPLATE.finditer(template):
+      expression = _Expression(match.group('operator') or '', match.group('varlist'))
+      self.parts.append((template[position:match.start()], expression))
+      position = match.end()
+    self.parts.append((template[position:], None))
+
+  def expand(self, vars):
+    pieces = []
+    for literal, expression in self.parts:
+      pieces.append(literal)
+      if expression is not None:
+        pieces.append(expression.expand(vars))
+    return "".join(pieces)
+
+
+_compiled = lru.LRUCache(COMPILED_TEMPLATE_CACHE_SIZE)
+
+
+def compile(template):
+  """Returns the CompiledTemplate for the template, reusing one of the most recently compiled templates if it can."""
+  compiled = _compiled.get(template)
+  if compiled is None:
+    compiled = CompiledTemplate(template)
+    _compiled.put(template, compiled)
+  return compiled
+
+
+def expand(template, vars):
+  return compile(template).expand(vars)
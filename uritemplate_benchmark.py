@@ -0,0 +1,131 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares how many URLs per second uritemplate can expand from compiled templates and with the regular expression
+substitution that it used to do on every call. The templates are the Buzz paths the bot requests most.
+
+Run it like this:
+python uritemplate_benchmark.py [number of expansions]
+"""
+
+from uritemplate import RESERVED, TEMPLATE, TOSTRING, VAR
+
+import sys
+import time
+import uritemplate
+
+# Discovery turns every {name} in a restPath into {+name}
+EXPANSIONS = [
+  ('activities/{+userId}/{+scope}', {'userId': '@me', 'scope': '@self'}),
+  ('activities/search', {'q': 'buzz', 'alt': 'json'}),
+  ('activities/{+userId}/@self/{+postId}', {'userId': '@me', 'postId': 'tag:google.com,2010:buzz:z12abc'}),
+  ('activities/{+userId}/{+scope}/{+postId}/@comments',
+   {'userId': '@me', 'scope': '@self', 'postId': 'tag:google.com,2010:buzz:z12abc'}),
+  ('people/{+userId}/@groups/{+groupId}', {'userId': '@me', 'groupId': '@followers'}),
+  ('search{?q,alt}', {'q': 'hello world', 'alt': 'json'}),
+]
+
+
+def legacy_expand(template, vars):
+  def _sub(match):
+    groupdict = match.groupdict()
+    operator = groupdict.get('operator')
+    if operator is None:
+      operator = ''
+    varlist = groupdict.get('varlist')
+
+    safe = ""
+    if operator == '+':
+      safe = RESERVED
+    varspecs = varlist.split(",")
+    varnames = []
+    defaults = {}
+    for varspec in varspecs:
+      m = VAR.search(varspec)
+      groupdict = m.groupdict()
+      varname = groupdict.get('varname')
+      explode = groupdict.get('explode')
+      partial = groupdict.get('partial')
+      default = groupdict.get('default')
+      if default:
+        defaults[varname] = default
+      varnames.append((varname, explode, partial))
+
+    retval = []
+    joiner = operator
+    prefix = operator
+    if operator == "+":
+      prefix = ""
+      joiner = ","
+    if operator == "?":
+      joiner = "&"
+    if operator == "":
+      joiner = ","
+    for varname, explode, partial in varnames:
+      if varname in vars:
+        value = vars[varname]
+        if not value and value != "" and varname in defaults:
+          value = defaults[varname]
+      elif varname in defaults:
+        value = defaults[varname]
+      else:
+        continue
+      retval.append(TOSTRING[operator](varname, value, explode, operator, safe=safe))
+    if "".join(retval):
+      return prefix + joiner.join(retval)
+    else:
+      return ""
+
+  return TEMPLATE.sub(_sub, template)
+
+
+def precompiled_expand(template, vars, _compiled={}):
+  """What discovery does: compile each method's template once and keep hold of it"""
+  compiled = _compiled.get(template)
+  if compiled is None:
+    compiled = _compiled[template] = uritemplate.CompiledTemplate(template)
+  return compiled.expand(vars)
+
+
+def expansions_per_second(expand, count, repeat=3):
+  expansions = (EXPANSIONS * (count // len(EXPANSIONS) + 1))[:count]
+  best = None
+  for i in range(repeat):
+    start = time.time()
+    for template, vars in expansions:
+      expand(template, vars)
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return count / best
+
+
+def run(count=100000):
+  for template, vars in EXPANSIONS:
+    assert legacy_expand(template, vars) == uritemplate.expand(template, vars), template
+
+  before = expansions_per_second(legacy_expand, count)
+  cached = expansions_per_second(uritemplate.expand, count)
+  precompiled = expansions_per_second(precompiled_expand, count)
+  print '%-22s %14s' % ('expansion', 'urls/s')
+  print '%-22s %14.0f' % ('regex substitution', before)
+  print '%-22s %14.0f' % ('cached compile', cached)
+  print '%-22s %14.0f' % ('precompiled', precompiled)
+  print 'speed up: %.2fx cached, %.2fx precompiled' % (cached / before, precompiled / before)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    run(int(sys.argv[1]))
+  else:
+    run()
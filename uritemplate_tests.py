@@ -0,0 +1,52 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import uritemplate
+
+
+class CompiledTemplateTest(unittest.TestCase):
+  def test_expands_reserved_path_variables(self):
+    template = uritemplate.compile('activities/{+userId}/{+scope}/{+postId}')
+
+    self.assertEquals('activities/@me/@self/tag:google.com,2010:buzz/123',
+                      template.expand({'userId': '@me', 'scope': '@self', 'postId': 'tag:google.com,2010:buzz/123'}))
+
+  def test_leaves_out_missing_variables(self):
+    template = uritemplate.compile('activities/{+userId}/{+scope}')
+
+    self.assertEquals('activities/@me/', template.expand({'userId': '@me'}))
+
+  def test_escapes_simple_variables(self):
+    self.assertEquals('search/hello%20world', uritemplate.expand('search/{q}', {'q': 'hello world'}))
+
+  def test_expands_query_variables(self):
+    self.assertEquals('search?q=buzz&alt=json', uritemplate.expand('search{?q,alt}', {'q': 'buzz', 'alt': 'json'}))
+
+  def test_uses_defaults(self):
+    self.assertEquals('feeds/@me', uritemplate.expand('feeds/{+userId=@me}', {}))
+
+  def test_expands_lists_and_dicts(self):
+    self.assertEquals('tags/a,b', uritemplate.expand('tags/{tags}', {'tags': ['a', 'b']}))
+    self.assertEquals('path/a/b', uritemplate.expand('path{/segments*}', {'segments': ['a', 'b']}))
+    self.assertEquals('search?a=1', uritemplate.expand('search{?params*}', {'params': {'a': '1'}}))
+
+  def test_templates_without_expressions_are_returned_as_is(self):
+    self.assertEquals('activities/search', uritemplate.expand('activities/search', {'q': 'buzz'}))
+
+  def test_compiled_templates_are_reused(self):
+    self.assertTrue(uritemplate.compile('people/{+userId}') is uritemplate.compile('people/{+userId}'))
+
+
+if __name__ == '__main__':
+  unittest.main()
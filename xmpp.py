@@ -11,28 +11,64 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from google.appengine.api import memcache
 from google.appengine.api import xmpp
 from google.appengine.ext import db
 from google.appengine.ext import webapp
 
 
+import bisect
+import commands
+import datetime
+import executors
+import fanout
+import hashlib
 import logging
+import lru
+import matcher
 import oauth_handlers
 import pprint
 import pshb
 import re
 import settings
 import simple_buzz_wrapper
+import throttle
+import time
 import urllib
+import xml.sax.saxutils
+
+def term_key_name(prefix, term):
+  """The key name of an entity that belongs to a term. The term itself can't be used: key names like __foo__ are
+  reserved and none can be longer than 500 bytes."""
+  return '%s:%s' % (prefix, hashlib.md5(term.encode('utf-8')).hexdigest())
+
 
 class Subscription(db.Model):
   url = db.StringProperty(required=True)
-  search_term = db.StringProperty(required=True)
+  # Text because a term can be longer than the 500 bytes a StringProperty holds
+  search_term = db.TextProperty(required=True)
   subscriber = db.StringProperty()
+  # Subscriptions created before search terms were shared have no canonical_term and their own hub subscription
+  canonical_term = db.TextProperty()
+  # When the lease on that hub subscription runs out and when to renew it. Only set without a canonical_term.
+  lease_expires = db.DateTimeProperty()
+  renew_at = db.DateTimeProperty()
 
   def id(self):
     return self.key().id()
 
+  def unique_subscribers(self):
+    return [self.subscriber]
+
+  def has_own_hub_subscription(self):
+    """Whether the lease on a hub subscription is recorded here rather than on a SearchTerm"""
+    return self.canonical_term is None
+
+  @property
+  def seen_key(self):
+    """The key name of the pshb.SeenEntries that remembers what this subscription has been sent"""
+    return 'subscription:%s' % self.id()
+
   def __eq__(self, other):
     if not other:
       return False
@@ -46,7 +82,144 @@ class Subscription(db.Model):
     return Subscription.get_by_id(int(id)) is not None
 
 
+class SubscriptionSummary(object):
+  """The (id, search term) pairs, in id order, of someone's subscriptions. They're cached in memcache per subscriber.
+
+  The list command only shows those two fields so it doesn't have to load every Subscription each time. Tracker
+  invalidates a subscriber's summary whenever one of their subscriptions is added or removed."""
+  SUMMARY_KEY = 'subscription_summary:%s'
+  CURSOR_KEY = 'list_cursor:%s'
+
+  @staticmethod
+  def get(subscriber):
+    key = SubscriptionSummary.SUMMARY_KEY % subscriber
+    summary = memcache.get(key)
+    if summary is None:
+      summary = []
+      query = Subscription.all().filter('subscriber =', subscriber)
+      # Someone can have more subscriptions than one fetch returns so keep going until the query runs out
+      while True:
+        subscriptions = query.fetch(settings.MAX_FETCH)
+        summary.extend([(subscription.id(), subscription.search_term) for subscription in subscriptions])
+        if len(subscriptions) < settings.MAX_FETCH:
+          break
+        query.with_cursor(query.cursor())
+      summary.sort()
+      memcache.set(key, summary, time=settings.SUBSCRIPTION_SUMMARY_TTL)
+    return summary
+
+  @staticmethod
+  def invalidate(subscriber):
+    memcache.delete(SubscriptionSummary.SUMMARY_KEY % subscriber)
+
+  @staticmethod
+  def page(subscriber, after_id=None, page_size=None):
+    """Returns the next page_size entries whose ids are greater than after_id, the index of the first of them and
+    how many entries there are in all"""
+    if page_size is None:
+      page_size = settings.LIST_PAGE_SIZE
+    summary = SubscriptionSummary.get(subscriber)
+    start = 0
+    if after_id is not None:
+      start = bisect.bisect_right([id for id, search_term in summary], after_id)
+    return summary[start:start + page_size], start, len(summary)
+
+  @staticmethod
+  def get_cursor(subscriber):
+    """The id of the last subscription that the list command showed the subscriber or None"""
+    return memcache.get(SubscriptionSummary.CURSOR_KEY % subscriber)
+
+  @staticmethod
+  def set_cursor(subscriber, last_id):
+    memcache.set(SubscriptionSummary.CURSOR_KEY % subscriber, last_id, time=settings.SUBSCRIPTION_SUMMARY_TTL)
+
+
+class SearchTerm(db.Model):
+  """A search term and everyone who is tracking it.
+
+  The key_name is made from the canonical form of the term by key_name_for. There's only one hub subscription per
+  SearchTerm so a
+  PSHB notification for a popular term is received and parsed once no matter how many people are tracking it.
+  The subscribers list behaves like a multiset: someone who tracks the same term twice appears twice."""
+  url = db.StringProperty(required=True)
+  term = db.TextProperty(required=True)
+  subscribers = db.StringListProperty()
+  hub = db.StringProperty()
+  # When the lease on the hub subscription runs out and when LeaseRenewer should renew it
+  lease_expires = db.DateTimeProperty()
+  renew_at = db.DateTimeProperty()
+
+  @property
+  def search_term(self):
+    return self.term
+
+  def has_own_hub_subscription(self):
+    return True
+
+  @staticmethod
+  def key_name_for(term):
+    return term_key_name('t', term)
+
+  @staticmethod
+  def get_by_term(term):
+    """The SearchTerm for the canonical term or None if nobody is tracking it"""
+    return SearchTerm.get_by_key_name(SearchTerm.key_name_for(term))
+
+  @property
+  def seen_key(self):
+    """The key name of the pshb.SeenEntries that remembers what this term's subscribers have been sent"""
+    return 'term:%s' % self.key().name()
+
+  def unique_subscribers(self):
+    seen = set()
+    unique = []
+    for subscriber in self.subscribers:
+      if subscriber not in seen:
+        seen.add(subscriber)
+        unique.append(subscriber)
+    return unique
+
+  @staticmethod
+  def canonicalise(search_term):
+    """Lower-case the term and collapse runs of whitespace so that 'Foo  Bar' and 'foo bar' share a subscription"""
+    return ' '.join(search_term.lower().split())
+
+  @staticmethod
+  def add_subscriber(term, url, subscriber):
+    """Add the subscriber to the term, creating it if necessary. Returns True if the term was created."""
+    def txn():
+      search_term = SearchTerm.get_by_term(term)
+      created = search_term is None
+      if created:
+        search_term = SearchTerm(key_name=SearchTerm.key_name_for(term), term=term, url=url, hub=Tracker.HUB_URL)
+        # The lease is confirmed, or corrected, when the hub verifies the subscription
+        LeaseRenewer.set_lease(search_term)
+      search_term.subscribers.append(subscriber)
+      search_term.put()
+      return created
+    return db.run_in_transaction(txn)
+
+  @staticmethod
+  def remove_subscriber(term, subscriber):
+    """Remove one occurrence of the subscriber from the term, deleting the term when nobody is left tracking it.
+    Returns the url of the deleted term or None if the term is still being tracked."""
+    def txn():
+      search_term = SearchTerm.get_by_term(term)
+      if search_term is None:
+        return None
+      if subscriber in search_term.subscribers:
+        search_term.subscribers.remove(subscriber)
+      if search_term.subscribers:
+        search_term.put()
+        return None
+      search_term.delete()
+      return search_term.url
+    return db.run_in_transaction(txn)
+
+
 class Tracker(object):
+  HUB_URL = 'http://pubsubhubbub.appspot.com/'
+
   def __init__(self, hub_subscriber=pshb.HubSubscriber()):
     self.hub_subscriber =  hub_subscriber
 
@@ -73,22 +246,30 @@ class Tracker(object):
 
   def _subscribe(self, message_sender, search_term):
     message_sender = extract_sender_email_address(message_sender)
-    url = self._build_subscription_url(search_term)
+    canonical_term = SearchTerm.canonicalise(search_term)
+    url = self._build_subscription_url(canonical_term)
     logging.info('Subscribing to: %s for user: %s' % (url, message_sender))
 
-    subscription = Subscription(url=url, search_term=search_term, subscriber=message_sender)
+    subscription = Subscription(url=url, search_term=search_term, subscriber=message_sender,
+                                canonical_term=canonical_term)
     db.put(subscription)
+    SubscriptionSummary.invalidate(message_sender)
 
-    callback_url = self._build_callback_url(subscription)
-
-    logging.info('Callback URL was: %s' % callback_url)
-    self.hub_subscriber.subscribe(url, 'http://pubsubhubbub.appspot.com/', callback_url)
+    # Only the first person to track a term causes a hub subscription. Everyone else shares it.
+    if SearchTerm.add_subscriber(canonical_term, url, message_sender):
+      callback_url = self._build_term_callback_url(canonical_term)
+      logging.info('Callback URL was: %s' % callback_url)
+      self.hub_subscriber.subscribe(url, Tracker.HUB_URL, callback_url)
 
     return subscription
 
   def _build_callback_url(self, subscription):
+    """The callback URL used by subscriptions which were created before search terms were shared"""
     return "%s/posts?id=%s" % (settings.APP_URL, subscription.id())
 
+  def _build_term_callback_url(self, canonical_term):
+    return "%s/posts?term=%s" % (settings.APP_URL, urllib.quote(canonical_term.encode('utf-8'), ''))
+
   def _build_subscription_url(self, search_term):
     search_term = urllib.quote(search_term)
     return 'https://www.googleapis.com/buzz/v1/activities/track?q=%s' % search_term
@@ -116,13 +297,186 @@ class Tracker(object):
     if subscription.subscriber != extract_sender_email_address(message_sender):
       return None
     subscription.delete()
+    SubscriptionSummary.invalidate(subscription.subscriber)
 
-    callback_url = self._build_callback_url(subscription)
+    if subscription.canonical_term is None:
+      callback_url = self._build_callback_url(subscription)
+      url = subscription.url
+    else:
+      # Other people may still be tracking this term in which case the hub subscription has to stay
+      url = SearchTerm.remove_subscriber(subscription.canonical_term, subscription.subscriber)
+      if url is None:
+        return subscription
+      callback_url = self._build_term_callback_url(subscription.canonical_term)
     logging.info('Callback URL was: %s' % callback_url)
-    self.hub_subscriber.unsubscribe(subscription.url, 'http://pubsubhubbub.appspot.com/', callback_url)
+    self.hub_subscriber.unsubscribe(url, Tracker.HUB_URL, callback_url)
     return subscription
 
 
+class LeaseRenewer(object):
+  """Renews hub subscriptions before their leases run out.
+
+  Every SearchTerm, and every Subscription made before search terms were shared, records when its lease expires and
+  when it should be renewed, which is settings.LEASE_RENEWAL_WINDOW seconds earlier. Querying on renew_at is the
+  time ordered index of expiring leases. Each run renews the leases that are due, soonest first, and asks any one
+  hub for at most settings.LEASE_RENEWALS_PER_HUB of them. Whatever is still due afterwards is the backlog."""
+  BACKLOG_KEY = 'lease_renewal_backlog'
+  # Counting the backlog stops here so that a huge backlog doesn't make the count itself slow
+  MAX_BACKLOG_COUNT = 1000
+  # Subscriptions that share a SearchTerm's hub subscription have a renew_at of None which the datastore sorts before
+  # every date. Starting the range here leaves them out.
+  EPOCH = datetime.datetime(1970, 1, 1)
+
+  def __init__(self, hub_subscriber=pshb.HubSubscriber()):
+    self.tracker = Tracker(hub_subscriber=hub_subscriber)
+    self.hub_subscriber = hub_subscriber
+
+  @staticmethod
+  def set_lease(target, lease_seconds=None, now=None):
+    if now is None:
+      now = datetime.datetime.utcnow()
+    if lease_seconds is None:
+      lease_seconds = settings.HUB_LEASE_SECONDS
+    target.lease_expires = now + datetime.timedelta(seconds=lease_seconds)
+    target.renew_at = target.lease_expires - datetime.timedelta(seconds=settings.LEASE_RENEWAL_WINDOW)
+
+  @staticmethod
+  def record_lease(target, lease_seconds=None, now=None):
+    """Called when the hub verifies a subscription to say how long it will last"""
+    LeaseRenewer._update_lease(target, lambda fresh: LeaseRenewer.set_lease(fresh, lease_seconds, now))
+
+  @staticmethod
+  def _update_lease(target, update):
+    """Apply update to a fresh copy of the target inside a transaction and store it. Subscribers may have tracked or
+    untracked the term since target was read so writing target itself would undo their changes. Returns the updated
+    entity or None if it has been deleted."""
+    def txn():
+      fresh = type(target).get(target.key())
+      if fresh is None:
+        return None
+      update(fresh)
+      fresh.put()
+      return fresh
+    return db.run_in_transaction(txn)
+
+  def _due(self, now):
+    """The SearchTerms and legacy Subscriptions that are due for renewal, soonest first"""
+    targets = []
+    for model in (SearchTerm, Subscription):
+      query = model.all().filter('renew_at >', LeaseRenewer.EPOCH).filter('renew_at <=', now).order('renew_at')
+      targets.extend(query.fetch(settings.LEASE_RENEWAL_BATCH_SIZE))
+    targets.sort(key=lambda target: target.renew_at)
+    return targets[:settings.LEASE_RENEWAL_BATCH_SIZE]
+
+  def _callback_url(self, target):
+    if isinstance(target, SearchTerm):
+      return self.tracker._build_term_callback_url(target.search_term)
+    return self.tracker._build_callback_url(target)
+
+  def renew(self, now=None):
+    """Renew the leases that are due. Returns how many were renewed and how many are still due."""
+    if now is None:
+      now = datetime.datetime.utcnow()
+    renewals_per_hub = {}
+    renewed = []
+    for target in self._due(now):
+      hub = getattr(target, 'hub', None) or Tracker.HUB_URL
+      if renewals_per_hub.get(hub, 0) >= settings.LEASE_RENEWALS_PER_HUB:
+        continue
+      renewals_per_hub[hub] = renewals_per_hub.get(hub, 0) + 1
+      self.hub_subscriber.subscribe(target.url, hub, self._callback_url(target))
+      # Try again if the hub hasn't verified the renewal by then. Verifying it sets the next renew_at.
+      retry_at = now + datetime.timedelta(seconds=settings.LEASE_RENEWAL_RETRY)
+      if LeaseRenewer._update_lease(target, lambda fresh: setattr(fresh, 'renew_at', retry_at)) is not None:
+        renewed.append(target)
+
+    backlog = LeaseRenewer.count_due(now)
+    memcache.set(LeaseRenewer.BACKLOG_KEY, backlog)
+    logging.info('Renewed %s leases. %s leases are still due for renewal' % (len(renewed), backlog))
+    return len(renewed), backlog
+
+  @staticmethod
+  def count_due(now):
+    count = 0
+    for model in (SearchTerm, Subscription):
+      query = model.all(keys_only=True).filter('renew_at >', LeaseRenewer.EPOCH).filter('renew_at <=', now)
+      count += query.count(LeaseRenewer.MAX_BACKLOG_COUNT)
+    return count
+
+  @staticmethod
+  def backlog():
+    """How many leases were still due for renewal after the last run, or None if nothing has run recently"""
+    return memcache.get(LeaseRenewer.BACKLOG_KEY)
+
+
+def backfill_leases(cursor=None, executor=None):
+  """Give a lease expiry to hub subscriptions that were made before leases were tracked, so that they get renewed.
+
+  Processes settings.MAX_FETCH SearchTerms and then legacy Subscriptions per call and chains itself on the executor
+  until it has seen them all."""
+  if executor is None:
+    executor = executors.DeferredExecutor()
+  kinds = [SearchTerm, Subscription]
+  kind_index, cursor = cursor or (0, None)
+  query = kinds[kind_index].all()
+  if cursor:
+    query.with_cursor(cursor)
+  targets = query.fetch(settings.MAX_FETCH)
+  # Leases that were never recorded might already have run out so they're renewed as soon as possible
+  now = datetime.datetime.utcnow()
+  changed = []
+  for target in targets:
+    if target.renew_at is None and (kind_index == 0 or target.canonical_term is None):
+      target.renew_at = now
+      changed.append(target)
+  db.put(changed)
+  logging.info('Gave %s %ss a lease expiry' % (len(changed), kinds[kind_index].kind()))
+
+  if len(targets) == settings.MAX_FETCH:
+    executor.submit(backfill_leases, (kind_index, query.cursor()), executor)
+  elif kind_index + 1 < len(kinds):
+    executor.submit(backfill_leases, (kind_index + 1, None), executor)
+
+
+class LocalMatcher(object):
+  """Checks that the posts Buzz pushes for a term of several words contain its words together and in order.
+
+  A notification is only ever for one term, so each post is matched against that term alone. The matcher compiled
+  for a term depends on nothing but the term, so the most recently used ones are kept without ever going stale."""
+  TAG = re.compile(r'<[^>]*>')
+
+  def __init__(self, stopwords=None, cache_size=None):
+    if stopwords is None:
+      stopwords = settings.STOPWORDS
+    if cache_size is None:
+      cache_size = settings.LOCAL_MATCHER_CACHE_SIZE
+    self.stopwords = stopwords
+    self.phrases = lru.LRUCache(cache_size)
+
+  def _phrases_for(self, term):
+    phrases = self.phrases.get(term)
+    if phrases is None:
+      phrases = matcher.PhraseMatcher(self.stopwords)
+      phrases.add(term, term)
+      self.phrases.put(term, phrases)
+    return phrases
+
+  @staticmethod
+  def post_text(post):
+    """The title and content of the post without its markup"""
+    content = LocalMatcher.TAG.sub(' ', post.content or '')
+    return post.title or '', xml.sax.saxutils.unescape(content, {'&quot;': '"', '&#39;': "'"})
+
+  def filter_posts(self, posts, term):
+    """Leaves out the posts that don't contain the words of a term of more than one word together and in order"""
+    if len(matcher.tokenize(term, self.stopwords)) < 2:
+      return posts
+    phrases = self._phrases_for(term)
+    return [post for post in posts if phrases.match(*LocalMatcher.post_text(post))]
+
+LOCAL_MATCHER = LocalMatcher()
+
+
 class MessageBuilder(object):
   def __init__(self):
     self.lines = []
@@ -163,25 +517,12 @@ class SlashlessCommandMessage(xmpp.Message):
   
   @staticmethod
   def extract_command_and_arg_from_string(string):
-    # match any white space and then a word (cmd) 
+    # match any white space and then a word (cmd)
     #  then any white space then everything after that (arg).
-    command = None
-    arg = None
-     
-    results = re.search(r"\s*(\S*)\s*(.*)", string) 
-    if results:
-      command = results.group(1)
-      arg = results.group(2)
-    
-    # we didn't find a command and an arg so maybe we'll just find the command
-    # some commands may not have args 
-    else:
-      results = re.search(r"\s*(\S*)\s*", string)
-      if results:
-        command = results.group(1)
-    return (command,arg)
-  
-  
+    # some commands may not have args so arg may be empty
+    return commands.tokenize(string)
+
+
   def __ensure_command_and_args_extracted(self):
     """ Take the message and identify the command and argument if there is one.
     In the case of a SlashlessCommandMessage, there is always one -- the first word is the command.      
@@ -222,8 +563,10 @@ class XmppHandler(webapp.RequestHandler):
   TRACK_CMD   = 'track'
   UNTRACK_CMD = 'untrack'
   SEARCH_CMD  = 'search'
-  
-  PERMITTED_COMMANDS = [ABOUT_CMD,HELP_CMD,ALTERNATIVE_HELP_CMD,LIST_CMD,POST_CMD,TRACK_CMD,UNTRACK_CMD, SEARCH_CMD]
+  LIST_MORE_ARG = 'more'
+
+  # Maps whatever someone typed to the name of the method that handles it. Filled in below the class.
+  COMMANDS = commands.CommandTable()
 
   COMMAND_HELP_MSG_LIST = [
     '%s Prints out this message' % HELP_CMD,
@@ -231,6 +574,7 @@ class XmppHandler(webapp.RequestHandler):
     '%s [search term] Starts tracking the given search term and returns the id for your subscription' % TRACK_CMD,
     '%s [id] Removes your subscription for that id' % UNTRACK_CMD,
     '%s Lists all search terms and ids currently being tracked by you' % LIST_CMD,
+    '%s %s Lists the next search terms and ids if there were too many to show at once' % (LIST_CMD, LIST_MORE_ARG),
     '%s Tells you which instance of the Buzz Chat Bot you are using' % ABOUT_CMD,
     '%s [some message] Posts that message to Buzz' % POST_CMD,
     '%s [some search term] Searches for that search term on Buzz'
@@ -241,9 +585,13 @@ class XmppHandler(webapp.RequestHandler):
   UNKNOWN_COMMAND_MSG             = "Sorry, '%s' was not understood. Here are a list of the things you can do:"
   SUBSCRIPTION_SUCCESS_MSG        = 'Tracking: %s with id: %s'
   LIST_NOT_TRACKING_ANYTHING_MSG  = 'You are not tracking anything. To track when a word or phrase appears in Buzz, enter: track <thing of interest>'
+  LIST_MORE_MSG                   = 'Showing %s to %s of %s. To see more, enter: %s %s'
+  LIST_NO_MORE_MSG                = 'That is everything you are tracking. To start again from the beginning, enter: %s'
 
   def __init__(self, hub_subscriber=pshb.HubSubscriber()):
     self.tracker = Tracker(hub_subscriber=hub_subscriber)
+    self._sender_email_address = None
+    self._buzz_wrapper = None
     
   def unhandled_command(self, message):
     """ User entered a command that is not recognised. Tell them this and show help""" 
@@ -251,40 +599,31 @@ class XmppHandler(webapp.RequestHandler):
 
   def _make_wrapper(self, email_address):
     return oauth_handlers.make_wrapper(email_address)
+
+  @property
+  def buzz_wrapper(self):
+    """The sender's SimpleBuzzWrapper. It's only made when a command first uses it since most commands don't."""
+    if self._buzz_wrapper is None:
+      self._buzz_wrapper = self._make_wrapper(self._sender_email_address)
+    return self._buzz_wrapper
        
   def message_received(self, message):
     """ Take the message we've received and dispatch it to the appropriate command handler
-    using introspection. E.g. if the command is 'track' it will map to track_command.
+    using the COMMANDS table. E.g. if the command is 'track', 'TRACK', '/track' or 'tr' it will map to track_command.
     Args:
       message: Message: The message that was sent by the user.
     """
     logging.info('Command was: %s' % message.command)
-    command = self._get_canonical_command(message)
-    
-    self.buzz_wrapper = self._make_wrapper(extract_sender_email_address(message.sender))
-
-    if command and command in XmppHandler.PERMITTED_COMMANDS:
-      handler_name = '%s_command' % command
-      handler = getattr(self, handler_name, None)
-      if handler:
-        handler(message)
-        return
-      else:
-        logging.info('No handler available for command: %s' % command)
-    self.unhandled_command(message)
+    handler = self.COMMANDS.handler_for(message.command)
 
-  def _get_canonical_command(self, message):
-    command = message.command.lower()
-    
-    # The old-style / prefixed commands are honoured as if they were slashless commands. This provides backwards
-    # compatibility for early adopters and people who are used to IRC syntax.
-    if command.startswith('/'):
-      command = command[1:]
+    self._sender_email_address = extract_sender_email_address(message.sender)
+    self._buzz_wrapper = None
 
-    # Handle aliases for commands
-    if command == XmppHandler.ALTERNATIVE_HELP_CMD:
-      command = XmppHandler.HELP_CMD
-    return command
+    if handler:
+      # Looked up on self so that subclasses can override command methods
+      getattr(self, handler)(message)
+    else:
+      self.unhandled_command(message)
 
   def post(self):
     """ Redefines post to create a message from our new SlashlessCommandMessage. 
@@ -362,17 +701,29 @@ class XmppHandler(webapp.RequestHandler):
     reply(message_builder, message)
 
   def list_command(self, message=None):
+    """ List the sender's subscriptions a page at a time. 'list' shows the first page and 'list more' the next one."""
     logging.info('Received message from: %s' % message.sender)
     message_builder = MessageBuilder()
     sender = extract_sender_email_address(message.sender)
-    
+
     logging.info('Sender: %s' % sender)
-    subscriptions_query = Subscription.gql('WHERE subscriber = :1', sender)
-    if subscriptions_query.count() > 0:
-      for subscription in subscriptions_query:
-        message_builder.add('Search term: %s with id: %s' % (subscription.search_term, subscription.id()))
-    else:
+    after_id = None
+    if message.arg.strip().lower() == XmppHandler.LIST_MORE_ARG:
+      after_id = SubscriptionSummary.get_cursor(sender)
+    page, start, total = SubscriptionSummary.page(sender, after_id)
+
+    if not total:
       message_builder.add(XmppHandler.LIST_NOT_TRACKING_ANYTHING_MSG)
+    elif not page:
+      message_builder.add(XmppHandler.LIST_NO_MORE_MSG % XmppHandler.LIST_CMD)
+    else:
+      for id, search_term in page:
+        message_builder.add('Search term: %s with id: %s' % (search_term, id))
+      SubscriptionSummary.set_cursor(sender, page[-1][0])
+      end = start + len(page)
+      if end < total:
+        message_builder.add(XmppHandler.LIST_MORE_MSG % (start + 1, end, total, XmppHandler.LIST_CMD,
+                                                         XmppHandler.LIST_MORE_ARG))
     reply(message_builder, message)
 
   def about_command(self, message):
@@ -395,6 +746,7 @@ class XmppHandler(webapp.RequestHandler):
 
       # User didn't finish the OAuth dance so we make them start again
       user_token.delete()
+      oauth_handlers.invalidate_wrapper(sender)
       message_builder.add('You (%s) did not complete the process for giving access to your Google Buzz account. Please do so at: %s' % (sender, settings.APP_URL))
       logging.debug('%s did not complete the process for giving access to their Google Buzz account. Deleting their incomplete token.' % sender)
     else:
@@ -417,6 +769,15 @@ class XmppHandler(webapp.RequestHandler):
       message_builder.add(line)
     reply(message_builder, message)
 
+XmppHandler.COMMANDS.register(XmppHandler.ABOUT_CMD, 'about_command')
+XmppHandler.COMMANDS.register(XmppHandler.HELP_CMD, 'help_command', aliases=[XmppHandler.ALTERNATIVE_HELP_CMD])
+XmppHandler.COMMANDS.register(XmppHandler.LIST_CMD, 'list_command')
+# Posting to Buzz can't be undone so it mustn't happen because someone typed a prefix of some other word
+XmppHandler.COMMANDS.register(XmppHandler.POST_CMD, 'post_command', abbreviate=False)
+XmppHandler.COMMANDS.register(XmppHandler.TRACK_CMD, 'track_command')
+XmppHandler.COMMANDS.register(XmppHandler.UNTRACK_CMD, 'untrack_command')
+XmppHandler.COMMANDS.register(XmppHandler.SEARCH_CMD, 'search_command')
+
 def extract_sender_email_address(message_sender):
     return message_sender.split('/')[0].lower()
 
@@ -425,7 +786,169 @@ def reply(message_builder, message):
   logging.info('Message that will be sent: %s' % message_to_send)
   message.reply(message_to_send, raw_xml=False)
 
-def send_posts(posts, subscriber, search_term):
+class XmppSender(object):
+  """Sends a chat message to a list of recipients with a single API call"""
+  def send(self, recipients, body):
+    xmpp.send_message(recipients, body, raw_xml=False)
+
+# Sends run on the task queue so that the hub gets its response without waiting for them
+FAN_OUT = fanout.FanOut(XmppSender(), executors.DeferredExecutor())
+
+class Digest(db.Model):
+  """The lines that some of a term's subscribers are waiting to be sent together, instead of one message per post.
+
+  The key_name is made from the canonical term by key_name_for. Each subscriber is owed the lines from their offset onwards, so someone who
+  starts waiting later doesn't get the lines they were already sent. Only the first settings.DIGEST_MAX_LINES lines
+  are kept but total counts every post."""
+  term = db.TextProperty()
+  lines = db.ListProperty(db.Text)
+  total = db.IntegerProperty(default=0)
+  subscribers = db.StringListProperty()
+  offsets = db.ListProperty(int)
+
+  @staticmethod
+  def key_name_for(term):
+    return term_key_name('d', term)
+
+  @staticmethod
+  def get_by_term(term):
+    return Digest.get_by_key_name(Digest.key_name_for(term))
+
+  @staticmethod
+  def waiting(term):
+    """The subscribers of the term who are waiting for a digest"""
+    digest = Digest.get_by_term(term)
+    if digest is None:
+      return []
+    return digest.subscribers
+
+  @staticmethod
+  def add(term, subscribers, lines):
+    def txn():
+      digest = Digest.get_by_term(term)
+      if digest is None:
+        digest = Digest(key_name=Digest.key_name_for(term), term=term)
+      for subscriber in subscribers:
+        if subscriber not in digest.subscribers:
+          digest.subscribers.append(subscriber)
+          digest.offsets.append(digest.total)
+      room = max(0, settings.DIGEST_MAX_LINES - len(digest.lines))
+      digest.lines.extend([db.Text(line) for line in lines[:room]])
+      digest.total += len(lines)
+      digest.put()
+    db.run_in_transaction(txn)
+
+  @staticmethod
+  def take(key_name):
+    """Removes the digest with the key name and returns it, or None if there isn't one"""
+    def txn():
+      digest = Digest.get_by_key_name(key_name)
+      if digest is not None:
+        digest.delete()
+      return digest
+    return db.run_in_transaction(txn)
+
+  def messages(self):
+    """Maps each offset to the lines owed to the subscribers who have it"""
+    messages = {}
+    for offset in set(self.offsets):
+      count = self.total - offset
+      lines = ['Digest of %s posts for [%s]:' % (count, self.term)]
+      lines.extend(self.lines[offset:])
+      listed = len(lines) - 1
+      if listed < count:
+        lines.append('...and %s more' % (count - listed))
+      messages[offset] = lines
+    return messages
+
+
+class DeliveryThrottle(object):
+  """Decides which subscribers are sent a term's posts now and which get them in the next digest.
+
+  Each subscription has a throttle.TokenBucket, kept in memcache, that allows settings.DELIVERY_BURST posts at
+  once and settings.DELIVERY_RATE posts an hour. A subscriber whose bucket can't cover the posts waits for the
+  digest, and keeps waiting until it's sent. Popular terms, as estimated by a throttle.PopularityEstimator of the
+  posts this instance has been pushed, go to the digest for everyone, as do terms made only of stopwords."""
+  BUCKET_KEY = 'delivery_bucket:%s'
+
+  def __init__(self, clock=time.time):
+    self.clock = clock
+    self.popularity = throttle.PopularityEstimator(settings.POPULARITY_WINDOW, clock=clock)
+    self.rate = settings.DELIVERY_RATE / 3600.0
+    # An untouched bucket is full again after this long, so it may as well be forgotten
+    self.bucket_lifetime = int(settings.DELIVERY_BURST / self.rate) + 1
+
+  def _bucket_key(self, term, subscriber):
+    # Memcache keys are limited to 250 bytes
+    subscription = u'%s %s' % (term, subscriber)
+    return DeliveryThrottle.BUCKET_KEY % hashlib.md5(subscription.encode('utf-8')).hexdigest()
+
+  def is_popular(self, term):
+    if not matcher.tokenize(term, settings.STOPWORDS):
+      return True
+    return self.popularity.estimate(term) > settings.POPULAR_TERM_THRESHOLD
+
+  def split(self, term, subscribers, count):
+    """Returns the subscribers who can be sent count posts now and the ones who have to wait for the digest"""
+    self.popularity.add(term, count)
+    if self.is_popular(term):
+      logging.info('Sending the posts for popular term: %s to %s subscribers as a digest' % (term, len(subscribers)))
+      return [], list(subscribers)
+
+    waiting = set(Digest.waiting(term))
+    keys = dict([(self._bucket_key(term, subscriber), subscriber) for subscriber in subscribers
+                 if subscriber not in waiting])
+    states = memcache.get_multi(keys.keys())
+    now = self.clock()
+    allowed = set()
+    updated = {}
+    for key, subscriber in keys.iteritems():
+      tokens, last_updated = states.get(key, (None, None))
+      bucket = throttle.TokenBucket(self.rate, settings.DELIVERY_BURST, tokens, last_updated)
+      if bucket.take(count, now):
+        allowed.add(subscriber)
+      updated[key] = bucket.state()
+    memcache.set_multi(updated, time=self.bucket_lifetime)
+
+    now_subscribers = [subscriber for subscriber in subscribers if subscriber in allowed]
+    digest_subscribers = [subscriber for subscriber in subscribers if subscriber not in allowed]
+    return now_subscribers, digest_subscribers
+
+DELIVERY_THROTTLE = DeliveryThrottle()
+
+
+def send_posts(posts, subscribers, search_term, fan_out=None, delivery_throttle=None):
+  """Send the posts to everyone in subscribers, coalescing them into as few messages as possible. Subscribers who
+  have been sent too much recently get them in the next digest instead."""
+  if fan_out is None:
+    fan_out = FAN_OUT
+  if delivery_throttle is None:
+    delivery_throttle = DELIVERY_THROTTLE
+  if not posts or not subscribers:
+    return 0
   message_builder = MessageBuilder()
-  for post in posts:
-    xmpp.send_message(subscriber, message_builder.build_message_from_post(post, search_term), raw_xml=False)
\ No newline at end of file
+  lines = [message_builder.build_message_from_post(post, search_term) for post in posts]
+  now_subscribers, digest_subscribers = delivery_throttle.split(search_term, subscribers, len(lines))
+  if digest_subscribers:
+    Digest.add(search_term, digest_subscribers, lines)
+  return fan_out.deliver(now_subscribers, lines)
+
+
+def send_digests(fan_out=None):
+  """Send every waiting digest. Returns the number of digests sent."""
+  if fan_out is None:
+    fan_out = FAN_OUT
+  keys = Digest.all(keys_only=True).fetch(settings.MAX_FETCH)
+  sent = 0
+  for key in keys:
+    digest = Digest.take(key.name())
+    if digest is None:
+      continue
+    messages = digest.messages()
+    for offset, lines in messages.iteritems():
+      subscribers = [subscriber for subscriber, subscriber_offset in zip(digest.subscribers, digest.offsets)
+                     if subscriber_offset == offset]
+      fan_out.deliver(subscribers, lines)
+    sent += 1
+  logging.info('Sent %s digests' % sent)
+  return sent